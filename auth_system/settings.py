@@ -75,7 +75,10 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 # REST Framework configuration
 REST_FRAMEWORK = {
-    'DEFAULT_AUTHENTICATION_CLASSES': [],
+    # CustomAuthMiddleware authenticates; DRF reuses its request.user
+    'DEFAULT_AUTHENTICATION_CLASSES': [
+        'authentication.authentication.MiddlewareAuthentication',
+    ],
     'DEFAULT_PERMISSION_CLASSES': [],
     'UNAUTHENTICATED_USER': None,
     'DEFAULT_RENDERER_CLASSES': [
@@ -87,10 +90,96 @@ REST_FRAMEWORK = {
 # JWT Configuration
 JWT_SECRET = config('JWT_SECRET')
 JWT_ALGORITHM = config('JWT_ALGORITHM', default='HS256')
-JWT_EXPIRATION_HOURS = config('JWT_EXPIRATION_HOURS', default=24, cast=int)
+# Access tokens are short-lived; clients renew them with a refresh token
+JWT_ACCESS_TOKEN_MINUTES = config('JWT_ACCESS_TOKEN_MINUTES', default=15, cast=int)
+REFRESH_TOKEN_DAYS = config('REFRESH_TOKEN_DAYS', default=14, cast=int)
+# Max number of verified tokens kept per process (0 disables the cache)
+JWT_CACHE_SIZE = config('JWT_CACHE_SIZE', default=10000, cast=int)
+# Embed role ids and the policy version in tokens so permission checks can
+# skip the database; optionally embed per-element permission bitmasks too
+JWT_EMBED_ROLES = config('JWT_EMBED_ROLES', default=False, cast=bool)
+JWT_EMBED_PERMISSIONS = config('JWT_EMBED_PERMISSIONS', default=False, cast=bool)
+
+# Access token denylist (logout). Revoked jtis are held in a per-process
+# Bloom filter refreshed from the database every REVOCATION_REFRESH_SECONDS
+REVOCATION_BLOOM_CAPACITY = config('REVOCATION_BLOOM_CAPACITY', default=100000, cast=int)
+REVOCATION_BLOOM_ERROR_RATE = config('REVOCATION_BLOOM_ERROR_RATE', default=0.001, cast=float)
+REVOCATION_REFRESH_SECONDS = config('REVOCATION_REFRESH_SECONDS', default=2.0, cast=float)
+
+# Principal cache (user id -> id/email/is_active/role ids snapshot)
+PRINCIPAL_CACHE_TTL = config('PRINCIPAL_CACHE_TTL', default=30, cast=int)
+PRINCIPAL_CACHE_SIZE = config('PRINCIPAL_CACHE_SIZE', default=10000, cast=int)
+# Optional CACHES alias shared by all workers (empty = in-process only)
+PRINCIPAL_CACHE_BACKEND = config('PRINCIPAL_CACHE_BACKEND', default='')
+
+# Policy version (bumped on role/rule/element/role-assignment writes,
+# deactivations and token_version bumps).
+# 'db' = policy_version table, else a CACHES alias; '' = in-process counter,
+# which other workers never see (refused by `manage.py check` unless DEBUG).
+# Each worker reads it at most once per POLICY_VERSION_CHECK_MS.
+POLICY_VERSION_BACKEND = config('POLICY_VERSION_BACKEND', default='db')
+POLICY_VERSION_CHECK_MS = config('POLICY_VERSION_CHECK_MS', default=500, cast=int)
+
+# bcrypt cost for new hashes; existing hashes are migrated on login.
+# Use `manage.py calibrate_bcrypt` to pick a value for this hardware.
+BCRYPT_ROUNDS = config('BCRYPT_ROUNDS', default=12, cast=int)
+
+# Password hashing pool (bcrypt runs off the request thread, bounded)
+BCRYPT_POOL_SIZE = config('BCRYPT_POOL_SIZE', default=4, cast=int)
+BCRYPT_QUEUE_DEPTH = config('BCRYPT_QUEUE_DEPTH', default=32, cast=int)
+# Seconds sent in Retry-After when the pool is saturated
+BCRYPT_RETRY_AFTER = config('BCRYPT_RETRY_AFTER', default=1, cast=int)
+
+# Login throttling (token buckets checked before any bcrypt work).
+# Rates are attempts per minute; 0 disables that limit.
+LOGIN_THROTTLE_IP_PER_MINUTE = config('LOGIN_THROTTLE_IP_PER_MINUTE', default=30, cast=int)
+LOGIN_THROTTLE_IP_BURST = config('LOGIN_THROTTLE_IP_BURST', default=30, cast=int)
+LOGIN_THROTTLE_EMAIL_PER_MINUTE = config('LOGIN_THROTTLE_EMAIL_PER_MINUTE', default=5, cast=int)
+LOGIN_THROTTLE_EMAIL_BURST = config('LOGIN_THROTTLE_EMAIL_BURST', default=10, cast=int)
+# Optional CACHES alias shared by all workers (empty = in-process buckets)
+LOGIN_THROTTLE_BACKEND = config('LOGIN_THROTTLE_BACKEND', default='')
+# Only enable behind a proxy that sets X-Forwarded-For
+LOGIN_THROTTLE_TRUST_X_FORWARDED_FOR = config(
+    'LOGIN_THROTTLE_TRUST_X_FORWARDED_FOR', default=False, cast=bool
+)
 
 # Session Configuration
 SESSION_EXPIRATION_HOURS = config('SESSION_EXPIRATION_HOURS', default=24, cast=int)
+# Session authentication: cookie or X-Session-ID header. Expiry slides on
+# use, but expire_at is written at most once per SESSION_TOUCH_SECONDS
+AUTH_SESSION_COOKIE_NAME = config('AUTH_SESSION_COOKIE_NAME', default='auth_session')
+SESSION_TOUCH_SECONDS = config('SESSION_TOUCH_SECONDS', default=60, cast=int)
+SESSION_CACHE_TTL = config('SESSION_CACHE_TTL', default=30, cast=int)
+SESSION_CACHE_SIZE = config('SESSION_CACHE_SIZE', default=10000, cast=int)
+# In-process expired-session sweeper (0 = disabled; use `manage.py sweep_sessions`)
+SESSION_SWEEP_INTERVAL_SECONDS = config('SESSION_SWEEP_INTERVAL_SECONDS', default=0, cast=int)
+
+# Bulk user import (`manage.py import_users` and POST /api/auth/bulk-register/)
+BULK_IMPORT_CHUNK_SIZE = config('BULK_IMPORT_CHUNK_SIZE', default=1000, cast=int)
+# Records accepted per HTTP request; larger imports belong in the command
+BULK_IMPORT_MAX_RECORDS = config('BULK_IMPORT_MAX_RECORDS', default=500, cast=int)
+
+# GET /api/access-rules/ page size (?limit= may ask for up to the maximum)
+ACCESS_RULES_PAGE_SIZE = config('ACCESS_RULES_PAGE_SIZE', default=100, cast=int)
+ACCESS_RULES_MAX_PAGE_SIZE = config('ACCESS_RULES_MAX_PAGE_SIZE', default=1000, cast=int)
+# Rules accepted by PUT /api/access-rules/matrix/
+ACCESS_RULES_MATRIX_MAX_ROWS = config('ACCESS_RULES_MATRIX_MAX_ROWS', default=100000, cast=int)
+
+# Authorization audit log. Decisions are buffered in memory (oldest dropped
+# once AUDIT_BUFFER_SIZE is reached) and bulk-inserted by a background thread
+# every AUDIT_FLUSH_INTERVAL_MS or AUDIT_FLUSH_BATCH_SIZE records.
+# AUDIT_SAMPLE_RATE applies to grants; denials are always recorded.
+AUDIT_ENABLED = config('AUDIT_ENABLED', default=True, cast=bool)
+AUDIT_BUFFER_SIZE = config('AUDIT_BUFFER_SIZE', default=10000, cast=int)
+AUDIT_FLUSH_INTERVAL_MS = config('AUDIT_FLUSH_INTERVAL_MS', default=1000, cast=int)
+AUDIT_FLUSH_BATCH_SIZE = config('AUDIT_FLUSH_BATCH_SIZE', default=500, cast=int)
+AUDIT_SAMPLE_RATE = config('AUDIT_SAMPLE_RATE', default=1.0, cast=float)
+
+# Permission check metrics, served in Prometheus format at GET /api/metrics.
+# With METRICS_TOKEN set, scrapers send "Authorization: Token <METRICS_TOKEN>";
+# otherwise the endpoint requires an admin user.
+METRICS_ENABLED = config('METRICS_ENABLED', default=True, cast=bool)
+METRICS_TOKEN = config('METRICS_TOKEN', default='')
 
 # Security settings for production
 if not DEBUG:
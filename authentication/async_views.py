@@ -0,0 +1,259 @@
+import json
+import math
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.http import JsonResponse
+from django.views import View
+from rest_framework import status
+from rest_framework.exceptions import APIException, ParseError
+from .hashing import rehash_in_background
+from .models import User, Session, RefreshToken
+from .throttling import get_client_ip, login_throttle
+from .serializers import (
+    UserRegistrationSerializer,
+    UserLoginSerializer,
+    TokenRefreshSerializer,
+    UserProfileSerializer
+)
+
+
+class AsyncAPIView(View):
+    """
+    Base class for async JSON endpoints
+
+    DRF 3.14's APIView only dispatches synchronously, so these are plain
+    Django async views. They rely on CustomAuthMiddleware for request.user
+    and format errors like custom_exception_handler.
+    """
+
+    @classmethod
+    def as_view(cls, **initkwargs):
+        view = super().as_view(**initkwargs)
+        # Token/session authenticated API - exempt from CSRF like APIView
+        view.csrf_exempt = True
+        return view
+
+    async def dispatch(self, request, *args, **kwargs):
+        try:
+            return await super().dispatch(request, *args, **kwargs)
+        except APIException as exc:
+            response = JsonResponse(
+                {'error': str(exc.detail), 'status_code': exc.status_code},
+                status=exc.status_code
+            )
+            if getattr(exc, 'wait', None):
+                response['Retry-After'] = str(math.ceil(exc.wait))
+            return response
+
+
+def parse_json(request):
+    """Decode a JSON request body into a dict"""
+    if not request.body:
+        return {}
+    try:
+        data = json.loads(request.body)
+    except ValueError:
+        raise ParseError('Invalid JSON body')
+    if not isinstance(data, dict):
+        raise ParseError('Expected a JSON object')
+    return data
+
+
+def save_new_user(user):
+    """Insert user in a savepoint; IntegrityError means the email is taken"""
+    with transaction.atomic():
+        user.save()
+
+
+def issue_credentials(user, use_session):
+    """Mint an access token, refresh token and optional session for user"""
+    token = user.generate_token()
+    refresh_token = RefreshToken.issue(user)
+    session = None
+    if use_session:
+        session = Session.create_session(
+            user,
+            hours=settings.SESSION_EXPIRATION_HOURS
+        )
+    return token, refresh_token, session
+
+
+class AsyncRegisterView(AsyncAPIView):
+    """
+    POST /api/async/auth/register/
+    Async variant of RegisterView
+    """
+    async def post(self, request):
+        serializer = UserRegistrationSerializer(data=parse_json(request))
+
+        # Validation checks the email is free, which is a query
+        if not await sync_to_async(serializer.is_valid)():
+            return JsonResponse(
+                serializer.errors,
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        validated_data = dict(serializer.validated_data)
+        validated_data.pop('password_confirmation')
+        password = validated_data.pop('password')
+
+        user = User(**validated_data)
+        await user.aset_password(password)
+        try:
+            await sync_to_async(save_new_user)(user)
+        except IntegrityError:
+            return JsonResponse(
+                {'email': ['Email already registered']},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        return JsonResponse({
+            'message': 'User registered successfully',
+            'user_id': user.id,
+            'email': user.email
+        }, status=status.HTTP_201_CREATED)
+
+
+class AsyncLoginView(AsyncAPIView):
+    """
+    POST /api/async/auth/login/
+    Async variant of LoginView; bcrypt runs on the hashing pool while the
+    event loop keeps serving other requests
+    """
+    async def post(self, request):
+        serializer = UserLoginSerializer(data=parse_json(request))
+
+        if not serializer.is_valid():
+            return JsonResponse(
+                serializer.errors,
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        email = User.normalize_email(serializer.validated_data['email'])
+        password = serializer.validated_data['password']
+
+        # The throttle may live in a shared cache backend
+        wait = await sync_to_async(login_throttle.check)(
+            get_client_ip(request), email
+        )
+        if wait:
+            response = JsonResponse(
+                {'error': 'Too many login attempts, please retry later'},
+                status=status.HTTP_429_TOO_MANY_REQUESTS
+            )
+            response['Retry-After'] = str(math.ceil(wait))
+            return response
+
+        try:
+            user = await User.objects.aget(email=email)
+        except User.DoesNotExist:
+            return JsonResponse(
+                {'error': 'Invalid credentials'},
+                status=status.HTTP_401_UNAUTHORIZED
+            )
+
+        if not user.is_active:
+            return JsonResponse(
+                {'error': 'Account is deactivated'},
+                status=status.HTTP_401_UNAUTHORIZED
+            )
+
+        if not await user.acheck_password(password):
+            return JsonResponse(
+                {'error': 'Invalid credentials'},
+                status=status.HTTP_401_UNAUTHORIZED
+            )
+
+        await sync_to_async(login_throttle.reset)(email)
+
+        if user.needs_rehash():
+            rehash_in_background(user, password)
+
+        token, refresh_token, session = await sync_to_async(issue_credentials)(
+            user, serializer.validated_data['use_session']
+        )
+
+        data = {
+            'token': token,
+            'refresh_token': refresh_token,
+            'expires_in': settings.JWT_ACCESS_TOKEN_MINUTES * 60,
+            'user_id': user.id,
+            'email': user.email,
+            'first_name': user.first_name,
+            'last_name': user.last_name
+        }
+        if session is not None:
+            data['session_id'] = session.session_id
+
+        response = JsonResponse(data, status=status.HTTP_200_OK)
+        if session is not None:
+            response.set_cookie(
+                settings.AUTH_SESSION_COOKIE_NAME,
+                session.session_id,
+                max_age=settings.SESSION_EXPIRATION_HOURS * 3600,
+                secure=settings.SESSION_COOKIE_SECURE,
+                httponly=True,
+                samesite='Strict'
+            )
+        return response
+
+
+class AsyncTokenRefreshView(AsyncAPIView):
+    """
+    POST /api/async/auth/token/refresh/
+    Async variant of TokenRefreshView
+    """
+    async def post(self, request):
+        serializer = TokenRefreshSerializer(data=parse_json(request))
+
+        if not serializer.is_valid():
+            return JsonResponse(
+                serializer.errors,
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        # Rotation locks the token row in a transaction
+        user, refresh_token = await sync_to_async(RefreshToken.rotate)(
+            serializer.validated_data['refresh_token']
+        )
+        if user is None:
+            return JsonResponse(
+                {'error': 'Invalid or expired refresh token'},
+                status=status.HTTP_401_UNAUTHORIZED
+            )
+
+        token = await sync_to_async(user.generate_token)()
+        return JsonResponse({
+            'token': token,
+            'refresh_token': refresh_token,
+            'expires_in': settings.JWT_ACCESS_TOKEN_MINUTES * 60
+        }, status=status.HTTP_200_OK)
+
+
+class AsyncProfileView(AsyncAPIView):
+    """
+    GET /api/async/auth/profile/
+    Async variant of ProfileView (read-only)
+    """
+    async def get(self, request):
+        if not hasattr(request, 'user') or request.user is None:
+            return JsonResponse(
+                {'error': 'Authentication required'},
+                status=status.HTTP_401_UNAUTHORIZED
+            )
+
+        # request.user loads lazily with a sync query; fetch the row here
+        try:
+            user = await User.objects.aget(id=request.user.id)
+        except User.DoesNotExist:
+            return JsonResponse(
+                {'error': 'Authentication required'},
+                status=status.HTTP_401_UNAUTHORIZED
+            )
+
+        return JsonResponse(
+            UserProfileSerializer(user).data,
+            status=status.HTTP_200_OK
+        )
@@ -0,0 +1,17 @@
+from rest_framework.authentication import BaseAuthentication
+
+
+class MiddlewareAuthentication(BaseAuthentication):
+    """
+    Hand the user resolved by CustomAuthMiddleware to DRF.
+
+    DRF replaces request.user with the result of its own authentication
+    classes, so without this APIViews would see UNAUTHENTICATED_USER (None)
+    even for a valid token or session.
+    """
+
+    def authenticate(self, request):
+        user = getattr(request._request, 'user', None)
+        if user is None:
+            return None
+        return (user, None)
@@ -0,0 +1,210 @@
+import csv
+import json
+import time
+from itertools import islice, repeat
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+
+from authorization.models import Role, UserRole
+from .hashing import _hashpw
+from .models import User
+from .serializers import UserImportSerializer
+
+
+def read_records(lines, fmt):
+    """
+    Yield (line_number, record) pairs from an iterable of text lines.
+    fmt is 'csv' (with a header row) or 'jsonl'; unparseable JSON lines
+    yield None as the record.
+    """
+    if fmt == 'csv':
+        reader = csv.DictReader(lines)
+        for record in reader:
+            yield reader.line_num, record
+    elif fmt == 'jsonl':
+        for number, line in enumerate(lines, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError:
+                record = None
+            yield number, record
+    else:
+        raise ValueError(f'Unsupported format: {fmt}')
+
+
+class ImportReport:
+    """Counters and timings for one import run"""
+
+    def __init__(self, max_errors=100):
+        self.max_errors = max_errors
+        self.read = 0
+        self.created = 0
+        self.duplicates = 0
+        self.invalid = 0
+        self.roles_assigned = 0
+        self.hash_seconds = 0.0
+        self.write_seconds = 0.0
+        self.elapsed = 0.0
+        self.errors = []
+
+    def add_error(self, line, error):
+        self.invalid += 1
+        if len(self.errors) < self.max_errors:
+            self.errors.append({'line': line, 'error': error})
+
+    @property
+    def rate(self):
+        """Users created per second"""
+        return self.created / self.elapsed if self.elapsed > 0 else 0.0
+
+    def as_dict(self):
+        return {
+            'read': self.read,
+            'created': self.created,
+            'duplicates': self.duplicates,
+            'invalid': self.invalid,
+            'roles_assigned': self.roles_assigned,
+            'hash_seconds': round(self.hash_seconds, 3),
+            'write_seconds': round(self.write_seconds, 3),
+            'elapsed_seconds': round(self.elapsed, 3),
+            'users_per_second': round(self.rate, 1),
+            'errors': self.errors,
+        }
+
+
+def import_users(records, executor=None, chunk_size=1000, default_role=None,
+                 max_errors=100, report=None):
+    """
+    Create users from (line_number, record) pairs in chunks.
+
+    Per chunk: records are validated in memory, emails already taken are
+    found with a single query, passwords are hashed via executor.map (a
+    process pool or hash_executor; serially if None), and users plus their UserRole
+    rows are inserted with bulk_create in one transaction. Records may name
+    a role; default_role applies to those that don't.
+
+    Returns an ImportReport. Chunks are committed as they go, so a caller
+    that may see the executor fail can pass its own report to learn what
+    was imported before the failure.
+    """
+    if report is None:
+        report = ImportReport(max_errors=max_errors)
+    started = time.monotonic()
+
+    role_ids = dict(Role.objects.values_list('name', 'id'))
+    if default_role and default_role not in role_ids:
+        raise ValueError(f'Unknown role: {default_role}')
+
+    seen = set()
+    records = iter(records)
+    while True:
+        chunk = list(islice(records, chunk_size))
+        if not chunk:
+            break
+
+        rows = []
+        for line, record in chunk:
+            report.read += 1
+            if not isinstance(record, dict):
+                report.add_error(line, 'Invalid record')
+                continue
+
+            serializer = UserImportSerializer(data=record)
+            if not serializer.is_valid():
+                report.add_error(line, {
+                    field: [str(message) for message in messages]
+                    for field, messages in serializer.errors.items()
+                })
+                continue
+
+            data = dict(serializer.validated_data)
+            role_name = data.pop('role', '') or default_role
+            if role_name and role_name not in role_ids:
+                report.add_error(line, f'Unknown role: {role_name}')
+                continue
+
+            # Repeated within the input - keep the first occurrence
+            if data['email'] in seen:
+                report.duplicates += 1
+                continue
+            seen.add(data['email'])
+            rows.append((data, role_ids.get(role_name)))
+
+        try:
+            _import_chunk(rows, executor, report)
+        finally:
+            report.elapsed = time.monotonic() - started
+
+    return report
+
+
+def _drop_existing(rows):
+    """Split off rows whose email is already registered (one query)"""
+    emails = [data['email'] for data, _ in rows]
+    existing = set(
+        User.objects.filter(email__in=emails).values_list('email', flat=True)
+    )
+    return [row for row in rows if row[0]['email'] not in existing], len(existing)
+
+
+def _import_chunk(rows, executor, report):
+    if not rows:
+        return
+
+    rows, duplicates = _drop_existing(rows)
+    report.duplicates += duplicates
+    if not rows:
+        return
+
+    started = time.monotonic()
+    passwords = [data.pop('password') for data, _ in rows]
+    rounds = settings.BCRYPT_ROUNDS
+    if executor is None:
+        hashes = [_hashpw(password, rounds) for password in passwords]
+    else:
+        hashes = list(executor.map(_hashpw, passwords, repeat(rounds)))
+    for (data, _), password_hash in zip(rows, hashes):
+        data['password_hash'] = password_hash
+    report.hash_seconds += time.monotonic() - started
+
+    started = time.monotonic()
+    try:
+        created, assigned = _insert(rows)
+    except IntegrityError:
+        # Someone registered one of these emails since the check - retry once
+        rows, duplicates = _drop_existing(rows)
+        report.duplicates += duplicates
+        created, assigned = _insert(rows)
+    report.created += created
+    report.roles_assigned += assigned
+    report.write_seconds += time.monotonic() - started
+
+
+def _insert(rows):
+    if not rows:
+        return 0, 0
+
+    users = [User(**data) for data, _ in rows]
+    with transaction.atomic():
+        User.objects.bulk_create(users)
+        if any(user.pk is None for user in users):
+            # Backend can't return ids from a bulk insert; fetch them
+            ids = dict(
+                User.objects.filter(
+                    email__in=[user.email for user in users]
+                ).values_list('email', 'id')
+            )
+            for user in users:
+                user.pk = ids[user.email]
+
+        assignments = [
+            UserRole(user_id=user.pk, role_id=role_id)
+            for user, (_, role_id) in zip(users, rows)
+            if role_id is not None
+        ]
+        UserRole.objects.bulk_create(assignments)
+    return len(users), len(assignments)
@@ -0,0 +1,354 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+from django.conf import settings
+from django.core.cache import caches
+
+
+class TokenCache:
+    """
+    Bounded per-process LRU cache of verified JWT payloads.
+
+    Entries are keyed by a SHA-256 digest of the raw token (so tokens are never
+    held in memory verbatim) and are kept until the token's `exp` claim. A hit
+    skips signature verification and claim parsing entirely.
+    """
+
+    def __init__(self, max_size=10000):
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(token):
+        """Digest used as the cache key for a raw token"""
+        return hashlib.sha256(token.encode('utf-8')).digest()
+
+    def get(self, token):
+        """Return the cached payload for token, or None on a miss"""
+        key = self.make_key(token)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            expires_at, payload = entry
+            if expires_at <= time.time():
+                # Token expired since it was cached - drop it and re-verify
+                del self._entries[key]
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return payload
+
+    def set(self, token, payload):
+        """Cache a verified payload until its exp claim"""
+        if self.max_size <= 0 or 'exp' not in payload:
+            return
+
+        key = self.make_key(token)
+        with self._lock:
+            self._entries[key] = (payload['exp'], payload)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def discard(self, token):
+        """Remove a single token from the cache"""
+        with self._lock:
+            self._entries.pop(self.make_key(token), None)
+
+    def clear(self):
+        """Drop all entries and reset counters"""
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self):
+        """Return size and hit/miss counters"""
+        with self._lock:
+            return {
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'hits': self.hits,
+                'misses': self.misses,
+            }
+
+
+class Principal(namedtuple(
+    'Principal', ['id', 'email', 'is_active', 'token_version', 'role_ids']
+)):
+    """
+    Immutable snapshot of the fields needed to authenticate and authorize a
+    request, so the full User row does not have to be loaded per call
+    """
+    __slots__ = ()
+
+    @classmethod
+    def from_user(cls, user):
+        """Build a snapshot from a User instance (one query for role ids)"""
+        role_ids = user.user_roles.values_list('role_id', flat=True)
+        return cls(
+            user.id,
+            user.email,
+            user.is_active,
+            user.token_version,
+            frozenset(role_ids)
+        )
+
+    @classmethod
+    async def afrom_user(cls, user):
+        """Async variant of from_user()"""
+        role_ids = [
+            role_id async for role_id in
+            user.user_roles.values_list('role_id', flat=True)
+        ]
+        return cls(
+            user.id,
+            user.email,
+            user.is_active,
+            user.token_version,
+            frozenset(role_ids)
+        )
+
+
+class PrincipalCache:
+    """
+    Two-tier cache of Principal snapshots keyed by user id.
+
+    The first tier is a bounded in-process dict with a TTL. The optional second
+    tier is a shared Django cache backend (any alias from CACHES), so workers
+    can warm each other.
+
+    get() answers from the in-process tier first, so invalidate() alone only
+    reaches the calling worker (and the shared tier). Writes that other
+    workers must see straight away also bump the policy version, whose
+    watcher clear()s every worker's in-process tier (see signals.py).
+    """
+
+    key_prefix = 'principal:'
+
+    def __init__(self, ttl=30, max_size=10000, backend=''):
+        self.ttl = ttl
+        self.max_size = max_size
+        self.backend = backend
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def shared(self):
+        """Shared cache backend, or None when running in-process only"""
+        if not self.backend:
+            return None
+        return caches[self.backend]
+
+    def get(self, user_id):
+        """Return the cached Principal for user_id, or None on a miss"""
+        principal = self._get_local(user_id)
+        if principal is not None:
+            return principal
+
+        shared = self.shared
+        if shared is not None:
+            principal = shared.get(self.key_prefix + str(user_id))
+            if principal is not None:
+                self._store_local(user_id, principal)
+                with self._lock:
+                    self.hits += 1
+                return principal
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    async def aget(self, user_id):
+        """Async variant of get() using the shared backend's async API"""
+        principal = self._get_local(user_id)
+        if principal is not None:
+            return principal
+
+        shared = self.shared
+        if shared is not None:
+            principal = await shared.aget(self.key_prefix + str(user_id))
+            if principal is not None:
+                self._store_local(user_id, principal)
+                with self._lock:
+                    self.hits += 1
+                return principal
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def set(self, principal):
+        """Cache a snapshot in both tiers"""
+        if self.ttl <= 0:
+            return
+        self._store_local(principal.id, principal)
+        shared = self.shared
+        if shared is not None:
+            shared.set(self.key_prefix + str(principal.id), principal, self.ttl)
+
+    async def aset(self, principal):
+        """Async variant of set()"""
+        if self.ttl <= 0:
+            return
+        self._store_local(principal.id, principal)
+        shared = self.shared
+        if shared is not None:
+            await shared.aset(
+                self.key_prefix + str(principal.id), principal, self.ttl
+            )
+
+    def invalidate(self, user_id):
+        """
+        Drop a user's snapshot from this process and the shared tier; other
+        workers keep theirs until the TTL or the next policy version bump
+        """
+        with self._lock:
+            self._entries.pop(user_id, None)
+        shared = self.shared
+        if shared is not None:
+            shared.delete(self.key_prefix + str(user_id))
+
+    def clear(self):
+        """Drop all in-process entries and reset counters"""
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self):
+        """Return size and hit/miss counters for the in-process tier"""
+        with self._lock:
+            return {
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+            }
+
+    def _get_local(self, user_id):
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None:
+                expires_at, principal = entry
+                if expires_at > time.monotonic():
+                    self._entries.move_to_end(user_id)
+                    self.hits += 1
+                    return principal
+                del self._entries[user_id]
+        return None
+
+    def _store_local(self, user_id, principal):
+        with self._lock:
+            self._entries[user_id] = (time.monotonic() + self.ttl, principal)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+
+class CachedSession(namedtuple(
+    'CachedSession', ['pk', 'user_id', 'expire_at', 'written_at']
+)):
+    """
+    Cached view of a Session row. expire_at is the sliding expiry as known to
+    this process; written_at is when it was last persisted.
+    """
+    __slots__ = ()
+
+
+class SessionCache:
+    """
+    Bounded per-process read-through cache of sessions keyed by session id.
+
+    Entries are dropped after ttl seconds so sessions deleted by another
+    worker stop authenticating within that window; deletes made by this
+    process are discarded immediately (see signals).
+    """
+
+    def __init__(self, ttl=30, max_size=10000):
+        self.ttl = ttl
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, session_id):
+        """Return the CachedSession for session_id, or None on a miss"""
+        with self._lock:
+            entry = self._entries.get(session_id)
+            if entry is not None:
+                cached_until, session = entry
+                if cached_until > time.monotonic():
+                    self._entries.move_to_end(session_id)
+                    self.hits += 1
+                    return session
+                del self._entries[session_id]
+            self.misses += 1
+            return None
+
+    def set(self, session_id, session, refresh_ttl=True):
+        """
+        Cache (or update) a session. With refresh_ttl=False an existing
+        entry keeps its original cache deadline.
+        """
+        if self.ttl <= 0:
+            return
+        with self._lock:
+            cached_until = time.monotonic() + self.ttl
+            if not refresh_ttl and session_id in self._entries:
+                cached_until = self._entries[session_id][0]
+            self._entries[session_id] = (cached_until, session)
+            self._entries.move_to_end(session_id)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def discard(self, session_id):
+        """Remove a session from the cache"""
+        with self._lock:
+            self._entries.pop(session_id, None)
+
+    def clear(self):
+        """Drop all entries and reset counters"""
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self):
+        """Return size and hit/miss counters"""
+        with self._lock:
+            return {
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+            }
+
+
+token_cache = TokenCache(max_size=settings.JWT_CACHE_SIZE)
+
+principal_cache = PrincipalCache(
+    ttl=settings.PRINCIPAL_CACHE_TTL,
+    max_size=settings.PRINCIPAL_CACHE_SIZE,
+    backend=settings.PRINCIPAL_CACHE_BACKEND,
+)
+
+session_cache = SessionCache(
+    ttl=settings.SESSION_CACHE_TTL,
+    max_size=settings.SESSION_CACHE_SIZE,
+)
@@ -0,0 +1,44 @@
+import hashlib
+
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, parse_etags
+
+
+def make_etag(*parts):
+    """Strong ETag over the given parts"""
+    digest = hashlib.sha256(repr(parts).encode('utf-8')).hexdigest()[:32]
+    return f'"{digest}"'
+
+
+def etag_matches(request, etag):
+    """
+    True if If-None-Match names exactly this ETag. A bare `*` does not count,
+    so callers can rely on a match meaning the client already holds this
+    representation.
+    """
+    header = request.META.get('HTTP_IF_NONE_MATCH')
+    return bool(header) and etag in parse_etags(header)
+
+
+def not_modified(request, etag=None, last_modified=None):
+    """
+    Return a 304 (or 412) response if the request's conditional headers
+    match the validators, otherwise None. last_modified is a datetime.
+    """
+    timestamp = int(last_modified.timestamp()) if last_modified else None
+    response = get_conditional_response(
+        request, etag=etag, last_modified=timestamp
+    )
+    if response is not None:
+        set_validators(response, etag, last_modified)
+    return response
+
+
+def set_validators(response, etag=None, last_modified=None):
+    """Attach ETag/Last-Modified; per-user data must be revalidated"""
+    if etag:
+        response['ETag'] = etag
+    if last_modified:
+        response['Last-Modified'] = http_date(last_modified.timestamp())
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
@@ -1,10 +1,25 @@
 from rest_framework.views import exception_handler
+from rest_framework.exceptions import APIException
 from rest_framework.response import Response
 from rest_framework import status
 from django.core.exceptions import PermissionDenied
 from django.http import Http404
 
 
+class HashingUnavailable(APIException):
+    """
+    Raised when the password hashing pool is saturated.
+    DRF turns `wait` into a Retry-After header.
+    """
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = 'Server is busy, please retry shortly'
+    default_code = 'hashing_unavailable'
+
+    def __init__(self, detail=None, code=None, wait=None):
+        super().__init__(detail, code)
+        self.wait = wait
+
+
 def custom_exception_handler(exc, context):
     """
     Custom exception handler for consistent error responses across the API
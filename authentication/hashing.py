@@ -0,0 +1,250 @@
+import asyncio
+import logging
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import bcrypt
+from django.conf import settings
+from django.db import connections
+
+from .exceptions import HashingUnavailable
+
+
+logger = logging.getLogger(__name__)
+
+
+class HashExecutor:
+    """
+    Bounded thread pool for bcrypt work.
+
+    At most pool_size hashes run at once and at most queue_depth more may wait
+    for a thread; anything beyond that is rejected immediately with
+    HashingUnavailable (503 + Retry-After) instead of tying up the request
+    worker. bcrypt releases the GIL, so the pool also keeps hashing off the
+    threads serving cheap authenticated reads.
+    """
+
+    def __init__(self, pool_size=4, queue_depth=32, retry_after=1):
+        self.pool_size = pool_size
+        self.queue_depth = queue_depth
+        self.retry_after = retry_after
+        self._slots = threading.BoundedSemaphore(max(pool_size + queue_depth, 1))
+        self._executor = None
+        self._pid = None
+        self._lock = threading.Lock()
+        self._metrics_lock = threading.Lock()
+        self.rejected = 0
+        self.completed = 0
+        self.in_flight = 0
+        self.queue_wait_total = 0.0
+        self.queue_wait_max = 0.0
+        self.hash_time_total = 0.0
+        self.hash_time_max = 0.0
+
+    def _get_executor(self):
+        # Threads do not survive fork(), so pre-forking servers get a fresh pool
+        if self._executor is None or self._pid != os.getpid():
+            with self._lock:
+                if self._executor is None or self._pid != os.getpid():
+                    self._executor = ThreadPoolExecutor(
+                        max_workers=self.pool_size,
+                        thread_name_prefix='bcrypt'
+                    )
+                    self._pid = os.getpid()
+        return self._executor
+
+    def run(self, func, *args):
+        """Run func(*args) on the pool and wait for the result"""
+        if self.pool_size <= 0:
+            return self._timed(func, args, time.monotonic())
+
+        future = self.submit(func, *args)
+        if future is None:
+            raise HashingUnavailable(wait=self.retry_after)
+        return future.result()
+
+    async def arun(self, func, *args):
+        """Async variant of run(): await the pool without blocking the event loop"""
+        if self.pool_size <= 0:
+            return self._timed(func, args, time.monotonic())
+
+        future = self.submit(func, *args)
+        if future is None:
+            raise HashingUnavailable(wait=self.retry_after)
+        return await asyncio.wrap_future(future)
+
+    def map(self, func, *iterables):
+        """
+        Like Executor.map(), for batches (bulk imports): keeps at most
+        pool_size of the batch's calls queued or running, so the queue stays
+        free for logins. Raises HashingUnavailable if the pool is full.
+        """
+        if self.pool_size <= 0:
+            return [self._timed(func, args, time.monotonic()) for args in zip(*iterables)]
+
+        results = []
+        pending = deque()
+        try:
+            for args in zip(*iterables):
+                if len(pending) >= self.pool_size:
+                    results.append(pending.popleft().result())
+                future = self.submit(func, *args)
+                if future is None:
+                    raise HashingUnavailable(wait=self.retry_after)
+                pending.append(future)
+            results.extend(future.result() for future in pending)
+        except BaseException:
+            for future in pending:
+                future.cancel()
+            raise
+        return results
+
+    def submit(self, func, *args):
+        """
+        Queue func(*args) without waiting for it.
+        Returns a Future, or None if the pool and queue are full (or the
+        pool is disabled).
+        """
+        if self.pool_size <= 0:
+            return None
+
+        if not self._slots.acquire(blocking=False):
+            with self._metrics_lock:
+                self.rejected += 1
+            return None
+
+        with self._metrics_lock:
+            self.in_flight += 1
+        try:
+            future = self._get_executor().submit(
+                self._timed, func, args, time.monotonic()
+            )
+        except Exception:
+            self._release()
+            raise
+        future.add_done_callback(lambda _: self._release())
+        return future
+
+    def _release(self):
+        with self._metrics_lock:
+            self.in_flight -= 1
+        self._slots.release()
+
+    def _timed(self, func, args, submitted_at):
+        started_at = time.monotonic()
+        try:
+            return func(*args)
+        finally:
+            finished_at = time.monotonic()
+            queue_wait = started_at - submitted_at
+            hash_time = finished_at - started_at
+            with self._metrics_lock:
+                self.completed += 1
+                self.queue_wait_total += queue_wait
+                self.queue_wait_max = max(self.queue_wait_max, queue_wait)
+                self.hash_time_total += hash_time
+                self.hash_time_max = max(self.hash_time_max, hash_time)
+
+    def stats(self):
+        """Return pool configuration plus queue-wait and hash-time metrics"""
+        with self._metrics_lock:
+            completed = self.completed
+            return {
+                'pool_size': self.pool_size,
+                'queue_depth': self.queue_depth,
+                'completed': completed,
+                'rejected': self.rejected,
+                'in_flight': self.in_flight,
+                'queue_wait_total_ms': self.queue_wait_total * 1000,
+                'queue_wait_avg_ms': (
+                    self.queue_wait_total / completed * 1000 if completed else 0.0
+                ),
+                'queue_wait_max_ms': self.queue_wait_max * 1000,
+                'hash_time_avg_ms': (
+                    self.hash_time_total / completed * 1000 if completed else 0.0
+                ),
+                'hash_time_max_ms': self.hash_time_max * 1000,
+                'hash_time_total_ms': self.hash_time_total * 1000,
+            }
+
+
+hash_executor = HashExecutor(
+    pool_size=settings.BCRYPT_POOL_SIZE,
+    queue_depth=settings.BCRYPT_QUEUE_DEPTH,
+    retry_after=settings.BCRYPT_RETRY_AFTER,
+)
+
+
+def _hashpw(raw_password, rounds):
+    salt = bcrypt.gensalt(rounds=rounds)
+    return bcrypt.hashpw(raw_password.encode('utf-8'), salt).decode('utf-8')
+
+
+def hash_password(raw_password):
+    """Hash a password with bcrypt on the bounded executor"""
+    return hash_executor.run(_hashpw, raw_password, settings.BCRYPT_ROUNDS)
+
+
+def verify_password(raw_password, password_hash):
+    """Check a password against a bcrypt hash on the bounded executor"""
+    return hash_executor.run(
+        bcrypt.checkpw,
+        raw_password.encode('utf-8'),
+        password_hash.encode('utf-8')
+    )
+
+
+async def ahash_password(raw_password):
+    """Async variant of hash_password()"""
+    return await hash_executor.arun(_hashpw, raw_password, settings.BCRYPT_ROUNDS)
+
+
+async def averify_password(raw_password, password_hash):
+    """Async variant of verify_password()"""
+    return await hash_executor.arun(
+        bcrypt.checkpw,
+        raw_password.encode('utf-8'),
+        password_hash.encode('utf-8')
+    )
+
+
+def hash_cost(password_hash):
+    """Return the cost (log2 rounds) encoded in a bcrypt hash, or None"""
+    try:
+        return int(password_hash.split('$')[2])
+    except (AttributeError, IndexError, ValueError):
+        return None
+
+
+def needs_rehash(password_hash):
+    """True if the hash was made with a cost other than BCRYPT_ROUNDS"""
+    return hash_cost(password_hash) != settings.BCRYPT_ROUNDS
+
+
+def rehash_in_background(user, raw_password):
+    """
+    Re-hash a user's password at the target cost on the hashing pool without
+    blocking the caller. The write is skipped if the stored hash changed in
+    the meantime, and the job is dropped if the pool is saturated (it will be
+    retried on a later login).
+    """
+    model = type(user)
+    user_id = user.pk
+    old_hash = user.password_hash
+    rounds = settings.BCRYPT_ROUNDS
+
+    def rehash():
+        try:
+            model.objects.filter(pk=user_id, password_hash=old_hash).update(
+                password_hash=_hashpw(raw_password, rounds)
+            )
+        except Exception:
+            logger.exception('Background password rehash failed for user %s', user_id)
+        finally:
+            # Pool threads are not request threads; release their connection
+            connections.close_all()
+
+    return hash_executor.submit(rehash)
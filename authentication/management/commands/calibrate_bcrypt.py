@@ -0,0 +1,61 @@
+import statistics
+import time
+
+import bcrypt
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = 'Measures bcrypt hash time on this machine and recommends BCRYPT_ROUNDS'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--target-ms',
+            type=float,
+            default=250,
+            help='Hash time budget per password in milliseconds (default: 250)'
+        )
+        parser.add_argument(
+            '--samples',
+            type=int,
+            default=3,
+            help='Hashes measured per cost (default: 3)'
+        )
+        parser.add_argument('--min-cost', type=int, default=4)
+        parser.add_argument('--max-cost', type=int, default=16)
+
+    def handle(self, *args, **options):
+        target_ms = options['target_ms']
+        samples = max(options['samples'], 1)
+        password = b'calibration-password'
+
+        self.stdout.write(self.style.WARNING(
+            f'Calibrating bcrypt for a {target_ms:.0f} ms budget...'
+        ))
+
+        recommended = options['min_cost']
+        for cost in range(options['min_cost'], options['max_cost'] + 1):
+            timings = []
+            for _ in range(samples):
+                started = time.perf_counter()
+                bcrypt.hashpw(password, bcrypt.gensalt(rounds=cost))
+                timings.append((time.perf_counter() - started) * 1000)
+            median_ms = statistics.median(timings)
+
+            within_budget = median_ms <= target_ms
+            style = self.style.SUCCESS if within_budget else self.style.WARNING
+            self.stdout.write(style(f'  cost {cost:2d}: {median_ms:8.1f} ms'))
+
+            if not within_budget:
+                break
+            recommended = cost
+
+        self.stdout.write('\n' + '=' * 60)
+        self.stdout.write(f'  Current BCRYPT_ROUNDS: {settings.BCRYPT_ROUNDS}')
+        self.stdout.write(self.style.SUCCESS(f'  Recommended BCRYPT_ROUNDS: {recommended}'))
+        if recommended != settings.BCRYPT_ROUNDS:
+            self.stdout.write(
+                '  Existing hashes are rehashed to the new cost on next login.'
+            )
+        self.stdout.write('=' * 60 + '\n')
@@ -0,0 +1,56 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count
+from django.db.models.functions import Lower, Trim
+
+from authentication.models import User
+
+
+class Command(BaseCommand):
+    help = (
+        'Lowercases stored emails so the users_email_lowercase constraint '
+        'can be applied to an existing database'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Report what would change without writing'
+        )
+
+    @transaction.atomic
+    def handle(self, *args, **options):
+        users = User.objects.annotate(normalized=Lower(Trim('email')))
+
+        # Addresses registered more than once in different case can't both
+        # be lowercased; those accounts have to be merged by hand
+        collisions = set(
+            users.values('normalized')
+            .annotate(accounts=Count('id'))
+            .filter(accounts__gt=1)
+            .values_list('normalized', flat=True)
+        )
+        for email in sorted(collisions):
+            variants = ', '.join(
+                User.objects.filter(email__iexact=email).values_list('email', flat=True)
+            )
+            self.stdout.write(self.style.ERROR(f'  ✗ Skipped {email}: {variants}'))
+
+        pending = list(
+            users.exclude(normalized__in=collisions)
+            .exclude(email=Lower(Trim('email')))
+            .values_list('pk', flat=True)
+        )
+        if options['dry_run']:
+            self.stdout.write(self.style.WARNING(
+                f'Dry run: {len(pending)} emails would be lowercased'
+            ))
+            return
+
+        updated = User.objects.filter(pk__in=pending).update(email=Lower(Trim('email')))
+        self.stdout.write(self.style.SUCCESS(f'  ✓ Lowercased {updated} emails'))
+        if collisions:
+            self.stdout.write(self.style.WARNING(
+                f'{len(collisions)} addresses need merging before migrating'
+            ))
@@ -1,6 +1,6 @@
 from django.core.management.base import BaseCommand
 from authentication.models import User
-from authorization.models import Role, BusinessElement, AccessRoleRule, UserRole
+from authorization.models import Role, RoleInheritance, BusinessElement, AccessRoleRule, UserRole
 from django.db import transaction
 
 
@@ -14,6 +14,7 @@ class Command(BaseCommand):
         # Clear existing data (in correct order due to foreign keys)
         AccessRoleRule.objects.all().delete()
         UserRole.objects.all().delete()
+        RoleInheritance.objects.all().delete()
         BusinessElement.objects.all().delete()
         Role.objects.all().delete()
         User.objects.all().delete()
@@ -46,6 +47,14 @@ class Command(BaseCommand):
         )
         self.stdout.write(self.style.SUCCESS('  ✓ Created role: guest'))
 
+        # ==================== ROLE HIERARCHY ====================
+        # admin > manager > guest: each role also gets its parent's grants.
+        # user stays separate - it may only touch its own products, while
+        # guests read all of them.
+        RoleInheritance.objects.create(role=admin_role, parent=manager_role)
+        RoleInheritance.objects.create(role=manager_role, parent=guest_role)
+        self.stdout.write(self.style.SUCCESS('  ✓ Role hierarchy: admin > manager > guest'))
+
         self.stdout.write(self.style.SUCCESS('\nCreating business elements...'))
         
         # ==================== CREATE BUSINESS ELEMENTS ====================
@@ -82,31 +91,39 @@ class Command(BaseCommand):
         self.stdout.write(self.style.SUCCESS('\nCreating access rules...'))
 
         # ==================== ADMIN ROLE - Full access to everything ====================
+        # Everything a manager (and so a guest) may do is inherited; these
+        # rules only add what managers lack
         rule_count = 0
-        for element in [products_elem, users_elem, orders_elem, stores_elem, access_rules_elem]:
-            AccessRoleRule.objects.create(
-                role=admin_role,
-                element=element,
-                read_permission=False,
-                read_all_permission=True,
-                create_permission=True,
-                update_permission=False,
-                update_all_permission=True,
-                delete_permission=False,
-                delete_all_permission=True
-            )
+        admin_grants = [
+            (products_elem, {'delete_all_permission': True}),
+            (orders_elem, {'delete_all_permission': True}),
+            (stores_elem, {'update_all_permission': True, 'delete_all_permission': True}),
+            (users_elem, {
+                'create_permission': True,
+                'update_all_permission': True,
+                'delete_all_permission': True,
+            }),
+            (access_rules_elem, {
+                'read_all_permission': True,
+                'create_permission': True,
+                'update_all_permission': True,
+                'delete_all_permission': True,
+            }),
+        ]
+        for element, grants in admin_grants:
+            AccessRoleRule.objects.create(role=admin_role, element=element, **grants)
             rule_count += 1
         self.stdout.write(self.style.SUCCESS(f'  ✓ Created {rule_count} rules for admin'))
 
         # ==================== MANAGER ROLE - Extended permissions ====================
         rule_count = 0
         
-        # Products: Full read, create, update all, but no delete
+        # Products: create, update all, but no delete (read all from guest)
         AccessRoleRule.objects.create(
             role=manager_role,
             element=products_elem,
             read_permission=False,
-            read_all_permission=True,
+            read_all_permission=False,
             create_permission=True,
             update_permission=False,
             update_all_permission=True,
@@ -129,12 +146,12 @@ class Command(BaseCommand):
         )
         rule_count += 1
         
-        # Stores: Full read and create
+        # Stores: create and update own (read all from guest)
         AccessRoleRule.objects.create(
             role=manager_role,
             element=stores_elem,
             read_permission=False,
-            read_all_permission=True,
+            read_all_permission=False,
             create_permission=True,
             update_permission=True,
             update_all_permission=False,
@@ -322,6 +339,7 @@ class Command(BaseCommand):
         
         self.stdout.write(self.style.WARNING('\n📊 Summary:'))
         self.stdout.write(f'  • Roles: {Role.objects.count()}')
+        self.stdout.write(f'  • Role Inheritance Edges: {RoleInheritance.objects.count()}')
         self.stdout.write(f'  • Business Elements: {BusinessElement.objects.count()}')
         self.stdout.write(f'  • Access Rules: {AccessRoleRule.objects.count()}')
         self.stdout.write(f'  • Users: {User.objects.count()}')
@@ -0,0 +1,42 @@
+from django.core.management.base import BaseCommand
+
+from authentication.sweeper import sweep_expired_sessions
+
+
+class Command(BaseCommand):
+    help = 'Deletes expired sessions in bounded batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Rows deleted per statement (default: 1000)'
+        )
+        parser.add_argument(
+            '--pause',
+            type=float,
+            default=0.0,
+            help='Seconds to sleep between batches (default: 0)'
+        )
+        parser.add_argument(
+            '--max-batches',
+            type=int,
+            default=None,
+            help='Stop after this many batches (default: until done)'
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write(self.style.WARNING('Sweeping expired sessions...'))
+
+        deleted, elapsed = sweep_expired_sessions(
+            batch_size=max(options['batch_size'], 1),
+            pause=options['pause'],
+            max_batches=options['max_batches'],
+        )
+
+        rate = deleted / elapsed if elapsed > 0 else 0.0
+        self.stdout.write(self.style.SUCCESS(
+            f'  ✓ Deleted {deleted} expired sessions in {elapsed:.2f}s '
+            f'({rate:.0f} rows/sec)'
+        ))
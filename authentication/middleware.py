@@ -1,39 +1,305 @@
+import copy
+from datetime import timedelta
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.utils import timezone
 from django.utils.deprecation import MiddlewareMixin
-from .models import User
+from django.utils.functional import SimpleLazyObject, empty
+from authorization.context import authorization_context
+from authorization.policy import policy_version
+from .cache import CachedSession, Principal, principal_cache, session_cache, token_cache
+from .models import Session, User
+from .revocation import revocation_list
+from .sweeper import start_session_sweeper
+
+
+def get_token_payload(token):
+    """
+    Return verified claims for a JWT token, consulting the per-process
+    token cache before running a full signature check
+    """
+    payload = token_cache.get(token)
+    if payload is None:
+        payload = User.decode_payload(token)
+        if payload is not None:
+            token_cache.set(token, payload)
+    return payload
+
+
+def get_principal(user_id):
+    """
+    Return the Principal snapshot for user_id, reading through the principal
+    cache. Returns None if the user does not exist.
+    """
+    principal = principal_cache.get(user_id)
+    if principal is None:
+        try:
+            user = User.objects.get(id=user_id)
+        except User.DoesNotExist:
+            return None
+        principal = Principal.from_user(user)
+        principal_cache.set(principal)
+    return principal
+
+
+async def aget_token_payload(token):
+    """Async variant of get_token_payload()"""
+    payload = token_cache.get(token)
+    if payload is None:
+        # Signature verification is CPU work - keep it off the event loop
+        payload = await sync_to_async(
+            User.decode_payload, thread_sensitive=False
+        )(token)
+        if payload is not None:
+            token_cache.set(token, payload)
+    return payload
+
+
+async def aget_principal(user_id):
+    """Async variant of get_principal() using the async ORM"""
+    principal = await principal_cache.aget(user_id)
+    if principal is None:
+        try:
+            user = await User.objects.aget(id=user_id)
+        except User.DoesNotExist:
+            return None
+        principal = await Principal.afrom_user(user)
+        await principal_cache.aset(principal)
+    return principal
+
+
+def get_session_user_id(session_id):
+    """
+    Return the user id for a valid session, sliding its expiry forward.
+
+    Sessions are read through the session cache, and the new expire_at is
+    only written back when SESSION_TOUCH_SECONDS have passed since the last
+    write, so active sessions don't cost a DB write per request.
+    """
+    now = timezone.now()
+    session = session_cache.get(session_id)
+
+    if session is None or session.expire_at <= now:
+        # Miss, or expired as far as this process knows - another worker
+        # may have extended it, so check the database before rejecting
+        try:
+            row = Session.objects.get(session_id=session_id)
+        except Session.DoesNotExist:
+            session_cache.discard(session_id)
+            return None
+        if not row.is_valid():
+            session_cache.discard(session_id)
+            return None
+        session = CachedSession(row.pk, row.user_id, row.expire_at, now)
+        session_cache.set(session_id, session)
+
+    expire_at = now + timedelta(hours=settings.SESSION_EXPIRATION_HOURS)
+    written_at = session.written_at
+    if (now - written_at).total_seconds() >= settings.SESSION_TOUCH_SECONDS:
+        Session.objects.filter(pk=session.pk).update(expire_at=expire_at)
+        written_at = now
+    session_cache.set(
+        session_id,
+        session._replace(expire_at=expire_at, written_at=written_at),
+        refresh_ttl=False
+    )
+    return session.user_id
+
+
+class LazyUser(SimpleLazyObject):
+    """
+    Request user backed by a cached Principal.
+
+    id, email, is_active, token_version and role_ids are answered from the
+    snapshot; the full User row is only loaded when a view touches any other
+    field or method.
+    claims holds the verified token payload, if the user came from a JWT.
+
+    The lazy load is a synchronous query, so async views should fetch the
+    row themselves (User.objects.aget(id=request.user.id)) when they need it.
+    """
+
+    def __init__(self, principal, claims=None):
+        self.__dict__['principal'] = principal
+        self.__dict__['claims'] = claims
+        super().__init__(lambda: User.objects.get(id=principal.id))
+
+    @property
+    def id(self):
+        return self.principal.id
+
+    @property
+    def pk(self):
+        return self.principal.id
+
+    @property
+    def email(self):
+        return self.principal.email
+
+    @property
+    def is_active(self):
+        return self.principal.is_active
+
+    @property
+    def token_version(self):
+        return self.principal.token_version
+
+    @property
+    def role_ids(self):
+        return self.principal.role_ids
+
+    def __bool__(self):
+        # An authenticated user is always truthy; don't load the row to find out
+        return True
+
+    def __copy__(self):
+        if self._wrapped is empty:
+            return type(self)(self.principal, self.claims)
+        return copy.copy(self._wrapped)
+
+    def __deepcopy__(self, memo):
+        if self._wrapped is empty:
+            result = type(self)(self.principal, self.claims)
+            memo[id(self)] = result
+            return result
+        return copy.deepcopy(self._wrapped, memo)
 
 
 class CustomAuthMiddleware(MiddlewareMixin):
     """
-    Custom middleware to extract and validate JWT token from Authorization header
-    Sets request.user if token is valid, otherwise sets it to None
+    Custom middleware to extract and validate JWT token from Authorization header,
+    or a session id from the session cookie / X-Session-ID header
+    Sets request.user if token or session is valid, otherwise sets it to None,
+    and request.authz to the user's request-scoped AuthorizationContext
+
+    Runs natively under both WSGI and ASGI: in an async stack the principal
+    is loaded with the async ORM and token verification runs in a worker
+    thread, so the event loop is never blocked by auth.
     """
-    
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response=None):
+        super().__init__(get_response)
+        # Runs once per worker when the handler is built
+        start_session_sweeper(settings.SESSION_SWEEP_INTERVAL_SECONDS)
+
     def process_request(self, request):
         """
-        Extract and validate JWT token from Authorization header
+        Extract and validate JWT token from Authorization header,
+        falling back to session authentication when there is none
         """
+        # Pick up policy changes made by other workers (throttled read)
+        policy_version.check()
+
         # Initialize user as None
         request.user = None
-        
+
         # Get Authorization header
         auth_header = request.META.get('HTTP_AUTHORIZATION', '')
-        
+
         # Check if Authorization header exists and starts with 'Bearer '
         if auth_header.startswith('Bearer '):
             # Extract token
             token = auth_header.split(' ')[1]
-            
-            # Decode token and get user_id
-            user_id = User.decode_token(token)
-            
+
+            # Verify token (cached) and get user_id
+            payload = get_token_payload(token)
+            user_id = payload.get('user_id') if payload else None
+
+            # Reject tokens revoked by logout (in-memory Bloom filter check)
+            if user_id and 'jti' in payload and revocation_list.is_revoked(payload['jti']):
+                user_id = None
+
+            if user_id:
+                # Resolve user from the principal cache (DB on miss only)
+                principal = get_principal(user_id)
+                if (
+                    principal is not None
+                    and principal.is_active
+                    # Tokens minted before the last logout-all/password
+                    # change/deactivation carry an older version
+                    and payload.get('tv', 0) == principal.token_version
+                ):
+                    request.user = LazyUser(principal, claims=payload)
+
+        else:
+            # Session-based authentication
+            session_id = (
+                request.META.get('HTTP_X_SESSION_ID')
+                or request.COOKIES.get(settings.AUTH_SESSION_COOKIE_NAME)
+            )
+            user_id = get_session_user_id(session_id) if session_id else None
+
             if user_id:
-                # Try to get user from database
-                try:
-                    user = User.objects.get(id=user_id, is_active=True)
-                    request.user = user
-                except User.DoesNotExist:
-                    # User not found or inactive
-                    pass
-        
+                principal = get_principal(user_id)
+                if principal is not None and principal.is_active:
+                    request.user = LazyUser(principal)
+                    request.auth_session_id = session_id
+
+        # Roles and permission decisions, loaded at most once per request
+        request.authz = (
+            authorization_context(request.user) if request.user is not None else None
+        )
+
         # Continue processing request
         return None
+
+    async def __acall__(self, request):
+        await self.aprocess_request(request)
+        return await self.get_response(request)
+
+    async def aprocess_request(self, request):
+        """Async variant of process_request()"""
+        await policy_version.acheck()
+
+        request.user = None
+
+        auth_header = request.META.get('HTTP_AUTHORIZATION', '')
+
+        if auth_header.startswith('Bearer '):
+            token = auth_header.split(' ')[1]
+
+            payload = await aget_token_payload(token)
+            user_id = payload.get('user_id') if payload else None
+
+            if (
+                user_id and 'jti' in payload
+                and await revocation_list.ais_revoked(payload['jti'])
+            ):
+                user_id = None
+
+            if user_id:
+                principal = await aget_principal(user_id)
+                if (
+                    principal is not None
+                    and principal.is_active
+                    and payload.get('tv', 0) == principal.token_version
+                ):
+                    request.user = LazyUser(principal, claims=payload)
+
+        else:
+            session_id = (
+                request.META.get('HTTP_X_SESSION_ID')
+                or request.COOKIES.get(settings.AUTH_SESSION_COOKIE_NAME)
+            )
+            # Mostly served from the session cache; the occasional expiry
+            # write-back runs in the sync thread
+            user_id = (
+                await sync_to_async(get_session_user_id)(session_id)
+                if session_id else None
+            )
+
+            if user_id:
+                principal = await aget_principal(user_id)
+                if principal is not None and principal.is_active:
+                    request.user = LazyUser(principal)
+                    request.auth_session_id = session_id
+
+        request.authz = (
+            authorization_context(request.user) if request.user is not None else None
+        )
+
+        return None
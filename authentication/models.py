@@ -1,9 +1,20 @@
-from django.db import models
+import hashlib
+import secrets
+
+from django.db import models, transaction
+from django.db.models.functions import Lower
 from django.utils import timezone
-import bcrypt
 import jwt
 from datetime import datetime, timedelta
 from django.conf import settings
+from .cache import principal_cache
+from .hashing import (
+    ahash_password,
+    averify_password,
+    hash_password,
+    needs_rehash,
+    verify_password,
+)
 
 
 class User(models.Model):
@@ -16,36 +27,98 @@ class User(models.Model):
     patronymic = models.CharField(max_length=100, blank=True, null=True)
     password_hash = models.CharField(max_length=255)
     is_active = models.BooleanField(default=True)
+    # Embedded in tokens; bumping it invalidates every outstanding token
+    token_version = models.PositiveIntegerField(default=0)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         db_table = 'users'
         ordering = ['-created_at']
+        constraints = [
+            # Emails are stored canonical (lowercase), so the unique index on
+            # email is case-insensitive and login can use it directly
+            models.CheckConstraint(
+                check=models.Q(email=Lower('email')),
+                name='users_email_lowercase'
+            ),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        user = super().from_db(db, field_names, values)
+        # What outstanding tokens were checked against; see signals.py
+        user._stored_auth_state = user.auth_state()
+        return user
+
+    def auth_state(self):
+        """(is_active, token_version) as held by this instance (None if deferred)"""
+        return (self.__dict__.get('is_active'), self.__dict__.get('token_version'))
+
+    @staticmethod
+    def normalize_email(email):
+        """Canonical form of an email address, as stored and looked up"""
+        return (email or '').strip().lower()
+
+    def save(self, *args, **kwargs):
+        self.email = self.normalize_email(self.email)
+        super().save(*args, **kwargs)
 
     def set_password(self, raw_password):
-        """Hash password using bcrypt"""
-        salt = bcrypt.gensalt()
-        self.password_hash = bcrypt.hashpw(
-            raw_password.encode('utf-8'), 
-            salt
-        ).decode('utf-8')
+        """Hash password using bcrypt (on the bounded hashing pool)"""
+        self.password_hash = hash_password(raw_password)
+        if self.pk is not None:
+            # Password change - tokens issued for the old password stop working
+            self.token_version += 1
 
-    def check_password(self, raw_password):
-        """Verify password against hash"""
-        return bcrypt.checkpw(
-            raw_password.encode('utf-8'),
-            self.password_hash.encode('utf-8')
+    async def aset_password(self, raw_password):
+        """Async variant of set_password()"""
+        self.password_hash = await ahash_password(raw_password)
+        if self.pk is not None:
+            self.token_version += 1
+
+    async def acheck_password(self, raw_password):
+        """Async variant of check_password()"""
+        return await averify_password(raw_password, self.password_hash)
+
+    def revoke_tokens(self):
+        """Invalidate every outstanding token for this user (logout everywhere)"""
+        User.objects.filter(pk=self.pk).update(
+            token_version=models.F('token_version') + 1
         )
+        self.refresh_from_db(fields=['token_version'])
+        self._stored_auth_state = self.auth_state()
+        # update() skips post_save, so drop the cached principal here and
+        # bump the policy version so every other worker drops its copy too
+        from authorization.policy import policy_version
+        principal_cache.invalidate(self.pk)
+        transaction.on_commit(policy_version.bump)
+
+    def check_password(self, raw_password):
+        """Verify password against hash (on the bounded hashing pool)"""
+        return verify_password(raw_password, self.password_hash)
+
+    def needs_rehash(self):
+        """Check if password hash cost differs from BCRYPT_ROUNDS"""
+        return needs_rehash(self.password_hash)
 
     def generate_token(self):
-        """Generate JWT token for user"""
+        """Generate short-lived JWT access token for user"""
         payload = {
             'user_id': self.id,
             'email': self.email,
-            'exp': datetime.utcnow() + timedelta(hours=settings.JWT_EXPIRATION_HOURS),
-            'iat': datetime.utcnow()
+            'exp': datetime.utcnow() + timedelta(minutes=settings.JWT_ACCESS_TOKEN_MINUTES),
+            'iat': datetime.utcnow(),
+            'jti': secrets.token_hex(16),
+            'tv': self.token_version
         }
+        if settings.JWT_EMBED_ROLES:
+            # Imported here since authorization depends on this app
+            from authorization.claims import build_authz_claims
+            payload.update(build_authz_claims(
+                self,
+                include_permissions=settings.JWT_EMBED_PERMISSIONS
+            ))
         token = jwt.encode(
             payload, 
             settings.JWT_SECRET, 
@@ -54,20 +127,27 @@ class User(models.Model):
         return token
 
     @staticmethod
-    def decode_token(token):
-        """Decode JWT token and return user_id"""
+    def decode_payload(token):
+        """Verify JWT token and return its claims, or None if invalid"""
         try:
-            payload = jwt.decode(
+            return jwt.decode(
                 token, 
                 settings.JWT_SECRET, 
                 algorithms=[settings.JWT_ALGORITHM]
             )
-            return payload['user_id']
         except jwt.ExpiredSignatureError:
             return None
         except jwt.InvalidTokenError:
             return None
 
+    @staticmethod
+    def decode_token(token):
+        """Decode JWT token and return user_id"""
+        payload = User.decode_payload(token)
+        if payload is None:
+            return None
+        return payload.get('user_id')
+
     def __str__(self):
         return self.email
 
@@ -88,6 +168,11 @@ class Session(models.Model):
     class Meta:
         db_table = 'sessions'
         ordering = ['-created_at']
+        indexes = [
+            # Expired-session sweeps and per-user validity checks
+            models.Index(fields=['expire_at'], name='sessions_expire_at_idx'),
+            models.Index(fields=['user', 'expire_at'], name='sessions_user_expire_at_idx'),
+        ]
 
     def is_valid(self):
         """Check if session is still valid"""
@@ -96,7 +181,6 @@ class Session(models.Model):
     @staticmethod
     def create_session(user, hours=24):
         """Create new session for user"""
-        import secrets
         session_id = secrets.token_urlsafe(32)
         expire_at = timezone.now() + timedelta(hours=hours)
         return Session.objects.create(
@@ -107,3 +191,106 @@ class Session(models.Model):
 
     def __str__(self):
         return f"Session for {self.user.email}"
+
+
+class RefreshToken(models.Model):
+    """
+    Opaque, single-use refresh token exchanged for a new access JWT.
+
+    Only a SHA-256 digest of the token is stored (unique index, O(1) lookup).
+    Every rotation issues a new token in the same family; presenting a token
+    that was already rotated or revoked revokes the whole family.
+    """
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='refresh_tokens'
+    )
+    token_hash = models.CharField(max_length=64, unique=True)
+    family = models.CharField(max_length=32, db_index=True)
+    expires_at = models.DateTimeField()
+    revoked_at = models.DateTimeField(blank=True, null=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = 'refresh_tokens'
+        ordering = ['-created_at']
+
+    @staticmethod
+    def hash_token(raw_token):
+        """Digest stored in place of the raw token"""
+        return hashlib.sha256(raw_token.encode('utf-8')).hexdigest()
+
+    @staticmethod
+    def issue(user, family=None):
+        """Create a refresh token for user and return the raw token"""
+        raw_token = secrets.token_urlsafe(32)
+        RefreshToken.objects.create(
+            user=user,
+            token_hash=RefreshToken.hash_token(raw_token),
+            family=family or secrets.token_hex(16),
+            expires_at=timezone.now() + timedelta(days=settings.REFRESH_TOKEN_DAYS)
+        )
+        return raw_token
+
+    @staticmethod
+    def rotate(raw_token):
+        """
+        Exchange a refresh token for a new one
+
+        Returns:
+            tuple: (user, new_raw_token), or (None, None) if the token is
+            unknown, expired, already used or the user is inactive
+        """
+        now = timezone.now()
+        with transaction.atomic():
+            try:
+                current = RefreshToken.objects.select_for_update().select_related(
+                    'user'
+                ).get(token_hash=RefreshToken.hash_token(raw_token))
+            except RefreshToken.DoesNotExist:
+                return None, None
+
+            if current.revoked_at is not None:
+                # Reuse of a rotated token - assume it leaked and kill the family
+                RefreshToken.objects.filter(
+                    family=current.family,
+                    revoked_at__isnull=True
+                ).update(revoked_at=now)
+                return None, None
+
+            if current.expires_at <= now or not current.user.is_active:
+                return None, None
+
+            current.revoked_at = now
+            current.save(update_fields=['revoked_at'])
+            new_token = RefreshToken.issue(current.user, family=current.family)
+            return current.user, new_token
+
+    @staticmethod
+    def revoke_all(user):
+        """Revoke every outstanding refresh token for user"""
+        RefreshToken.objects.filter(
+            user_id=user.id,
+            revoked_at__isnull=True
+        ).update(revoked_at=timezone.now())
+
+    def __str__(self):
+        return f"Refresh token for {self.user.email}"
+
+
+class RevokedToken(models.Model):
+    """
+    Denylist entry for an access JWT revoked before its expiry (logout).
+    Rows are only needed until the token would have expired anyway.
+    """
+    jti = models.CharField(max_length=64, unique=True)
+    expires_at = models.DateTimeField(db_index=True)
+    revoked_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = 'revoked_tokens'
+        ordering = ['-revoked_at']
+
+    def __str__(self):
+        return self.jti
@@ -0,0 +1,197 @@
+import hashlib
+import math
+import threading
+import time
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import IntegrityError
+from django.utils import timezone
+
+from .models import RevokedToken
+
+
+class BloomFilter:
+    """
+    Fixed-size Bloom filter over strings.
+
+    Our jtis are 128 random bits in hex, so bit positions are derived directly
+    from the jti (double hashing over its two 64-bit halves) instead of
+    running a hash function; anything else goes through BLAKE2b first.
+    """
+
+    def __init__(self, capacity, error_rate=0.001):
+        capacity = max(capacity, 1)
+        self.size = max(
+            int(-capacity * math.log(error_rate) / (math.log(2) ** 2)), 8
+        )
+        self.hash_count = max(int(round(self.size / capacity * math.log(2))), 1)
+        self.count = 0
+        self._bits = bytearray((self.size + 7) // 8)
+
+    def _hashes(self, value):
+        number = None
+        if len(value) == 32:
+            try:
+                number = int(value, 16)
+            except ValueError:
+                pass
+        if number is None:
+            number = int.from_bytes(
+                hashlib.blake2b(value.encode('utf-8'), digest_size=16).digest(),
+                'big'
+            )
+        return number & 0xFFFFFFFFFFFFFFFF, (number >> 64) | 1
+
+    def add(self, value):
+        h1, h2 = self._hashes(value)
+        bits = self._bits
+        added = False
+        for i in range(self.hash_count):
+            position = (h1 + i * h2) % self.size
+            mask = 1 << (position & 7)
+            if not bits[position >> 3] & mask:
+                bits[position >> 3] |= mask
+                added = True
+        # Re-adding a known value doesn't use up capacity
+        if added:
+            self.count += 1
+
+    def __contains__(self, value):
+        h1, h2 = self._hashes(value)
+        bits = self._bits
+        size = self.size
+        # Most lookups are misses and stop at the first clear bit
+        for i in range(self.hash_count):
+            position = (h1 + i * h2) % size
+            if not bits[position >> 3] & (1 << (position & 7)):
+                return False
+        return True
+
+
+class RevocationList:
+    """
+    Per-process view of the revoked_tokens table.
+
+    A Bloom filter of revoked jtis answers the common "not revoked" case
+    in memory. Recently revoked rows are pulled incrementally at most once
+    per refresh interval, and only a filter hit costs a real lookup. The
+    filter is rebuilt from unexpired rows once it fills up.
+    """
+
+    overlap_seconds = 60
+
+    def __init__(self, capacity=100000, error_rate=0.001, refresh_seconds=2.0):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.refresh_seconds = refresh_seconds
+        self.lookups = 0
+        self.false_positives = 0
+        self._filter = None
+        self._since = None
+        self._next_refresh = 0.0
+        self._lock = threading.Lock()
+
+    def is_revoked(self, jti):
+        """Check whether jti has been revoked"""
+        if time.monotonic() >= self._next_refresh:
+            self.refresh()
+        if jti not in self._filter:
+            return False
+
+        # Rare path: possible hit, confirm against the store
+        self.lookups += 1
+        revoked = RevokedToken.objects.filter(jti=jti).exists()
+        if not revoked:
+            self.false_positives += 1
+        return revoked
+
+    async def ais_revoked(self, jti):
+        """Async variant of is_revoked()"""
+        if time.monotonic() >= self._next_refresh:
+            await sync_to_async(self.refresh)()
+        if jti not in self._filter:
+            return False
+
+        self.lookups += 1
+        revoked = await RevokedToken.objects.filter(jti=jti).aexists()
+        if not revoked:
+            self.false_positives += 1
+        return revoked
+
+    def revoke(self, jti, exp):
+        """Add jti (expiring at unix timestamp exp) to the denylist"""
+        expires_at = datetime.fromtimestamp(exp, tz=dt_timezone.utc)
+        try:
+            RevokedToken.objects.create(jti=jti, expires_at=expires_at)
+        except IntegrityError:
+            # Already revoked
+            pass
+        if self._filter is None:
+            self.refresh(full=True)
+        self._filter.add(jti)
+
+    def load(self, jtis):
+        """
+        Replace the filter with one holding jtis, without reading the table
+        (warm starts and benchmarks); refreshes resume after refresh_seconds.
+        Returns the new BloomFilter.
+        """
+        bloom = BloomFilter(self.capacity, self.error_rate)
+        for jti in jtis:
+            bloom.add(jti)
+        with self._lock:
+            self._filter = bloom
+            self._since = timezone.now()
+            self._next_refresh = time.monotonic() + self.refresh_seconds
+        return bloom
+
+    def refresh(self, full=False):
+        """
+        Pull recently revoked jtis into the filter. Requests that queued on
+        the lock behind another refresh return without querying again.
+        """
+        if not full and time.monotonic() < self._next_refresh:
+            return
+        with self._lock:
+            # Re-check: another thread may have refreshed while we waited
+            if not full and time.monotonic() < self._next_refresh:
+                return
+            started_at = timezone.now()
+            bloom = self._filter
+            if full or bloom is None or bloom.count >= self.capacity:
+                bloom = BloomFilter(self.capacity, self.error_rate)
+                rows = RevokedToken.objects.filter(expires_at__gt=started_at)
+            else:
+                # Overlap with the previous window so rows from transactions
+                # that committed late are not missed
+                rows = RevokedToken.objects.filter(
+                    revoked_at__gte=self._since - timedelta(seconds=self.overlap_seconds)
+                )
+
+            for jti in rows.values_list('jti', flat=True).iterator():
+                bloom.add(jti)
+
+            self._filter = bloom
+            self._since = started_at
+            self._next_refresh = time.monotonic() + self.refresh_seconds
+
+    def stats(self):
+        """Return filter size and lookup counters"""
+        bloom = self._filter
+        return {
+            'entries': bloom.count if bloom else 0,
+            'capacity': self.capacity,
+            'bits': bloom.size if bloom else 0,
+            'hash_count': bloom.hash_count if bloom else 0,
+            'lookups': self.lookups,
+            'false_positives': self.false_positives,
+        }
+
+
+revocation_list = RevocationList(
+    capacity=settings.REVOCATION_BLOOM_CAPACITY,
+    error_rate=settings.REVOCATION_BLOOM_ERROR_RATE,
+    refresh_seconds=settings.REVOCATION_REFRESH_SECONDS,
+)
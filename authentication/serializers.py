@@ -1,3 +1,4 @@
+from django.db import IntegrityError, transaction
 from rest_framework import serializers
 from .models import User
 import re
@@ -17,16 +18,21 @@ class UserRegistrationSerializer(serializers.Serializer):
     password_confirmation = serializers.CharField(write_only=True)
 
     def validate_email(self, value):
-        """Validate email uniqueness"""
-        if User.objects.filter(email=value).exists():
-            raise serializers.ValidationError("Email already registered")
+        """
+        Validate email format and availability
         
+        The exists() check keeps a taken email from paying for bcrypt; the
+        unique index still catches a concurrent registration (see create).
+        """
         # Additional email format validation
         email_regex = r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$'
         if not re.match(email_regex, value):
             raise serializers.ValidationError("Invalid email format")
         
-        return value.lower()
+        email = User.normalize_email(value)
+        if User.objects.filter(email=email).exists():
+            raise serializers.ValidationError("Email already registered")
+        return email
 
     def validate_password(self, value):
         """Validate password strength"""
@@ -45,13 +51,24 @@ class UserRegistrationSerializer(serializers.Serializer):
         return data
 
     def create(self, validated_data):
-        """Create new user"""
+        """
+        Create new user
+        
+        Raises ValidationError if the email was registered since validation.
+        """
         validated_data.pop('password_confirmation')
         password = validated_data.pop('password')
         
         user = User(**validated_data)
         user.set_password(password)
-        user.save()
+        try:
+            # Savepoint, so a duplicate doesn't break an enclosing transaction
+            with transaction.atomic():
+                user.save()
+        except IntegrityError:
+            raise serializers.ValidationError({
+                'email': ["Email already registered"]
+            })
         
         return user
 
@@ -60,6 +77,13 @@ class UserLoginSerializer(serializers.Serializer):
     """Serializer for user login"""
     email = serializers.EmailField()
     password = serializers.CharField(write_only=True)
+    # Also open a server-side session (cookie / X-Session-ID header)
+    use_session = serializers.BooleanField(required=False, default=False)
+
+
+class TokenRefreshSerializer(serializers.Serializer):
+    """Serializer for refresh token rotation"""
+    refresh_token = serializers.CharField()
 
 
 class UserProfileSerializer(serializers.ModelSerializer):
@@ -83,3 +107,26 @@ class UserUpdateSerializer(serializers.ModelSerializer):
     class Meta:
         model = User
         fields = ['first_name', 'last_name', 'patronymic']
+
+
+class UserImportSerializer(serializers.Serializer):
+    """
+    Serializer for one bulk-import record
+
+    Email uniqueness is not checked here; the importer deduplicates a whole
+    chunk with one query instead.
+    """
+    email = serializers.EmailField()
+    first_name = serializers.CharField(max_length=100)
+    last_name = serializers.CharField(max_length=100)
+    patronymic = serializers.CharField(
+        max_length=100, 
+        required=False, 
+        allow_blank=True
+    )
+    password = serializers.CharField(write_only=True, min_length=8)
+    role = serializers.CharField(max_length=50, required=False, allow_blank=True)
+
+    def validate_email(self, value):
+        """Normalize email"""
+        return User.normalize_email(value)
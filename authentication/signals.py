@@ -0,0 +1,33 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from authorization.policy import policy_version
+from .cache import principal_cache, session_cache
+from .models import Session, User
+
+
+@receiver(post_save, sender=User)
+def invalidate_principal(sender, instance, created, **kwargs):
+    """
+    Drop the cached principal whenever a user row changes. Deactivations and
+    token_version bumps also move the policy version, so every worker drops
+    its copy instead of trusting it until the TTL.
+    """
+    principal_cache.invalidate(instance.id)
+    state = instance.auth_state()
+    if not created and state != getattr(instance, '_stored_auth_state', None):
+        transaction.on_commit(policy_version.bump)
+    instance._stored_auth_state = state
+
+
+@receiver(post_delete, sender=User)
+def forget_principal(sender, instance, **kwargs):
+    """Drop the deleted user's principal on every worker"""
+    principal_cache.invalidate(instance.id)
+    transaction.on_commit(policy_version.bump)
+
+
+@receiver(post_delete, sender=Session)
+def invalidate_session(sender, instance, **kwargs):
+    """Stop authenticating with a session as soon as it is deleted"""
+    session_cache.discard(instance.session_id)
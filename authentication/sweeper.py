@@ -0,0 +1,94 @@
+import logging
+import threading
+import time
+
+from django.db import close_old_connections
+from django.utils import timezone
+
+from .models import Session
+
+
+logger = logging.getLogger(__name__)
+
+
+def sweep_expired_sessions(batch_size=1000, pause=0.0, max_batches=None):
+    """
+    Delete expired sessions in bounded batches
+
+    Each batch is the oldest batch_size expired rows, read from the front of
+    the expire_at index. Deleted rows leave the range, so the next batch
+    seeks straight past them without a cursor. One DELETE per batch means no
+    single statement locks a large part of the table.
+
+    Args:
+        batch_size: Rows deleted per statement
+        pause: Seconds to sleep between batches
+        max_batches: Stop after this many batches (None = until done)
+
+    Returns:
+        tuple: (rows_deleted, elapsed_seconds)
+    """
+    cutoff = timezone.now()
+    started = time.monotonic()
+    deleted = 0
+    batches = 0
+
+    while max_batches is None or batches < max_batches:
+        ids = list(
+            Session.objects.filter(expire_at__lt=cutoff)
+            .order_by('expire_at')
+            .values_list('id', flat=True)[:batch_size]
+        )
+        if not ids:
+            break
+
+        # Rows extended since the read no longer match and are kept
+        count, _ = Session.objects.filter(
+            id__in=ids, expire_at__lt=cutoff
+        ).delete()
+        deleted += count
+        batches += 1
+
+        if pause:
+            time.sleep(pause)
+
+    return deleted, time.monotonic() - started
+
+
+class SessionSweeper(threading.Thread):
+    """Daemon thread that sweeps expired sessions every `interval` seconds"""
+
+    def __init__(self, interval, batch_size=1000):
+        super().__init__(name='session-sweeper', daemon=True)
+        self.interval = interval
+        self.batch_size = batch_size
+
+    def run(self):
+        while True:
+            time.sleep(self.interval)
+            try:
+                deleted, elapsed = sweep_expired_sessions(self.batch_size)
+                if deleted:
+                    logger.info(
+                        'Swept %d expired sessions in %.2fs', deleted, elapsed
+                    )
+            except Exception:
+                logger.exception('Expired session sweep failed')
+            finally:
+                close_old_connections()
+
+
+_sweeper = None
+_sweeper_lock = threading.Lock()
+
+
+def start_session_sweeper(interval, batch_size=1000):
+    """Start the in-process sweeper once per process (no-op if interval <= 0)"""
+    global _sweeper
+    if interval <= 0:
+        return None
+    with _sweeper_lock:
+        if _sweeper is None or not _sweeper.is_alive():
+            _sweeper = SessionSweeper(interval, batch_size)
+            _sweeper.start()
+    return _sweeper
@@ -1,3 +1,695 @@
-from django.test import TestCase
+import threading
+import uuid
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.test import RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+
+from authorization.models import Role, UserRole
+from authorization.policy import policy_version
+from .cache import CachedSession, Principal, principal_cache, session_cache, token_cache
+from .exceptions import HashingUnavailable
+from .hashing import HashExecutor, _hashpw, hash_cost, hash_executor, rehash_in_background
+from .middleware import CustomAuthMiddleware
+from .models import RefreshToken, RevokedToken, Session, User
+from .revocation import BloomFilter, RevocationList
+from .sweeper import sweep_expired_sessions
+from .throttling import LocalBucketBackend, login_throttle
+
+
+def create_user(email='user@test.com', **fields):
+    fields.setdefault('password_hash', '!')
+    return User.objects.create(
+        email=email, first_name='Test', last_name='User', **fields
+    )
+
+
+class RefreshTokenTests(TestCase):
+
+    def setUp(self):
+        self.user = create_user()
+
+    def test_rotate_issues_new_token_in_same_family(self):
+        raw_token = RefreshToken.issue(self.user)
+        user, new_token = RefreshToken.rotate(raw_token)
+
+        self.assertEqual(user, self.user)
+        self.assertNotEqual(new_token, raw_token)
+        old = RefreshToken.objects.get(token_hash=RefreshToken.hash_token(raw_token))
+        new = RefreshToken.objects.get(token_hash=RefreshToken.hash_token(new_token))
+        self.assertIsNotNone(old.revoked_at)
+        self.assertIsNone(new.revoked_at)
+        self.assertEqual(old.family, new.family)
+
+    def test_only_digest_is_stored(self):
+        raw_token = RefreshToken.issue(self.user)
+        self.assertFalse(RefreshToken.objects.filter(token_hash=raw_token).exists())
+
+    def test_reuse_revokes_whole_family(self):
+        raw_token = RefreshToken.issue(self.user)
+        _, second = RefreshToken.rotate(raw_token)
+        _, third = RefreshToken.rotate(second)
+
+        # Replaying a rotated token looks like theft
+        self.assertEqual(RefreshToken.rotate(raw_token), (None, None))
+        self.assertFalse(
+            RefreshToken.objects.filter(revoked_at__isnull=True).exists()
+        )
+        self.assertEqual(RefreshToken.rotate(third), (None, None))
+
+    def test_reuse_leaves_other_families_alone(self):
+        raw_token = RefreshToken.issue(self.user)
+        other = RefreshToken.issue(self.user)
+        RefreshToken.rotate(raw_token)
+        RefreshToken.rotate(raw_token)
+
+        user, _ = RefreshToken.rotate(other)
+        self.assertEqual(user, self.user)
+
+    def test_unknown_expired_and_inactive_are_rejected(self):
+        self.assertEqual(RefreshToken.rotate('unknown'), (None, None))
+
+        expired = RefreshToken.issue(self.user)
+        RefreshToken.objects.update(expires_at=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(RefreshToken.rotate(expired), (None, None))
+
+        inactive = create_user('inactive@test.com', is_active=False)
+        self.assertEqual(RefreshToken.rotate(RefreshToken.issue(inactive)), (None, None))
+
+    def test_revoke_all(self):
+        first = RefreshToken.issue(self.user)
+        second = RefreshToken.issue(self.user)
+        RefreshToken.revoke_all(self.user)
+
+        self.assertEqual(RefreshToken.rotate(first), (None, None))
+        self.assertEqual(RefreshToken.rotate(second), (None, None))
+
+
+class TokenVersionTests(TestCase):
+
+    def setUp(self):
+        self.user = create_user()
+        self.middleware = CustomAuthMiddleware(lambda request: None)
+        principal_cache.clear()
+        token_cache.clear()
+        # Consult the policy version on every request
+        for attribute in ('interval', '_next_check'):
+            patcher = mock.patch.object(policy_version, attribute, 0)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        policy_version.check()
+
+    def authenticate(self, token):
+        request = RequestFactory().get('/', HTTP_AUTHORIZATION=f'Bearer {token}')
+        self.middleware.process_request(request)
+        return request.user
+
+    def test_revoke_tokens_rejects_issued_tokens(self):
+        token = self.user.generate_token()
+        self.assertEqual(self.authenticate(token).id, self.user.id)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.revoke_tokens()
+
+        self.assertIsNone(self.authenticate(token))
+        self.assertEqual(self.authenticate(self.user.generate_token()).id, self.user.id)
+
+    def test_other_workers_drop_their_principal(self):
+        token = self.user.generate_token()
+        stale = Principal.from_user(self.user)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.revoke_tokens()
+        # Another worker still holds the principal it cached before the bump
+        principal_cache.set(stale)
+
+        self.assertIsNone(self.authenticate(token))
+
+    def test_deactivation_reaches_other_workers(self):
+        token = self.user.generate_token()
+        stale = Principal.from_user(self.user)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.is_active = False
+            self.user.save()
+        principal_cache.set(stale)
+
+        self.assertIsNone(self.authenticate(token))
+
+    def test_profile_edits_do_not_bump_policy_version(self):
+        version = policy_version.store.get()
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            self.user.first_name = 'Renamed'
+            self.user.save()
+
+        self.assertEqual(callbacks, [])
+        self.assertEqual(policy_version.store.get(), version)
+
+
+class BloomFilterTests(TestCase):
+
+    def test_members_are_found(self):
+        bloom = BloomFilter(1000, error_rate=0.01)
+        jtis = [uuid.uuid4().hex for _ in range(1000)]
+        for jti in jtis:
+            bloom.add(jti)
+        # Values that aren't 128-bit hex are hashed first
+        bloom.add('not-a-jti')
+
+        self.assertTrue(all(jti in bloom for jti in jtis))
+        self.assertIn('not-a-jti', bloom)
+
+    def test_false_positive_rate(self):
+        bloom = BloomFilter(1000, error_rate=0.01)
+        for _ in range(1000):
+            bloom.add(uuid.uuid4().hex)
+
+        false_positives = sum(uuid.uuid4().hex in bloom for _ in range(10000))
+        self.assertLess(false_positives, 300)
+
+    def test_readding_does_not_count(self):
+        bloom = BloomFilter(10)
+        bloom.add('a' * 32)
+        bloom.add('a' * 32)
+        self.assertEqual(bloom.count, 1)
+
+
+class RevocationListTests(TestCase):
+
+    def setUp(self):
+        self.revocations = RevocationList(capacity=10, refresh_seconds=0)
+        self.expires_at = timezone.now() + timedelta(minutes=15)
+
+    def revoked_elsewhere(self, jti, age=0, expires_at=None):
+        """A row written by another worker, age seconds ago"""
+        RevokedToken.objects.create(jti=jti, expires_at=expires_at or self.expires_at)
+        RevokedToken.objects.filter(jti=jti).update(
+            revoked_at=timezone.now() - timedelta(seconds=age)
+        )
+
+    def test_incremental_refresh_overlaps_previous_window(self):
+        self.revocations.refresh(full=True)
+        # Committed late: revoked before the last refresh, but inside the overlap
+        self.revoked_elsewhere('late', age=30)
+        self.revoked_elsewhere('old', age=600)
+
+        self.revocations.refresh()
+
+        self.assertTrue(self.revocations.is_revoked('late'))
+        # Outside the overlap, so an incremental refresh doesn't read it
+        self.assertNotIn('old', self.revocations._filter)
+
+    def test_full_rebuild_skips_expired_rows(self):
+        self.revoked_elsewhere('live')
+        self.revoked_elsewhere('expired', expires_at=timezone.now() - timedelta(seconds=1))
+
+        self.revocations.refresh(full=True)
+
+        self.assertIn('live', self.revocations._filter)
+        self.assertNotIn('expired', self.revocations._filter)
+
+    def test_full_filter_is_rebuilt(self):
+        self.revocations.load(f'{index:032x}' for index in range(10))
+        self.revoked_elsewhere('live')
+
+        self.revocations.refresh()
+
+        self.assertEqual(self.revocations.stats()['entries'], 1)
+        self.assertIn('live', self.revocations._filter)
+
+    def test_filter_hit_is_confirmed_in_the_table(self):
+        self.revocations.load(['stale'])
+
+        self.assertFalse(self.revocations.is_revoked('stale'))
+        self.assertEqual(self.revocations.stats()['false_positives'], 1)
+
+    def test_logout_rejects_the_token(self):
+        user = create_user()
+        principal_cache.clear()
+        headers = {'HTTP_AUTHORIZATION': f'Bearer {user.generate_token()}'}
+
+        self.assertEqual(self.client.get('/api/auth/profile/', **headers).status_code, 200)
+        self.assertEqual(self.client.post('/api/auth/logout/', **headers).status_code, 200)
+        self.assertEqual(self.client.get('/api/auth/profile/', **headers).status_code, 401)
+        self.assertTrue(RevokedToken.objects.exists())
+
+
+class SessionAuthenticationTests(TestCase):
+
+    def setUp(self):
+        self.user = create_user()
+        self.session = Session.create_session(self.user)
+        self.middleware = CustomAuthMiddleware(lambda request: None)
+        session_cache.clear()
+        principal_cache.clear()
+        principal_cache.set(Principal.from_user(self.user))
+        # Keep policy version reads out of the query counts
+        patcher = mock.patch.object(policy_version, '_next_check', float('inf'))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def authenticate(self, **meta):
+        request = RequestFactory().get('/', **meta)
+        self.middleware.process_request(request)
+        return request.user
+
+    def authenticate_header(self):
+        return self.authenticate(HTTP_X_SESSION_ID=self.session.session_id)
+
+    def test_header_and_cookie(self):
+        self.assertEqual(self.authenticate_header().id, self.user.id)
+
+        cookie = f'{settings.AUTH_SESSION_COOKIE_NAME}={self.session.session_id}'
+        self.assertEqual(self.authenticate(HTTP_COOKIE=cookie).id, self.user.id)
+
+        self.assertIsNone(self.authenticate(HTTP_X_SESSION_ID='unknown'))
+
+    def test_expiry_is_written_once_per_touch_interval(self):
+        with self.assertNumQueries(1):
+            self.authenticate_header()
+        with self.assertNumQueries(0):
+            for _ in range(5):
+                self.authenticate_header()
+
+        later = timezone.now() + timedelta(seconds=settings.SESSION_TOUCH_SECONDS)
+        with mock.patch('authentication.middleware.timezone.now', return_value=later):
+            with self.assertNumQueries(1):
+                self.authenticate_header()
+            with self.assertNumQueries(0):
+                self.authenticate_header()
+
+        self.session.refresh_from_db()
+        self.assertEqual(
+            self.session.expire_at,
+            later + timedelta(hours=settings.SESSION_EXPIRATION_HOURS)
+        )
+
+    def test_expired_session_is_rejected(self):
+        Session.objects.filter(pk=self.session.pk).update(
+            expire_at=timezone.now() - timedelta(seconds=1)
+        )
+        self.assertIsNone(self.authenticate_header())
+
+        # Also once this process has it cached with a lapsed expiry
+        self.assertIsNone(self.authenticate_header())
+        self.assertIsNone(session_cache.get(self.session.session_id))
+
+    def test_extension_by_another_worker_is_honoured(self):
+        now = timezone.now()
+        # This process last saw the session about to lapse...
+        session_cache.set(self.session.session_id, CachedSession(
+            self.session.pk, self.user.id, now - timedelta(seconds=1), now - timedelta(hours=1)
+        ))
+
+        # ...but another worker has since pushed expire_at forward
+        self.assertEqual(self.authenticate_header().id, self.user.id)
+
+
+class SessionSweepTests(TestCase):
+
+    def test_deletes_only_expired_sessions_in_batches(self):
+        user = create_user()
+        now = timezone.now()
+        for minutes in (-5, -4, -3, -2, -1, 1, 2, 3):
+            Session.objects.create(
+                user=user,
+                session_id=f'session-{minutes}',
+                expire_at=now + timedelta(minutes=minutes)
+            )
+
+        deleted, _ = sweep_expired_sessions(batch_size=2)
+
+        self.assertEqual(deleted, 5)
+        self.assertEqual(
+            sorted(Session.objects.values_list('session_id', flat=True)),
+            ['session-1', 'session-2', 'session-3']
+        )
+
+    def test_max_batches(self):
+        user = create_user()
+        expired = timezone.now() - timedelta(minutes=1)
+        for index in range(5):
+            Session.objects.create(
+                user=user, session_id=f'session-{index}', expire_at=expired
+            )
+
+        deleted, _ = sweep_expired_sessions(batch_size=2, max_batches=2)
+
+        self.assertEqual(deleted, 4)
+        self.assertEqual(Session.objects.count(), 1)
+
+
+class HashExecutorMapTests(TestCase):
+
+    def test_map_keeps_order(self):
+        executor = HashExecutor(pool_size=2, queue_depth=0)
+        self.assertEqual(executor.map(pow, range(6), [2] * 6), [0, 1, 4, 9, 16, 25])
+
+    def test_map_fails_fast_when_pool_is_full(self):
+        executor = HashExecutor(pool_size=1, queue_depth=0)
+        release = threading.Event()
+        blocker = executor.submit(release.wait)
+        try:
+            self.assertEqual(executor.stats()['in_flight'], 1)
+            with self.assertRaises(HashingUnavailable):
+                executor.map(pow, range(3), [2] * 3)
+        finally:
+            release.set()
+            blocker.result()
+        self.assertEqual(executor.stats()['rejected'], 1)
+
+
+class RegisterViewTests(TestCase):
+
+    data = {
+        'email': 'User@Test.com', 'first_name': 'New', 'last_name': 'User',
+        'password': 'password123', 'password_confirmation': 'password123',
+    }
+
+    def setUp(self):
+        create_user()
+        patcher = mock.patch('authentication.models.hash_password', return_value='!')
+        self.hash_password = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def register(self):
+        return self.client.post(
+            '/api/auth/register/', self.data, content_type='application/json'
+        )
+
+    def test_taken_email_is_refused_before_hashing(self):
+        response = self.register()
+
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('email', response.json())
+        self.hash_password.assert_not_called()
+
+    def test_concurrent_registration_hits_the_unique_index(self):
+        # Another request inserted the email between validation and save
+        with mock.patch(
+            'authentication.serializers.UserRegistrationSerializer.validate_email',
+            side_effect=User.normalize_email
+        ):
+            response = self.register()
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), {'email': ['Email already registered']})
+        self.assertEqual(User.objects.count(), 1)
+
+
+class BulkRegisterViewTests(TestCase):
+
+    url = '/api/auth/bulk-register/'
+
+    def setUp(self):
+        principal_cache.clear()
+        self.admin = create_user('admin@test.com')
+        UserRole.objects.create(
+            user=self.admin, role=Role.objects.create(name='admin')
+        )
+        Role.objects.create(name='user')
+        self.headers = {'HTTP_AUTHORIZATION': f'Bearer {self.admin.generate_token()}'}
+
+    @staticmethod
+    def record(index, **fields):
+        return dict({
+            'email': f'Imported{index}@Test.com', 'first_name': 'Imported',
+            'last_name': 'User', 'password': 'password123'
+        }, **fields)
+
+    def post(self, body, content_type='application/json', query=''):
+        return self.client.post(
+            self.url + query, body, content_type=content_type, **self.headers
+        )
+
+    def test_admin_only(self):
+        user = create_user()
+        response = self.client.post(
+            self.url, {'users': []}, content_type='application/json',
+            HTTP_AUTHORIZATION=f'Bearer {user.generate_token()}'
+        )
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(self.client.post(self.url).status_code, 401)
+
+    def test_json_import(self):
+        users = [self.record(1, role='user'), self.record(2), self.record(1), {'email': 'bad'}]
+        with self.settings(BCRYPT_ROUNDS=4):
+            response = self.post({'users': users}, query='?role=user')
+
+        self.assertEqual(response.status_code, 200)
+        report = response.json()
+        self.assertEqual(
+            (report['read'], report['created'], report['duplicates'], report['invalid']),
+            (4, 2, 1, 1)
+        )
+        self.assertEqual(report['roles_assigned'], 2)
+        self.assertTrue(User.objects.get(email='imported1@test.com').check_password('password123'))
+
+    def test_csv_import(self):
+        body = 'email,first_name,last_name,password\n' + ''.join(
+            f'user{index}@test.com,Imported,User,password123\n' for index in range(3)
+        )
+        with self.settings(BCRYPT_ROUNDS=4):
+            response = self.post(body, content_type='text/csv')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['created'], 3)
+
+    def test_too_many_records(self):
+        with self.settings(BULK_IMPORT_MAX_RECORDS=1):
+            response = self.post({'users': [self.record(1), self.record(2)]})
+        self.assertEqual(response.status_code, 413)
+        self.assertFalse(User.objects.filter(email__startswith='imported').exists())
+
+    def test_saturated_pool_reports_committed_chunks(self):
+        users = [self.record(index) for index in range(4)]
+        with self.settings(BULK_IMPORT_CHUNK_SIZE=2), mock.patch.object(
+            hash_executor, 'map', side_effect=[['!', '!'], HashingUnavailable(wait=2)]
+        ):
+            response = self.post({'users': users})
+
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response['Retry-After'], '2')
+        self.assertEqual(response.json()['created'], 2)
+        self.assertIn('error', response.json())
+        self.assertEqual(User.objects.filter(email__startswith='imported').count(), 2)
+
+
+class LoginThrottleTests(TestCase):
+
+    def setUp(self):
+        self.user = create_user()
+        patchers = [
+            mock.patch.object(login_throttle, 'backend', LocalBucketBackend()),
+            mock.patch.multiple(
+                login_throttle, ip_rate=1 / 60, ip_burst=10, email_rate=1 / 60, email_burst=2
+            ),
+        ]
+        for patcher in patchers:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        patcher = mock.patch('authentication.models.verify_password', return_value=False)
+        self.verify = patcher.start()
+        self.addCleanup(patcher.stop)
+        # The stored hash is a placeholder; don't upgrade it behind the test
+        patcher = mock.patch('authentication.views.rehash_in_background')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def login(self, email='user@test.com', ip='10.0.0.1'):
+        return self.client.post(
+            '/api/auth/login/', {'email': email, 'password': 'password123'},
+            content_type='application/json', REMOTE_ADDR=ip
+        )
+
+    def test_throttled_before_any_hashing(self):
+        self.assertEqual(self.login().status_code, 401)
+        self.assertEqual(self.login().status_code, 401)
+
+        response = self.login()
+        self.assertEqual(response.status_code, 429)
+        self.assertGreaterEqual(int(response['Retry-After']), 1)
+        self.assertEqual(self.verify.call_count, 2)
+
+    def test_success_resets_the_email_bucket(self):
+        self.assertEqual(self.login().status_code, 401)
+        self.verify.return_value = True
+        self.assertEqual(self.login().status_code, 200)
+
+        self.verify.return_value = False
+        self.assertEqual(self.login().status_code, 401)
+        self.assertEqual(self.login().status_code, 401)
+        self.assertEqual(self.login().status_code, 429)
+
+    def test_ip_and_email_buckets_are_separate(self):
+        self.login(ip='10.0.0.1')
+        self.login(ip='10.0.0.2')
+        # The email is exhausted from any address...
+        self.assertEqual(self.login(ip='10.0.0.3').status_code, 429)
+        # ...but the addresses can still try other emails
+        self.assertEqual(self.login('other@test.com', ip='10.0.0.1').status_code, 401)
+
+        with mock.patch.object(login_throttle, 'ip_burst', 2):
+            self.login('first@test.com', ip='10.0.0.9')
+            self.login('second@test.com', ip='10.0.0.9')
+            self.assertEqual(self.login('third@test.com', ip='10.0.0.9').status_code, 429)
+            self.assertEqual(self.login('third@test.com', ip='10.0.0.8').status_code, 401)
+
+
+class ProfileConditionalTests(TestCase):
+
+    def setUp(self):
+        self.user = create_user()
+        principal_cache.clear()
+        self.headers = {'HTTP_AUTHORIZATION': f'Bearer {self.user.generate_token()}'}
+
+    def get(self, **headers):
+        return self.client.get('/api/auth/profile/', **self.headers, **headers)
+
+    def test_if_none_match_returns_304(self):
+        etag = self.get()['ETag']
+
+        response = self.get(HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+        self.assertEqual(self.get(HTTP_IF_NONE_MATCH='"other"').status_code, 200)
+
+    def test_etag_changes_after_update(self):
+        etag = self.get()['ETag']
+        response = self.client.put(
+            '/api/auth/profile/', {'first_name': 'Renamed'},
+            content_type='application/json', **self.headers
+        )
+        self.assertEqual(response.status_code, 200)
+
+        response = self.get(HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(response.json()['first_name'], 'Renamed')
+
+
+@override_settings(BCRYPT_ROUNDS=4)
+class AsyncViewTests(TestCase):
+
+    def setUp(self):
+        self.user = create_user(password_hash=_hashpw('password123', 4))
+        principal_cache.clear()
+        session_cache.clear()
+        patcher = mock.patch.object(login_throttle, 'backend', LocalBucketBackend())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    async def login(self, **data):
+        return await self.async_client.post(
+            '/api/async/auth/login/',
+            dict({'email': 'user@test.com', 'password': 'password123'}, **data),
+            content_type='application/json'
+        )
+
+    async def profile(self, **headers):
+        return await self.async_client.get('/api/async/auth/profile/', headers=headers)
+
+    async def test_register(self):
+        data = {
+            'email': 'New@Test.com', 'first_name': 'New', 'last_name': 'User',
+            'password': 'password123', 'password_confirmation': 'password123',
+        }
+        response = await self.async_client.post(
+            '/api/async/auth/register/', data, content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()['email'], 'new@test.com')
+
+        response = await self.async_client.post(
+            '/api/async/auth/register/', data, content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 400)
+
+    async def test_login_profile_and_refresh(self):
+        response = await self.login()
+        self.assertEqual(response.status_code, 200)
+        tokens = response.json()
+
+        response = await self.profile(Authorization=f'Bearer {tokens["token"]}')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['email'], 'user@test.com')
+
+        response = await self.async_client.post(
+            '/api/async/auth/token/refresh/',
+            {'refresh_token': tokens['refresh_token']},
+            content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 200)
+        response = await self.profile(Authorization=f'Bearer {response.json()["token"]}')
+        self.assertEqual(response.status_code, 200)
+
+    async def test_wrong_password_and_anonymous(self):
+        self.assertEqual((await self.login(password='wrong-password')).status_code, 401)
+        self.assertEqual((await self.profile()).status_code, 401)
+        self.assertEqual((await self.profile(Authorization='Bearer garbage')).status_code, 401)
+
+    async def test_session_login(self):
+        response = await self.login(use_session=True)
+        session_id = response.json()['session_id']
+
+        response = await self.profile(**{'X-Session-ID': session_id})
+        self.assertEqual(response.status_code, 200)
+
+    async def test_revoked_tokens_are_rejected(self):
+        token = (await self.login()).json()['token']
+        await sync_to_async(self.user.revoke_tokens)()
+        principal_cache.clear()
+
+        self.assertEqual((await self.profile(Authorization=f'Bearer {token}')).status_code, 401)
+
+
+class RehashOnLoginTests(TransactionTestCase):
+    """
+    The rehash runs on a pool thread with its own connection, so the user
+    has to be committed for that thread to see it
+    """
+
+    def setUp(self):
+        self.user = create_user(password_hash=_hashpw('password123', 4))
+        patcher = mock.patch.object(login_throttle, 'backend', LocalBucketBackend())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def login(self):
+        return self.client.post(
+            '/api/auth/login/',
+            {'email': self.user.email, 'password': 'password123'},
+            content_type='application/json'
+        )
+
+    def test_lower_cost_hash_is_upgraded_once(self):
+        futures = []
+
+        def rehash(user, raw_password):
+            futures.append(rehash_in_background(user, raw_password))
+            return futures[-1]
+
+        with self.settings(BCRYPT_ROUNDS=5), mock.patch(
+            'authentication.views.rehash_in_background', side_effect=rehash
+        ):
+            self.assertEqual(self.login().status_code, 200)
+            futures[0].result()
+            upgraded = User.objects.get(pk=self.user.pk).password_hash
+            self.assertEqual(self.login().status_code, 200)
+
+        self.assertEqual(len(futures), 1)
+        self.assertEqual(hash_cost(upgraded), 5)
+        self.assertEqual(User.objects.get(pk=self.user.pk).password_hash, upgraded)
+
+    def test_stale_rehash_does_not_overwrite(self):
+        # Password changed between the login and the background job
+        stale = User.objects.get(pk=self.user.pk)
+        User.objects.filter(pk=self.user.pk).update(password_hash='changed')
+
+        with self.settings(BCRYPT_ROUNDS=5):
+            rehash_in_background(stale, 'password123').result()
+
+        self.assertEqual(User.objects.get(pk=self.user.pk).password_hash, 'changed')
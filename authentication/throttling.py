@@ -0,0 +1,151 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+
+
+def _refill(tokens, updated_at, now, rate, burst):
+    """Token count after refilling at rate tokens/sec, capped at burst"""
+    return min(burst, tokens + (now - updated_at) * rate)
+
+
+def _take(tokens, rate):
+    """
+    Try to take one token.
+    Returns (remaining_tokens, wait_seconds); wait is 0 when allowed.
+    """
+    if tokens >= 1:
+        return tokens - 1, 0.0
+    return tokens, (1 - tokens) / rate
+
+
+class LocalBucketBackend:
+    """
+    In-process token buckets. Each worker enforces its own limits, so the
+    effective limit is multiplied by the number of workers.
+    """
+
+    def __init__(self, max_keys=100000):
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def consume(self, key, rate, burst):
+        """Take one token from key's bucket; return seconds to wait (0 = allowed)"""
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated_at = self._buckets.get(key, (burst, now))
+            tokens, wait = _take(_refill(tokens, updated_at, now, rate, burst), rate)
+            self._buckets[key] = (tokens, now)
+            self._buckets.move_to_end(key)
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        return wait
+
+    def reset(self, key):
+        """Refill key's bucket"""
+        with self._lock:
+            self._buckets.pop(key, None)
+
+
+class CacheBucketBackend:
+    """
+    Token buckets stored in a Django cache (any alias from CACHES), shared by
+    every worker pointing at it. Read-modify-write is not atomic, so bursts
+    racing across workers may slightly exceed the limit; LocMemCache works as
+    a local stand-in for tests.
+    """
+
+    key_prefix = 'login-throttle:'
+
+    def __init__(self, alias):
+        self.alias = alias
+
+    def consume(self, key, rate, burst):
+        """Take one token from key's bucket; return seconds to wait (0 = allowed)"""
+        cache = caches[self.alias]
+        cache_key = self.key_prefix + key
+        now = time.time()
+        tokens, updated_at = cache.get(cache_key, (burst, now))
+        tokens, wait = _take(_refill(tokens, updated_at, now, rate, burst), rate)
+        # Keep the entry until the bucket would be full again
+        cache.set(cache_key, (tokens, now), int(burst / rate) + 1)
+        return wait
+
+    def reset(self, key):
+        """Refill key's bucket"""
+        caches[self.alias].delete(self.key_prefix + key)
+
+
+class LoginThrottle:
+    """
+    Per source IP and per email token-bucket limits for login attempts.
+    Checked before any user lookup or bcrypt work.
+    """
+
+    def __init__(self, backend, ip_rate, ip_burst, email_rate, email_burst):
+        self.backend = backend
+        self.ip_rate = ip_rate
+        self.ip_burst = ip_burst
+        self.email_rate = email_rate
+        self.email_burst = email_burst
+
+    @staticmethod
+    def _key(kind, value):
+        # Hash so arbitrary emails are safe as cache keys
+        return kind + ':' + hashlib.sha1(value.encode('utf-8')).hexdigest()
+
+    def check(self, ip, email):
+        """
+        Consume one attempt for ip and email.
+        Returns seconds until the caller may retry (0 = allowed).
+        """
+        wait = 0.0
+        if self.ip_rate > 0 and ip:
+            wait = max(wait, self.backend.consume(
+                self._key('ip', ip), self.ip_rate, self.ip_burst
+            ))
+        if self.email_rate > 0 and email:
+            wait = max(wait, self.backend.consume(
+                self._key('email', email), self.email_rate, self.email_burst
+            ))
+        return wait
+
+    def reset(self, email):
+        """
+        Refill email's bucket after a successful login, so earlier typos
+        don't lock the account owner out. The per-IP bucket is left alone:
+        one valid account must not buy a source unlimited guesses.
+        """
+        if self.email_rate > 0 and email:
+            self.backend.reset(self._key('email', email))
+
+
+def get_client_ip(request):
+    """Source IP of the request, honouring X-Forwarded-For only if configured"""
+    if settings.LOGIN_THROTTLE_TRUST_X_FORWARDED_FOR:
+        forwarded = request.META.get('HTTP_X_FORWARDED_FOR', '')
+        if forwarded:
+            return forwarded.split(',')[0].strip()
+    return request.META.get('REMOTE_ADDR', '')
+
+
+def _build_login_throttle():
+    if settings.LOGIN_THROTTLE_BACKEND:
+        backend = CacheBucketBackend(settings.LOGIN_THROTTLE_BACKEND)
+    else:
+        backend = LocalBucketBackend()
+    # Settings are per minute; buckets refill per second
+    return LoginThrottle(
+        backend,
+        ip_rate=settings.LOGIN_THROTTLE_IP_PER_MINUTE / 60.0,
+        ip_burst=settings.LOGIN_THROTTLE_IP_BURST,
+        email_rate=settings.LOGIN_THROTTLE_EMAIL_PER_MINUTE / 60.0,
+        email_burst=settings.LOGIN_THROTTLE_EMAIL_BURST,
+    )
+
+
+login_throttle = _build_login_throttle()
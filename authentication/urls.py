@@ -1,16 +1,34 @@
 from django.urls import path
 from .views import (
     RegisterView, 
+    BulkRegisterView,
     LoginView, 
+    TokenRefreshView,
     LogoutView, 
+    LogoutAllView,
     ProfileView, 
     DeleteAccountView
 )
+from .async_views import (
+    AsyncRegisterView,
+    AsyncLoginView,
+    AsyncTokenRefreshView,
+    AsyncProfileView
+)
 
 urlpatterns = [
     path('auth/register/', RegisterView.as_view(), name='register'),
+    path('auth/bulk-register/', BulkRegisterView.as_view(), name='bulk-register'),
     path('auth/login/', LoginView.as_view(), name='login'),
+    path('auth/token/refresh/', TokenRefreshView.as_view(), name='token-refresh'),
     path('auth/logout/', LogoutView.as_view(), name='logout'),
+    path('auth/logout-all/', LogoutAllView.as_view(), name='logout-all'),
     path('auth/profile/', ProfileView.as_view(), name='profile'),
     path('auth/delete-account/', DeleteAccountView.as_view(), name='delete-account'),
+
+    # Async variants (native under ASGI)
+    path('async/auth/register/', AsyncRegisterView.as_view(), name='async-register'),
+    path('async/auth/login/', AsyncLoginView.as_view(), name='async-login'),
+    path('async/auth/token/refresh/', AsyncTokenRefreshView.as_view(), name='async-token-refresh'),
+    path('async/auth/profile/', AsyncProfileView.as_view(), name='async-profile'),
 ]
@@ -1,10 +1,25 @@
+import codecs
+import csv
+import math
+from itertools import islice
+
+from django.conf import settings
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
-from .models import User, Session
+from rest_framework.exceptions import ValidationError
+from authorization.permissions import PermissionChecker
+from .bulk import ImportReport, import_users, read_records
+from .conditional import make_etag, not_modified, set_validators
+from .exceptions import HashingUnavailable
+from .hashing import hash_executor, rehash_in_background
+from .models import User, Session, RefreshToken
+from .revocation import revocation_list
+from .throttling import get_client_ip, login_throttle
 from .serializers import (
     UserRegistrationSerializer, 
     UserLoginSerializer, 
+    TokenRefreshSerializer,
     UserProfileSerializer,
     UserUpdateSerializer
 )
@@ -19,7 +34,14 @@ class RegisterView(APIView):
         serializer = UserRegistrationSerializer(data=request.data)
         
         if serializer.is_valid():
-            user = serializer.save()
+            try:
+                user = serializer.save()
+            except ValidationError as exc:
+                # Registered concurrently since validation - caught by the unique index
+                return Response(
+                    exc.detail, 
+                    status=status.HTTP_400_BAD_REQUEST
+                )
             return Response({
                 'message': 'User registered successfully',
                 'user_id': user.id,
@@ -32,6 +54,90 @@ class RegisterView(APIView):
         )
 
 
+class BulkRegisterView(APIView):
+    """
+    POST /api/auth/bulk-register/
+    Register many users at once (admin only)
+
+    Body is CSV with a header row (Content-Type: text/csv), JSON Lines
+    (application/x-ndjson) or JSON {"users": [...]}. Each record has the
+    registration fields plus an optional role name.
+    
+    Passwords are hashed on hash_executor, the bounded thread pool logins
+    use, rather than a process pool: bcrypt releases the GIL, and sharing
+    the pool keeps an import from starving logins. Large offline imports
+    belong in manage.py import_users, which can use processes.
+    
+    Chunks commit as they go. If the pool is saturated part way through the
+    response is 503 with the report of what was already imported.
+    """
+    def post(self, request):
+        if not hasattr(request, 'user') or request.user is None:
+            return Response(
+                {'error': 'Authentication required'}, 
+                status=status.HTTP_401_UNAUTHORIZED
+            )
+        
+        if not PermissionChecker.has_role(request.user, 'admin'):
+            return Response(
+                {'error': 'Admin access required'}, 
+                status=status.HTTP_403_FORBIDDEN
+            )
+        
+        content_type = request.content_type.split(';')[0].strip()
+        if content_type == 'text/csv':
+            records = read_records(codecs.iterdecode(request.stream or (), 'utf-8'), 'csv')
+        elif content_type in ('application/x-ndjson', 'application/jsonl'):
+            records = read_records(codecs.iterdecode(request.stream or (), 'utf-8'), 'jsonl')
+        else:
+            users = request.data.get('users') if isinstance(request.data, dict) else None
+            if not isinstance(users, list):
+                return Response(
+                    {'error': 'Expected a "users" list'}, 
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            records = enumerate(users, 1)
+        
+        # Parse at most one record past the limit before doing any work
+        limit = settings.BULK_IMPORT_MAX_RECORDS
+        try:
+            records = list(islice(records, limit + 1))
+        except (UnicodeDecodeError, csv.Error) as exc:
+            return Response(
+                {'error': f'Unreadable body: {exc}'}, 
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if len(records) > limit:
+            return Response(
+                {'error': f'At most {limit} users per request; use manage.py import_users'}, 
+                status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+            )
+        
+        report = ImportReport()
+        try:
+            import_users(
+                records,
+                executor=hash_executor,
+                chunk_size=settings.BULK_IMPORT_CHUNK_SIZE,
+                default_role=request.query_params.get('role') or None,
+                report=report,
+            )
+        except ValueError as exc:
+            return Response(
+                {'error': str(exc)}, 
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        except HashingUnavailable as exc:
+            # Earlier chunks are committed - say which, so the client can resume
+            return Response(
+                dict(report.as_dict(), error=str(exc.detail)), 
+                status=status.HTTP_503_SERVICE_UNAVAILABLE,
+                headers={'Retry-After': str(math.ceil(exc.wait or 1))}
+            )
+        
+        return Response(report.as_dict(), status=status.HTTP_200_OK)
+
+
 class LoginView(APIView):
     """
     POST /api/auth/login/
@@ -46,10 +152,19 @@ class LoginView(APIView):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        email = serializer.validated_data['email'].lower()
+        email = User.normalize_email(serializer.validated_data['email'])
         password = serializer.validated_data['password']
         
-        # Find user
+        # Throttle per IP and per email before paying for a lookup or bcrypt
+        wait = login_throttle.check(get_client_ip(request), email)
+        if wait:
+            return Response(
+                {'error': 'Too many login attempts, please retry later'},
+                status=status.HTTP_429_TOO_MANY_REQUESTS,
+                headers={'Retry-After': str(math.ceil(wait))}
+            )
+        
+        # Find user (single lookup on the unique email index)
         try:
             user = User.objects.get(email=email)
         except User.DoesNotExist:
@@ -72,16 +187,73 @@ class LoginView(APIView):
                 status=status.HTTP_401_UNAUTHORIZED
             )
         
-        # Generate JWT token
+        login_throttle.reset(email)
+        
+        # Move the hash to the configured cost without delaying the response
+        if user.needs_rehash():
+            rehash_in_background(user, password)
+        
+        # Generate short-lived JWT plus a rotating refresh token
         token = user.generate_token()
+        refresh_token = RefreshToken.issue(user)
         
-        return Response({
+        response = Response({
             'token': token,
+            'refresh_token': refresh_token,
+            'expires_in': settings.JWT_ACCESS_TOKEN_MINUTES * 60,
             'user_id': user.id,
             'email': user.email,
             'first_name': user.first_name,
             'last_name': user.last_name
         }, status=status.HTTP_200_OK)
+        
+        # Optional session-based authentication
+        if serializer.validated_data['use_session']:
+            session = Session.create_session(
+                user, 
+                hours=settings.SESSION_EXPIRATION_HOURS
+            )
+            response.data['session_id'] = session.session_id
+            response.set_cookie(
+                settings.AUTH_SESSION_COOKIE_NAME,
+                session.session_id,
+                max_age=settings.SESSION_EXPIRATION_HOURS * 3600,
+                secure=settings.SESSION_COOKIE_SECURE,
+                httponly=True,
+                samesite='Strict'
+            )
+        
+        return response
+
+
+class TokenRefreshView(APIView):
+    """
+    POST /api/auth/token/refresh/
+    Exchange a refresh token for a new access token and refresh token
+    """
+    def post(self, request):
+        serializer = TokenRefreshSerializer(data=request.data)
+        
+        if not serializer.is_valid():
+            return Response(
+                serializer.errors, 
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        user, refresh_token = RefreshToken.rotate(
+            serializer.validated_data['refresh_token']
+        )
+        if user is None:
+            return Response(
+                {'error': 'Invalid or expired refresh token'}, 
+                status=status.HTTP_401_UNAUTHORIZED
+            )
+        
+        return Response({
+            'token': user.generate_token(),
+            'refresh_token': refresh_token,
+            'expires_in': settings.JWT_ACCESS_TOKEN_MINUTES * 60
+        }, status=status.HTTP_200_OK)
 
 
 class LogoutView(APIView):
@@ -96,14 +268,43 @@ class LogoutView(APIView):
                 status=status.HTTP_401_UNAUTHORIZED
             )
         
-        # For JWT, client should remove token
-        # For session-based, delete session here
+        # Denylist the presented access token and revoke refresh tokens so
+        # it can't be renewed. For session-based, delete session here
+        claims = getattr(request.user, 'claims', None)
+        if claims and 'jti' in claims:
+            revocation_list.revoke(claims['jti'], claims['exp'])
+        RefreshToken.revoke_all(request.user)
         Session.objects.filter(user=request.user).delete()
         
-        return Response(
+        response = Response(
             {'message': 'Logged out successfully'}, 
             status=status.HTTP_200_OK
         )
+        response.delete_cookie(settings.AUTH_SESSION_COOKIE_NAME)
+        return response
+
+
+class LogoutAllView(APIView):
+    """
+    POST /api/auth/logout-all/
+    Invalidate every token issued to the current user, on all devices
+    """
+    def post(self, request):
+        if not hasattr(request, 'user') or request.user is None:
+            return Response(
+                {'error': 'Not authenticated'}, 
+                status=status.HTTP_401_UNAUTHORIZED
+            )
+        
+        # Bumping token_version invalidates all outstanding access tokens
+        request.user.revoke_tokens()
+        RefreshToken.revoke_all(request.user)
+        Session.objects.filter(user=request.user).delete()
+        
+        return Response(
+            {'message': 'Logged out from all devices'}, 
+            status=status.HTTP_200_OK
+        )
 
 
 class ProfileView(APIView):
@@ -118,8 +319,18 @@ class ProfileView(APIView):
                 status=status.HTTP_401_UNAUTHORIZED
             )
         
-        serializer = UserProfileSerializer(request.user)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        # Validators come from the row itself - the cached principal can lag
+        # another worker's write - and a 304 still skips the serializer
+        user = User.objects.get(pk=request.user.id)
+        updated_at = user.updated_at
+        etag = make_etag('profile', user.id, updated_at.isoformat())
+        response = not_modified(request, etag=etag, last_modified=updated_at)
+        if response is not None:
+            return response
+        
+        serializer = UserProfileSerializer(user)
+        response = Response(serializer.data, status=status.HTTP_200_OK)
+        return set_validators(response, etag=etag, last_modified=updated_at)
 
     def put(self, request):
         """
@@ -170,12 +381,14 @@ class DeleteAccountView(APIView):
                 status=status.HTTP_401_UNAUTHORIZED
             )
         
-        # Soft delete - set is_active to False
+        # Soft delete - set is_active to False and invalidate all tokens
         request.user.is_active = False
-        request.user.save()
+        request.user.save(update_fields=['is_active', 'updated_at'])
+        request.user.revoke_tokens()
         
-        # Delete all sessions
+        # Delete all sessions and refresh tokens
         Session.objects.filter(user=request.user).delete()
+        RefreshToken.revoke_all(request.user)
         
         return Response(
             {'message': 'Account deactivated successfully'}, 
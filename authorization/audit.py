@@ -0,0 +1,177 @@
+import atexit
+import logging
+import os
+import random
+import threading
+from collections import deque
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.utils import timezone
+
+from .models import AuthorizationAudit
+
+
+logger = logging.getLogger(__name__)
+
+
+class AuditLog:
+    """
+    Buffered writer for permission decisions.
+
+    record() only appends a tuple to a bounded in-memory ring buffer; a
+    daemon thread drains it with bulk_create every flush_interval seconds, or
+    sooner once batch_size records are waiting. When the buffer is full the
+    oldest record is overwritten and counted as dropped, so a slow or
+    unavailable database never blocks or fails a request.
+    """
+
+    def __init__(self, enabled=True, capacity=10000, flush_interval=1.0,
+                 batch_size=500, sample_rate=1.0):
+        self.enabled = enabled and capacity > 0
+        self.capacity = capacity
+        self.flush_interval = flush_interval
+        self.batch_size = max(batch_size, 1)
+        self.sample_rate = sample_rate
+        self.recorded = 0
+        self.sampled_out = 0
+        self.dropped = 0
+        self.written = 0
+        self.failed = 0
+        self._buffer = deque(maxlen=max(capacity, 1))
+        self._wakeup = threading.Event()
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+
+    def record(self, user, element_name, action, obj, allowed, reason, latency):
+        """
+        Queue one decision. Grants are kept with probability sample_rate;
+        denials are always kept. latency is in seconds.
+        """
+        if not self.enabled:
+            return
+        if allowed and self.sample_rate < 1.0 and random.random() >= self.sample_rate:
+            with self._lock:
+                self.sampled_out += 1
+            return
+
+        entry = (
+            getattr(user, 'id', None),
+            element_name,
+            action,
+            _object_id(obj),
+            allowed,
+            reason,
+            int(latency * 1000000),
+            timezone.now(),
+        )
+        with self._lock:
+            if len(self._buffer) == self.capacity:
+                self.dropped += 1
+            self._buffer.append(entry)
+            self.recorded += 1
+            pending = len(self._buffer)
+
+        self._ensure_flusher()
+        if pending >= self.batch_size:
+            self._wakeup.set()
+
+    def flush(self):
+        """Write everything buffered so far; returns the number of rows written"""
+        written = 0
+        with self._flush_lock:
+            while True:
+                with self._lock:
+                    batch = [
+                        self._buffer.popleft()
+                        for _ in range(min(self.batch_size, len(self._buffer)))
+                    ]
+                if not batch:
+                    break
+                try:
+                    AuthorizationAudit.objects.bulk_create([
+                        AuthorizationAudit(
+                            user_id=user_id,
+                            element=element,
+                            action=action,
+                            object_id=object_id,
+                            allowed=allowed,
+                            reason=(reason or '')[:255],
+                            latency_us=latency_us,
+                            created_at=created_at,
+                        )
+                        for (user_id, element, action, object_id, allowed,
+                             reason, latency_us, created_at) in batch
+                    ])
+                except Exception:
+                    # Don't retry forever against a broken database
+                    logger.exception('Dropping %d audit records', len(batch))
+                    with self._lock:
+                        self.failed += len(batch)
+                    break
+                written += len(batch)
+                with self._lock:
+                    self.written += len(batch)
+        return written
+
+    def stats(self):
+        """Return buffer occupancy and record/drop/write counters"""
+        with self._lock:
+            return {
+                'enabled': self.enabled,
+                'pending': len(self._buffer),
+                'capacity': self.capacity,
+                'sample_rate': self.sample_rate,
+                'recorded': self.recorded,
+                'sampled_out': self.sampled_out,
+                'dropped': self.dropped,
+                'written': self.written,
+                'failed': self.failed,
+            }
+
+    def _ensure_flusher(self):
+        # Started by the first record(), so processes that never check a
+        # permission (management commands, most tests) run no thread and
+        # register no exit hook. Threads do not survive fork(), so each
+        # worker starts its own; the exit hook is inherited.
+        if self._thread is not None and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread is None or self._pid != os.getpid():
+                if self._thread is None:
+                    # Write out whatever is still buffered when the process exits
+                    atexit.register(self.flush)
+                self._thread = threading.Thread(
+                    target=self._run, name='audit-flusher', daemon=True
+                )
+                self._pid = os.getpid()
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            finally:
+                close_old_connections()
+
+
+def _object_id(obj):
+    if obj is None:
+        return ''
+    object_id = getattr(obj, 'id', None)
+    if object_id is None and isinstance(obj, dict):
+        object_id = obj.get('id')
+    return '' if object_id is None else str(object_id)[:64]
+
+
+audit_log = AuditLog(
+    enabled=settings.AUDIT_ENABLED,
+    capacity=settings.AUDIT_BUFFER_SIZE,
+    flush_interval=settings.AUDIT_FLUSH_INTERVAL_MS / 1000,
+    batch_size=settings.AUDIT_FLUSH_BATCH_SIZE,
+    sample_rate=settings.AUDIT_SAMPLE_RATE,
+)
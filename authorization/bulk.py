@@ -0,0 +1,189 @@
+import csv
+import json
+
+from django.db import transaction
+
+from .matrix import PERMISSION_BITS
+from .models import AccessRoleRule, BusinessElement, PolicyVersion, Role
+from .serializers import MatrixRuleSerializer
+from .signals import deferred_policy_changes, policy_changed
+
+
+PERMISSION_FIELDS = [field for field, _ in PERMISSION_BITS]
+
+MATRIX_COLUMNS = ['role', 'element'] + PERMISSION_FIELDS
+
+
+class MatrixDiff:
+    """Changes needed to turn the access_roles_rules table into a new matrix"""
+
+    def __init__(self):
+        self.to_create = []
+        self.to_update = []
+        self.to_delete = []
+        self.unchanged = 0
+
+    @property
+    def changed(self):
+        return bool(self.to_create or self.to_update or self.to_delete)
+
+    def as_dict(self):
+        return {
+            'created': len(self.to_create),
+            'updated': len(self.to_update),
+            'deleted': len(self.to_delete),
+            'unchanged': self.unchanged,
+        }
+
+
+def parse_matrix(records):
+    """
+    Validate (line_number, record) pairs into {(role_id, element_id): flags}.
+
+    Roles and elements are referenced by name; omitted or empty permission
+    flags are False. Returns (matrix, errors) - matrix is None if any record
+    was invalid.
+    """
+    role_ids = dict(Role.objects.values_list('name', 'id'))
+    element_ids = dict(BusinessElement.objects.values_list('name', 'id'))
+
+    matrix = {}
+    errors = []
+    for line, record in records:
+        if not isinstance(record, dict):
+            errors.append({'line': line, 'error': 'Invalid record'})
+            continue
+
+        # CSV leaves unset cells empty
+        record = {
+            key: value for key, value in record.items()
+            if value is not None and value != ''
+        }
+        serializer = MatrixRuleSerializer(data=record)
+        if not serializer.is_valid():
+            errors.append({'line': line, 'error': {
+                field: [str(message) for message in messages]
+                for field, messages in serializer.errors.items()
+            }})
+            continue
+
+        data = serializer.validated_data
+        role_id = role_ids.get(data['role'])
+        element_id = element_ids.get(data['element'])
+        if role_id is None:
+            errors.append({'line': line, 'error': f"Unknown role: {data['role']}"})
+        elif element_id is None:
+            errors.append({'line': line, 'error': f"Unknown element: {data['element']}"})
+        elif (role_id, element_id) in matrix:
+            errors.append({
+                'line': line,
+                'error': f"Duplicate rule for {data['role']} on {data['element']}"
+            })
+        else:
+            matrix[(role_id, element_id)] = {
+                field: data[field] for field in PERMISSION_FIELDS
+            }
+
+    return (None if errors else matrix), errors
+
+
+def diff_matrix(matrix, queryset=None):
+    """
+    Compare {(role_id, element_id): flags} with the stored rules. Rules
+    missing from matrix are deleted - it replaces the whole table.
+    """
+    if queryset is None:
+        queryset = AccessRoleRule.objects.all()
+
+    diff = MatrixDiff()
+    existing = {}
+    for rule in queryset.only('id', 'role_id', 'element_id', *PERMISSION_FIELDS):
+        existing[(rule.role_id, rule.element_id)] = rule
+
+    for key, flags in matrix.items():
+        rule = existing.pop(key, None)
+        if rule is None:
+            diff.to_create.append(
+                AccessRoleRule(role_id=key[0], element_id=key[1], **flags)
+            )
+        elif any(getattr(rule, field) != value for field, value in flags.items()):
+            for field, value in flags.items():
+                setattr(rule, field, value)
+            diff.to_update.append(rule)
+        else:
+            diff.unchanged += 1
+
+    diff.to_delete = [rule.id for rule in existing.values()]
+    return diff
+
+
+def apply_matrix(matrix, dry_run=False, batch_size=1000):
+    """
+    Replace the access rules with matrix in one transaction.
+
+    Rows are written with bulk_create/bulk_update and one delete() of the
+    removed ids; the permission matrix is invalidated (and the policy
+    version bumped) once, after commit, however many rows changed.
+    Returns the MatrixDiff.
+    """
+    if dry_run:
+        return diff_matrix(matrix)
+
+    with transaction.atomic(), deferred_policy_changes():
+        # Row locks only cover rules that already exist, so concurrent
+        # imports would race to insert the same new pair; queue them on the
+        # policy_version row instead and diff once we hold it
+        PolicyVersion.objects.select_for_update().get_or_create(pk=1)
+        diff = diff_matrix(matrix)
+        if not diff.changed:
+            return diff
+
+        if diff.to_delete:
+            AccessRoleRule.objects.filter(id__in=diff.to_delete).delete()
+        AccessRoleRule.objects.bulk_create(diff.to_create, batch_size=batch_size)
+        AccessRoleRule.objects.bulk_update(
+            diff.to_update, PERMISSION_FIELDS, batch_size=batch_size
+        )
+        policy_changed()
+    return diff
+
+
+def export_rows(chunk_size=2000):
+    """Yield every rule as a dict of MATRIX_COLUMNS, in (role, element) id order"""
+    rows = (
+        AccessRoleRule.objects
+        .order_by('role_id', 'element_id')
+        .values_list('role__name', 'element__name', *PERMISSION_FIELDS)
+        .iterator(chunk_size=chunk_size)
+    )
+    for row in rows:
+        yield dict(zip(MATRIX_COLUMNS, row))
+
+
+class _Echo:
+    """File-like object whose write() hands the line back to csv.writer's caller"""
+
+    def write(self, value):
+        return value
+
+
+def export_csv(chunk_size=2000):
+    """Stream the matrix as CSV lines (header first)"""
+    writer = csv.writer(_Echo())
+    yield writer.writerow(MATRIX_COLUMNS)
+    for row in export_rows(chunk_size):
+        yield writer.writerow([
+            row['role'],
+            row['element'],
+            *('true' if row[field] else 'false' for field in PERMISSION_FIELDS)
+        ])
+
+
+def export_json(chunk_size=2000):
+    """Stream the matrix as {"rules": [...]}, the same shape PUT accepts"""
+    yield '{"rules": ['
+    separator = ''
+    for row in export_rows(chunk_size):
+        yield separator + json.dumps(row)
+        separator = ', '
+    yield ']}'
@@ -0,0 +1,18 @@
+from django.conf import settings
+from django.core.checks import Error, register
+
+
+@register()
+def check_policy_version_backend(app_configs, **kwargs):
+    """
+    An in-process policy version is never seen by other workers, so role
+    changes, deactivations and logout-all would only take effect in the
+    worker that made them. Allow it only with DEBUG on.
+    """
+    if settings.POLICY_VERSION_BACKEND or settings.DEBUG:
+        return []
+    return [Error(
+        'POLICY_VERSION_BACKEND is empty (in-process) with DEBUG off.',
+        hint="Use 'db' or the alias of a cache shared by every worker.",
+        id='authorization.E001',
+    )]
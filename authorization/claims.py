@@ -0,0 +1,50 @@
+from .matrix import permission_matrix
+from .models import UserRole
+from .policy import policy_version
+
+
+def build_authz_claims(user, include_permissions=False):
+    """
+    Build the authorization claims embedded in a JWT
+
+    Args:
+        user: User the token is minted for
+        include_permissions: Also embed a per-element permission bitmask
+
+    Returns:
+        dict: 'roles' (role ids), 'pv' (policy version) and optionally
+        'perms' (element name -> bitmask). 'pv' is left out while the
+        policy version is unknown, so such claims are never trusted.
+    """
+    # Read the version before the data it vouches for: a change racing
+    # with this can only make the claims look older than they are
+    version = policy_version.check()
+    matrix = permission_matrix.snapshot()
+    role_ids = sorted(
+        UserRole.objects.filter(user_id=user.id).values_list('role_id', flat=True)
+    )
+
+    claims = {'roles': role_ids}
+    if version is not None:
+        claims['pv'] = version
+    if include_permissions:
+        claims['perms'] = matrix.masks(role_ids)
+    return claims
+
+
+def get_current_claims(user):
+    """
+    Return the authorization claims carried by the user's token if they were
+    minted at the current policy version, otherwise None.
+
+    Every change to rules, roles, elements, role edges or role assignments
+    bumps the shared policy version, so matching claims can be used on
+    their own, without looking up the user's roles.
+    """
+    claims = getattr(user, 'claims', None)
+    if not claims or 'roles' not in claims:
+        return None
+    version = policy_version.version
+    if version is None or claims.get('pv') != version:
+        return None
+    return claims
@@ -0,0 +1,64 @@
+from .matrix import permission_matrix
+from .models import UserRole
+
+
+class AuthorizationContext:
+    """
+    Request-scoped authorization state for one user.
+
+    Role ids are loaded once (from the cached principal when available),
+    role names come from the compiled permission matrix, and permission
+    masks and decisions are memoized, so repeated checks within a request
+    issue no further queries.
+    """
+
+    def __init__(self, user):
+        self.user = user
+        self._role_ids = None
+        self._masks = {}
+        self.decisions = {}
+
+    @property
+    def role_ids(self):
+        """Ids of the user's roles"""
+        if self._role_ids is None:
+            role_ids = getattr(self.user, 'role_ids', None)
+            if role_ids is None:
+                role_ids = UserRole.objects.filter(
+                    user_id=self.user.id
+                ).values_list('role_id', flat=True)
+            self._role_ids = frozenset(role_ids)
+        return self._role_ids
+
+    @property
+    def role_names(self):
+        """Names of the user's roles, including inherited ones"""
+        matrix = permission_matrix.snapshot()
+        return frozenset(
+            matrix.roles[role_id]
+            for role_id in matrix.effective_roles(self.role_ids)
+            if role_id in matrix.roles
+        )
+
+    def mask(self, element_name, matrix=None):
+        """
+        Combined permission bitmask of the user's roles on element_name,
+        or None if none of them has a rule for it
+        """
+        if matrix is None:
+            matrix = permission_matrix.snapshot()
+        key = (matrix.version, element_name)
+        if key not in self._masks:
+            self._masks[key] = matrix.mask(self.role_ids, element_name)
+        return self._masks[key]
+
+
+def authorization_context(user):
+    """
+    Return the AuthorizationContext for user, creating it on first use.
+    It lives on the user object, which is built per request.
+    """
+    context = user.__dict__.get('_authz')
+    if context is None:
+        context = user.__dict__['_authz'] = AuthorizationContext(user)
+    return context
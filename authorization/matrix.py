@@ -0,0 +1,172 @@
+import threading
+import zlib
+from collections import namedtuple
+
+from asgiref.sync import sync_to_async
+
+from .models import AccessRoleRule, BusinessElement, Role, RoleInheritance
+
+
+# Permission bits, one per AccessRoleRule flag
+READ = 1
+READ_ALL = 2
+CREATE = 4
+UPDATE = 8
+UPDATE_ALL = 16
+DELETE = 32
+DELETE_ALL = 64
+
+PERMISSION_BITS = (
+    ('read_permission', READ),
+    ('read_all_permission', READ_ALL),
+    ('create_permission', CREATE),
+    ('update_permission', UPDATE),
+    ('update_all_permission', UPDATE_ALL),
+    ('delete_permission', DELETE),
+    ('delete_all_permission', DELETE_ALL),
+)
+
+
+def rule_mask(rule):
+    """Pack the permission flags of an AccessRoleRule (or dict) into a bitmask"""
+    if isinstance(rule, dict):
+        return sum(bit for field, bit in PERMISSION_BITS if rule[field])
+    return sum(bit for field, bit in PERMISSION_BITS if getattr(rule, field))
+
+
+def role_closure(role_ids, parents):
+    """
+    Map each role id to the frozenset of itself and every role it inherits
+    from, directly or transitively. parents maps role id to its parent ids;
+    cycles are tolerated (every role on a cycle inherits the others).
+    """
+    closure = {}
+    for role_id in role_ids:
+        seen = {role_id}
+        stack = [role_id]
+        while stack:
+            for parent_id in parents.get(stack.pop(), ()):
+                if parent_id not in seen:
+                    seen.add(parent_id)
+                    stack.append(parent_id)
+        closure[role_id] = frozenset(seen)
+    return closure
+
+
+class MatrixState(namedtuple(
+    'MatrixState', ['elements', 'rules', 'version', 'roles', 'closure']
+)):
+    """
+    Immutable compiled view of the access rules table.
+
+    elements is the set of known business element names; rules maps
+    (role_id, element_name) to the effective permission bitmask, with the
+    grants of inherited roles already folded in; roles maps role id to
+    role name; closure maps role id to the ids of itself and its ancestors.
+    version is a fingerprint of the rules, elements, roles and hierarchy,
+    identical in every process that loaded the same policy.
+    """
+    __slots__ = ()
+
+    def effective_roles(self, role_ids):
+        """Ids of role_ids plus every role they inherit from"""
+        effective = set()
+        for role_id in role_ids:
+            effective |= self.closure.get(role_id, {role_id})
+        return frozenset(effective)
+
+    def mask(self, role_ids, element_name):
+        """
+        OR together the effective masks of role_ids on element_name.
+        Returns None if none of the roles has (or inherits) a rule for it.
+        """
+        mask = None
+        for role_id in role_ids:
+            rule = self.rules.get((role_id, element_name))
+            if rule is not None:
+                mask = rule if mask is None else mask | rule
+        return mask
+
+    def masks(self, role_ids):
+        """Map every element the roles have a rule for to its combined mask"""
+        masks = {}
+        for element_name in self.elements:
+            mask = self.mask(role_ids, element_name)
+            if mask is not None:
+                masks[element_name] = mask
+        return masks
+
+
+class PermissionMatrix:
+    """
+    Per-process compiled copy of AccessRoleRule.
+
+    The table is loaded lazily on first use and rebuilt on the next access
+    after invalidate() is called (from model signals). Readers always see a
+    complete MatrixState since a rebuild swaps the reference in one step.
+    """
+
+    def __init__(self):
+        self._state = None
+        self._stale = True
+        self._lock = threading.Lock()
+
+    def snapshot(self):
+        """Return the current MatrixState, rebuilding it if stale"""
+        state = self._state
+        if state is None or self._stale:
+            with self._lock:
+                if self._state is None or self._stale:
+                    self._stale = False
+                    try:
+                        self._state = self.build()
+                    except Exception:
+                        self._stale = True
+                        raise
+                state = self._state
+        return state
+
+    async def asnapshot(self):
+        """Async variant of snapshot(); only a rebuild leaves the event loop"""
+        state = self._state
+        if state is None or self._stale:
+            state = await sync_to_async(self.snapshot)()
+        return state
+
+    def invalidate(self):
+        """Mark the matrix stale so the next reader rebuilds it"""
+        self._stale = True
+
+    @staticmethod
+    def build():
+        """Load every rule, element, role and role edge into a MatrixState"""
+        fields = [field for field, _ in PERMISSION_BITS]
+        direct = {}
+        for row in AccessRoleRule.objects.values('role_id', 'element__name', *fields):
+            direct.setdefault(row['role_id'], {})[row['element__name']] = rule_mask(row)
+        elements = frozenset(BusinessElement.objects.values_list('name', flat=True))
+        roles = dict(Role.objects.values_list('id', 'name'))
+
+        parents = {}
+        edges = sorted(RoleInheritance.objects.values_list('role_id', 'parent_id'))
+        for role_id, parent_id in edges:
+            parents.setdefault(role_id, []).append(parent_id)
+        closure = role_closure(roles, parents)
+
+        # Fold inherited grants in once here, so a check is one dict lookup
+        # per direct role instead of a walk up the hierarchy
+        rules = {}
+        for role_id, ancestors in closure.items():
+            for ancestor_id in ancestors:
+                for element_name, mask in direct.get(ancestor_id, {}).items():
+                    key = (role_id, element_name)
+                    rules[key] = rules.get(key, 0) | mask
+
+        fingerprint = repr((
+            sorted(elements), sorted(rules.items()), sorted(roles.items()), edges
+        ))
+        version = zlib.crc32(fingerprint.encode('utf-8'))
+        return MatrixState(elements, rules, version, roles, closure)
+
+
+permission_matrix = PermissionMatrix()
@@ -0,0 +1,221 @@
+import threading
+from bisect import bisect_left
+
+from django.conf import settings
+from django.db import connection
+
+from authentication.cache import principal_cache, session_cache, token_cache
+from authentication.hashing import hash_executor
+
+
+# Upper bounds (seconds) of the check latency histogram buckets
+LATENCY_BUCKETS = (
+    0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005,
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1,
+)
+
+# Slots of a series: count, latency sum, query count, then one per bucket
+# (the last bucket is +Inf)
+_COUNT, _SUM, _QUERIES, _BUCKETS = 0, 1, 2, 3
+
+
+class QueryCounter:
+    """Context manager counting queries executed on the current connection"""
+
+    def __init__(self):
+        self.count = 0
+        self._wrapper = None
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+    def __enter__(self):
+        self._wrapper = connection.execute_wrapper(self)
+        self._wrapper.__enter__()
+        return self
+
+    def __exit__(self, *exc_info):
+        return self._wrapper.__exit__(*exc_info)
+
+
+class CheckMetrics:
+    """
+    Counters and latency histograms of permission checks, keyed by
+    (element, action, outcome).
+
+    Each thread writes to its own dict of series, so observe() takes no
+    lock; only a thread's first observation registers its dict. collect()
+    sums the per-thread dicts, folding in and forgetting those of threads
+    that have exited so totals stay monotonic.
+    """
+
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self._local = threading.local()
+        self._threads = []
+        self._retired = {}
+        self._lock = threading.Lock()
+
+    def observe(self, element_name, action, allowed, latency, queries=0):
+        """Record one check (latency in seconds)"""
+        if not self.enabled:
+            return
+        series = getattr(self._local, 'series', None)
+        if series is None:
+            series = self._local.series = {}
+            with self._lock:
+                self._threads.append((threading.current_thread(), series))
+
+        key = (element_name, action, 'granted' if allowed else 'denied')
+        slots = series.get(key)
+        if slots is None:
+            slots = series[key] = [0, 0.0, 0] + [0] * (len(LATENCY_BUCKETS) + 1)
+        slots[_COUNT] += 1
+        slots[_SUM] += latency
+        slots[_QUERIES] += queries
+        slots[_BUCKETS + bisect_left(LATENCY_BUCKETS, latency)] += 1
+
+    def collect(self):
+        """Return {(element, action, outcome): slots} summed over all threads"""
+        with self._lock:
+            live = []
+            for thread, series in self._threads:
+                if thread.is_alive():
+                    live.append((thread, series))
+                else:
+                    _merge(self._retired, series)
+            self._threads = live
+
+            totals = {}
+            _merge(totals, self._retired)
+            for _, series in live:
+                # dict() copies atomically under the GIL; a racing update
+                # lands in the next scrape
+                _merge(totals, dict(series))
+        return totals
+
+    def render(self):
+        """Prometheus text exposition of the collected series"""
+        totals = self.collect()
+        lines = [
+            '# HELP authz_checks_total Permission checks by element, action and outcome',
+            '# TYPE authz_checks_total counter',
+        ]
+        for key in sorted(totals):
+            lines.append(
+                f'authz_checks_total{{{_labels(key)}}} {totals[key][_COUNT]}'
+            )
+
+        lines += [
+            '# HELP authz_check_queries_total Database queries issued by permission checks',
+            '# TYPE authz_check_queries_total counter',
+        ]
+        for key in sorted(totals):
+            lines.append(
+                f'authz_check_queries_total{{{_labels(key)}}} {totals[key][_QUERIES]}'
+            )
+
+        lines += [
+            '# HELP authz_check_duration_seconds Permission check latency',
+            '# TYPE authz_check_duration_seconds histogram',
+        ]
+        for key in sorted(totals):
+            slots = totals[key]
+            labels = _labels(key)
+            cumulative = 0
+            bounds = [repr(bound) for bound in LATENCY_BUCKETS] + ['+Inf']
+            for bound, count in zip(bounds, slots[_BUCKETS:]):
+                cumulative += count
+                lines.append(
+                    f'authz_check_duration_seconds_bucket{{{labels},le="{bound}"}} {cumulative}'
+                )
+            lines.append(f'authz_check_duration_seconds_sum{{{labels}}} {slots[_SUM]!r}')
+            lines.append(f'authz_check_duration_seconds_count{{{labels}}} {slots[_COUNT]}')
+
+        return '\n'.join(lines) + '\n'
+
+
+def _merge(totals, series):
+    for key, slots in series.items():
+        target = totals.get(key)
+        if target is None:
+            totals[key] = list(slots)
+        else:
+            for index, value in enumerate(slots):
+                target[index] += value
+
+
+def _labels(key):
+    element_name, action, outcome = key
+    return (
+        f'element="{_escape(element_name)}",action="{_escape(action)}",'
+        f'outcome="{outcome}"'
+    )
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def render_samples(samples):
+    """
+    Prometheus text for (name, type, help, value) samples. value is a
+    number, or {label string: number} for a labelled family.
+    """
+    lines = []
+    for name, kind, help_text, value in samples:
+        lines += [f'# HELP {name} {help_text}', f'# TYPE {name} {kind}']
+        if isinstance(value, dict):
+            lines += [f'{name}{{{labels}}} {number!r}' for labels, number in value.items()]
+        else:
+            lines.append(f'{name} {value!r}')
+    return '\n'.join(lines) + '\n'
+
+
+def hash_samples():
+    """Samples from the bcrypt pool's stats()"""
+    stats = hash_executor.stats()
+    return [
+        ('authn_hash_completed_total', 'counter',
+         'Password hashes completed', stats['completed']),
+        ('authn_hash_rejected_total', 'counter',
+         'Password hashes refused because the pool and queue were full', stats['rejected']),
+        ('authn_hash_in_flight', 'gauge',
+         'Password hashes queued or running', stats['in_flight']),
+        ('authn_hash_queue_wait_seconds_total', 'counter',
+         'Time hashes spent waiting for a pool thread', stats['queue_wait_total_ms'] / 1000),
+        ('authn_hash_queue_wait_seconds_max', 'gauge',
+         'Longest wait for a pool thread', stats['queue_wait_max_ms'] / 1000),
+        ('authn_hash_seconds_total', 'counter',
+         'Time spent hashing', stats['hash_time_total_ms'] / 1000),
+        ('authn_hash_seconds_max', 'gauge',
+         'Longest single hash', stats['hash_time_max_ms'] / 1000),
+    ]
+
+
+def cache_samples():
+    """Samples from the stats() of the per-process authentication caches"""
+    caches = {
+        'token': token_cache.stats(),
+        'principal': principal_cache.stats(),
+        'session': session_cache.stats(),
+    }
+
+    def by_cache(field):
+        return {f'cache="{name}"': stats[field] for name, stats in caches.items()}
+
+    return [
+        ('authn_cache_hits_total', 'counter', 'Cache lookups answered in process', by_cache('hits')),
+        ('authn_cache_misses_total', 'counter', 'Cache lookups that fell through', by_cache('misses')),
+        ('authn_cache_entries', 'gauge', 'Entries held in process', by_cache('size')),
+        ('authn_cache_max_entries', 'gauge', 'Configured cache capacity', by_cache('max_size')),
+    ]
+
+
+def render_metrics():
+    """Everything /api/metrics exposes, in Prometheus text format"""
+    return check_metrics.render() + render_samples(hash_samples() + cache_samples())
+
+
+check_metrics = CheckMetrics(enabled=settings.METRICS_ENABLED)
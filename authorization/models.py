@@ -1,4 +1,5 @@
 from django.db import models
+from django.utils import timezone
 from authentication.models import User
 
 
@@ -8,6 +9,14 @@ class Role(models.Model):
     """
     name = models.CharField(max_length=50, unique=True)
     description = models.TextField(blank=True)
+    parents = models.ManyToManyField(
+        'self',
+        through='RoleInheritance',
+        through_fields=('role', 'parent'),
+        symmetrical=False,
+        related_name='children',
+        blank=True
+    )
 
     class Meta:
         db_table = 'roles'
@@ -17,6 +26,35 @@ class Role(models.Model):
         return self.name
 
 
+class RoleInheritance(models.Model):
+    """
+    Role hierarchy edge: role inherits every access rule of parent
+    """
+    role = models.ForeignKey(
+        Role, 
+        on_delete=models.CASCADE, 
+        related_name='parent_links'
+    )
+    parent = models.ForeignKey(
+        Role, 
+        on_delete=models.CASCADE, 
+        related_name='child_links'
+    )
+
+    class Meta:
+        db_table = 'role_inheritance'
+        unique_together = ('role', 'parent')
+        constraints = [
+            models.CheckConstraint(
+                check=~models.Q(role=models.F('parent')),
+                name='role_inheritance_not_self'
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.role.name} -> {self.parent.name}"
+
+
 class UserRole(models.Model):
     """
     Junction table for many-to-many relationship between Users and Roles
@@ -88,3 +126,41 @@ class AccessRoleRule(models.Model):
 
     def __str__(self):
         return f"{self.role.name} - {self.element.name}"
+
+
+class PolicyVersion(models.Model):
+    """
+    Single-row counter bumped on every policy write, polled by workers to
+    invalidate their permission caches (POLICY_VERSION_BACKEND=db)
+    """
+    version = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'policy_version'
+
+    def __str__(self):
+        return f"Policy version {self.version}"
+
+
+class AuthorizationAudit(models.Model):
+    """
+    One recorded permission decision. Written in batches by the audit
+    flusher, so user_id is a plain column rather than a foreign key.
+    """
+    user_id = models.IntegerField(null=True, db_index=True)
+    element = models.CharField(max_length=100)
+    action = models.CharField(max_length=20)
+    object_id = models.CharField(max_length=64, blank=True)
+    allowed = models.BooleanField()
+    reason = models.CharField(max_length=255, blank=True)
+    latency_us = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(default=timezone.now, db_index=True)
+
+    class Meta:
+        db_table = 'authorization_audit'
+        ordering = ['-created_at']
+
+    def __str__(self):
+        outcome = 'granted' if self.allowed else 'denied'
+        return f"{self.user_id} {self.action} {self.element}: {outcome}"
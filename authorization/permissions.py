@@ -1,6 +1,39 @@
+import time
+
 from rest_framework.response import Response
 from rest_framework import status
-from .models import AccessRoleRule, BusinessElement
+from .audit import audit_log
+from .claims import get_current_claims
+from .context import authorization_context
+from .metrics import QueryCounter, check_metrics
+from .predicates import Predicate
+from .matrix import (
+    CREATE, DELETE, DELETE_ALL, READ, READ_ALL, UPDATE, UPDATE_ALL,
+    permission_matrix,
+)
+
+
+# (all-rows bit, own-rows bit) per collection-level action
+SCOPE_BITS = {
+    'read': (READ_ALL, READ),
+    'update': (UPDATE_ALL, UPDATE),
+    'delete': (DELETE_ALL, DELETE),
+}
+
+
+def _measure(func, *args):
+    """Call func(*args); return (result, seconds, queries issued)"""
+    started = time.perf_counter()
+    if not check_metrics.enabled:
+        return func(*args), time.perf_counter() - started, 0
+    with QueryCounter() as queries:
+        result = func(*args)
+    return result, time.perf_counter() - started, queries.count
+
+
+def _metric_element(matrix, element_name):
+    # Unknown names come from callers; keep them out of metric labels
+    return element_name if element_name in matrix.elements else 'unknown'
 
 
 class PermissionChecker:
@@ -22,65 +55,218 @@ class PermissionChecker:
         Returns:
             tuple: (has_permission: bool, reason: str)
         """
+        # Compiled rules - no database access once loaded
+        matrix = permission_matrix.snapshot()
         if not user or not user.is_active:
+            PermissionChecker._count_unauthenticated(matrix, element_name, action)
             return False, "User not authenticated"
         
-        # Get business element
-        try:
-            element = BusinessElement.objects.get(name=element_name)
-        except BusinessElement.DoesNotExist:
-            return False, "Business element not found"
+        return PermissionChecker._observed(user, matrix, element_name, action, obj)
+
+    @staticmethod
+    def check_many(user, checks):
+        """
+        Check several permissions in one pass
+        
+        The matrix snapshot and the user's roles are resolved once for the
+        whole batch, and repeated checks share one memoized decision.
+        
+        Args:
+            user: User object
+            checks: Sequence of (element_name, action) or
+                (element_name, action, obj) tuples
+        
+        Returns:
+            list: (has_permission: bool, reason: str) per check, in order
+        """
+        matrix = permission_matrix.snapshot()
+        authenticated = user and user.is_active
+        results = []
+        for check in checks:
+            element_name, action, obj = (tuple(check) + (None,))[:3]
+            if not authenticated:
+                PermissionChecker._count_unauthenticated(matrix, element_name, action)
+                results.append((False, "User not authenticated"))
+                continue
+            results.append(
+                PermissionChecker._observed(user, matrix, element_name, action, obj)
+            )
+        return results
+
+    @staticmethod
+    async def acheck_permission(user, element_name, action, obj=None):
+        """
+        Async variant of check_permission()
+        
+        Only a stale permission matrix touches the database; users from
+        CustomAuthMiddleware carry their role ids, so the rest is in-memory.
+        """
+        matrix = await permission_matrix.asnapshot()
+        if not user or not user.is_active:
+            PermissionChecker._count_unauthenticated(matrix, element_name, action)
+            return False, "User not authenticated"
+        
+        return PermissionChecker._observed(user, matrix, element_name, action, obj)
+
+    @staticmethod
+    def _observed(user, matrix, element_name, action, obj):
+        # Audit records are buffered and metrics accumulate per thread, so
+        # neither touches the database or a shared lock here
+        (allowed, reason), latency, queries = _measure(
+            PermissionChecker._decide, user, matrix, element_name, action, obj
+        )
+        audit_log.record(user, element_name, action, obj, allowed, reason, latency)
+        check_metrics.observe(
+            _metric_element(matrix, element_name), action, allowed, latency, queries
+        )
+        return allowed, reason
+
+    @staticmethod
+    def _count_unauthenticated(matrix, element_name, action):
+        # Counted like any other denial; there is no user to audit
+        check_metrics.observe(
+            _metric_element(matrix, element_name), action, False, 0.0
+        )
+
+    @staticmethod
+    def _decide(user, matrix, element_name, action, obj):
+        # A decision only depends on the policy, the action and whether obj
+        # is absent or owned, so it is memoized for the rest of the request
+        is_owner = (
+            obj is not None
+            and hasattr(obj, 'owner_id')
+            and obj.owner_id == user.id
+        )
+        key = (matrix.version, element_name, action, obj is None, is_owner)
+        decisions = authorization_context(user).decisions
+        if key not in decisions:
+            decisions[key] = PermissionChecker._evaluate(
+                user, matrix, element_name, action, obj is None, is_owner
+            )
+        return decisions[key]
+
+    @staticmethod
+    def get_predicate(user, element_name, action='read'):
+        """
+        Row filter for listing (or bulk updating/deleting) an element
+        
+        Args:
+            user: User object
+            element_name: Name of business element
+            action: 'read', 'update' or 'delete'
+        
+        Returns:
+            tuple: (predicate: Predicate, reason: str) - everything with the
+            *_all permission, rows owned by user with the plain permission,
+            nothing otherwise
+        """
+        matrix = permission_matrix.snapshot()
+        if not user or not user.is_active:
+            PermissionChecker._count_unauthenticated(matrix, element_name, action)
+            return Predicate.nothing(), "User not authenticated"
+        
+        return PermissionChecker._observed_predicate(user, matrix, element_name, action)
+
+    @staticmethod
+    async def aget_predicate(user, element_name, action='read'):
+        """Async variant of get_predicate()"""
+        matrix = await permission_matrix.asnapshot()
+        if not user or not user.is_active:
+            PermissionChecker._count_unauthenticated(matrix, element_name, action)
+            return Predicate.nothing(), "User not authenticated"
+        
+        return PermissionChecker._observed_predicate(user, matrix, element_name, action)
+
+    @staticmethod
+    def _observed_predicate(user, matrix, element_name, action):
+        (predicate, reason), latency, queries = _measure(
+            PermissionChecker._predicate, user, matrix, element_name, action
+        )
+        allowed = predicate.kind != Predicate.NONE
+        audit_log.record(user, element_name, action, None, allowed, reason, latency)
+        check_metrics.observe(
+            _metric_element(matrix, element_name), action, allowed, latency, queries
+        )
+        return predicate, reason
+
+    @staticmethod
+    def _predicate(user, matrix, element_name, action):
+        all_bit, own_bit = SCOPE_BITS[action]
+        
+        mask, reason = PermissionChecker._mask(user, matrix, element_name)
+        if mask is None:
+            return Predicate.nothing(), reason
+        
+        if mask & all_bit:
+            return Predicate.everything(), "Access granted"
+        if mask & own_bit:
+            return Predicate.owned_by(user.id), "Access granted"
+        return Predicate.nothing(), "Insufficient permissions"
+
+    @staticmethod
+    def _mask(user, matrix, element_name):
+        """
+        Combined permission bits of the user's roles on element_name
+        Returns: (mask, reason) - mask is None when nothing applies
+        """
+        if element_name not in matrix.elements:
+            return None, "Business element not found"
+        
+        # Token claims are trusted while minted at the current policy version
+        claims = get_current_claims(user)
         
         # Get user roles
-        user_roles = user.user_roles.all().values_list('role', flat=True)
+        if claims is not None:
+            user_roles = claims['roles']
+        else:
+            user_roles = PermissionChecker.get_role_ids(user)
         
         if not user_roles:
-            return False, "User has no assigned roles"
+            return None, "User has no assigned roles"
         
-        # Get access rules for user's roles
-        rules = AccessRoleRule.objects.filter(
-            role_id__in=user_roles,
-            element=element
-        )
+        # Combined permission bits of every rule for user's roles
+        if claims is not None and 'perms' in claims:
+            mask = claims['perms'].get(element_name)
+        elif claims is not None:
+            mask = matrix.mask(user_roles, element_name)
+        else:
+            mask = authorization_context(user).mask(element_name, matrix)
         
-        if not rules.exists():
-            return False, "No permissions for this resource"
+        if mask is None:
+            return None, "No permissions for this resource"
+        return mask, None
+
+    @staticmethod
+    def _evaluate(user, matrix, element_name, action, no_obj, is_owner):
+        mask, reason = PermissionChecker._mask(user, matrix, element_name)
+        if mask is None:
+            return False, reason
         
         # Check permissions based on action
-        for rule in rules:
-            if action == 'read':
-                # Check read_all_permission first
-                if rule.read_all_permission:
-                    return True, "Access granted"
-                # Then check read_permission with ownership
-                if rule.read_permission:
-                    if obj is None:
-                        # For list views, read_permission without obj means can read own
-                        return True, "Access granted"
-                    if hasattr(obj, 'owner_id') and obj.owner_id == user.id:
-                        return True, "Access granted"
-            
-            elif action == 'create':
-                if rule.create_permission:
-                    return True, "Access granted"
-            
-            elif action == 'update':
-                # Check update_all_permission first
-                if rule.update_all_permission:
+        if action == 'read':
+            # read_all_permission first, then read_permission with ownership
+            if mask & READ_ALL:
+                return True, "Access granted"
+            if mask & READ:
+                # For list views, read_permission without obj means can read own
+                if no_obj or is_owner:
                     return True, "Access granted"
-                # Then check update_permission with ownership
-                if rule.update_permission:
-                    if obj and hasattr(obj, 'owner_id') and obj.owner_id == user.id:
-                        return True, "Access granted"
-            
-            elif action == 'delete':
-                # Check delete_all_permission first
-                if rule.delete_all_permission:
-                    return True, "Access granted"
-                # Then check delete_permission with ownership
-                if rule.delete_permission:
-                    if obj and hasattr(obj, 'owner_id') and obj.owner_id == user.id:
-                        return True, "Access granted"
+        
+        elif action == 'create':
+            if mask & CREATE:
+                return True, "Access granted"
+        
+        elif action == 'update':
+            if mask & UPDATE_ALL:
+                return True, "Access granted"
+            if mask & UPDATE and is_owner:
+                return True, "Access granted"
+        
+        elif action == 'delete':
+            if mask & DELETE_ALL:
+                return True, "Access granted"
+            if mask & DELETE and is_owner:
+                return True, "Access granted"
         
         return False, "Insufficient permissions"
 
@@ -131,4 +317,14 @@ class PermissionChecker:
         if not user or not user.is_active:
             return False
         
-        return user.user_roles.filter(role__name=role_name).exists()
+        return role_name in authorization_context(user).role_names
+
+    @staticmethod
+    def get_role_ids(user):
+        """
+        Get ids of the roles assigned to user
+
+        Loaded once per request through the authorization context (from the
+        cached principal when the user came from CustomAuthMiddleware).
+        """
+        return authorization_context(user).role_ids
@@ -0,0 +1,201 @@
+import logging
+import threading
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from django.db import IntegrityError, transaction
+from django.db.models import F
+
+from .models import PolicyVersion
+
+
+logger = logging.getLogger(__name__)
+
+
+class LocalVersionStore:
+    """
+    In-process counter. Stand-in for tests and single-process deployments;
+    bumps are not seen by other workers.
+    """
+
+    def __init__(self):
+        self._version = 0
+        self._lock = threading.Lock()
+
+    def get(self):
+        return self._version
+
+    def bump(self):
+        with self._lock:
+            self._version += 1
+            return self._version
+
+
+class CacheVersionStore:
+    """
+    Counter in a shared Django cache backend (any alias from CACHES).
+    incr() is atomic on Redis and Memcached. If the key is evicted the
+    counter restarts, which watchers still see as a change.
+    """
+
+    key = 'policy:version'
+
+    def __init__(self, alias):
+        self.alias = alias
+
+    @property
+    def cache(self):
+        return caches[self.alias]
+
+    def get(self):
+        return self.cache.get(self.key, 0)
+
+    def bump(self):
+        cache = self.cache
+        try:
+            return cache.incr(self.key)
+        except ValueError:
+            # Missing key - create it, unless another worker just did
+            if cache.add(self.key, 1, timeout=None):
+                return 1
+            return cache.incr(self.key)
+
+
+class DatabaseVersionStore:
+    """Counter in the single-row policy_version table"""
+
+    def get(self):
+        version = PolicyVersion.objects.filter(pk=1).values_list(
+            'version', flat=True
+        ).first()
+        return version or 0
+
+    def bump(self):
+        # UPDATE ... SET version = version + 1 is atomic across workers
+        if not PolicyVersion.objects.filter(pk=1).update(version=F('version') + 1):
+            try:
+                with transaction.atomic():
+                    PolicyVersion.objects.create(pk=1, version=1)
+                return 1
+            except IntegrityError:
+                PolicyVersion.objects.filter(pk=1).update(version=F('version') + 1)
+        return self.get()
+
+
+def get_version_store(backend):
+    """
+    Build the store for POLICY_VERSION_BACKEND: '' for in-process, 'db' for
+    the policy_version table, anything else is a CACHES alias
+    """
+    if not backend:
+        return LocalVersionStore()
+    if backend == 'db':
+        return DatabaseVersionStore()
+    return CacheVersionStore(backend)
+
+
+class PolicyVersionWatcher:
+    """
+    Monotonically increasing version of the authorization policy (roles,
+    rules, elements and role assignments), shared by every worker.
+
+    Writers bump() it after commit. Readers call check() per request; the
+    store is consulted at most once per interval, and subscribed callbacks
+    (cache invalidations) run only when the version has moved.
+    """
+
+    def __init__(self, store, interval=0.5):
+        self.store = store
+        self.interval = interval
+        self.version = None
+        self.checks = 0
+        self.changes = 0
+        self.errors = 0
+        self._next_check = 0.0
+        self._listeners = []
+        self._lock = threading.Lock()
+
+    def subscribe(self, callback):
+        """Call callback() whenever another version is observed"""
+        self._listeners.append(callback)
+        return callback
+
+    def due(self):
+        """True if the interval has passed since the last check"""
+        return time.monotonic() >= self._next_check
+
+    def check(self):
+        """
+        Re-read the version if the interval has passed and fire listeners
+        if it changed. Returns the last known version.
+        """
+        if not self.due():
+            return self.version
+
+        with self._lock:
+            now = time.monotonic()
+            if now < self._next_check:
+                return self.version
+            # Claim this check so concurrent requests skip straight through
+            self._next_check = now + self.interval
+
+        try:
+            version = self.store.get()
+        except Exception:
+            # An unreachable store must not fail requests; retry next interval
+            logger.exception('Could not read the policy version')
+            with self._lock:
+                self.errors += 1
+            return self.version
+
+        with self._lock:
+            self.checks += 1
+            changed = self.version is not None and version != self.version
+            if changed:
+                self.changes += 1
+            else:
+                self.version = version
+
+        if changed:
+            for callback in self._listeners:
+                callback()
+            # Publish the version only once caches are dropped, so whatever
+            # is read under it (e.g. token claims) postdates the change
+            with self._lock:
+                self.version = version
+        return version
+
+    async def acheck(self):
+        """Async variant of check(); only a due read leaves the event loop"""
+        if not self.due():
+            return self.version
+        return await sync_to_async(self.check)()
+
+    def bump(self):
+        """Advance the shared version; other workers notice within interval"""
+        try:
+            return self.store.bump()
+        except Exception:
+            logger.exception('Could not bump the policy version')
+            with self._lock:
+                self.errors += 1
+            return None
+
+    def stats(self):
+        """Return the last seen version and check counters"""
+        with self._lock:
+            return {
+                'version': self.version,
+                'interval_ms': self.interval * 1000,
+                'checks': self.checks,
+                'changes': self.changes,
+                'errors': self.errors,
+            }
+
+
+policy_version = PolicyVersionWatcher(
+    get_version_store(settings.POLICY_VERSION_BACKEND),
+    interval=settings.POLICY_VERSION_CHECK_MS / 1000,
+)
@@ -0,0 +1,118 @@
+from collections import namedtuple
+from collections.abc import MutableMapping
+
+from django.db.models import Q
+
+
+class Predicate(namedtuple('Predicate', ['kind', 'owner_id'])):
+    """
+    Row filter for a collection-level permission: every row, no rows, or
+    the rows whose owner_id matches.
+
+    Apply it with as_q()/filter_queryset() for querysets, or
+    filter_records() for in-memory stores, so a list only touches the rows
+    the caller may see.
+    """
+    __slots__ = ()
+
+    ALL = 'all'
+    NONE = 'none'
+    OWNER = 'owner'
+
+    @classmethod
+    def everything(cls):
+        return cls(cls.ALL, None)
+
+    @classmethod
+    def nothing(cls):
+        return cls(cls.NONE, None)
+
+    @classmethod
+    def owned_by(cls, owner_id):
+        return cls(cls.OWNER, owner_id)
+
+    def as_q(self, field='owner_id'):
+        """Equivalent Q object; the empty case never reaches the database"""
+        if self.kind == self.ALL:
+            return Q()
+        if self.kind == self.NONE:
+            return Q(pk__in=[])
+        return Q(**{field: self.owner_id})
+
+    def filter_queryset(self, queryset, field='owner_id'):
+        """Restrict a queryset to the visible rows"""
+        if self.kind == self.NONE:
+            return queryset.none()
+        if self.kind == self.ALL:
+            return queryset
+        return queryset.filter(self.as_q(field))
+
+    def filter_records(self, records):
+        """
+        Visible records of an in-memory store (pk -> record dict). Stores
+        with an owner index (see OwnedRecords) are looked up directly;
+        plain dicts are scanned.
+        """
+        if self.kind == self.ALL:
+            return list(records.values())
+        if self.kind == self.NONE:
+            return []
+        if isinstance(records, OwnedRecords):
+            return records.owned_by(self.owner_id)
+        return [
+            record for record in records.values()
+            if record.get('owner_id') == self.owner_id
+        ]
+
+
+class OwnedRecords(MutableMapping):
+    """
+    In-memory store of pk -> record dicts with an index on owner_id.
+
+    Every mutation (including pop(), update(), setdefault() and clear(),
+    which MutableMapping builds on the two below) goes through __setitem__
+    or __delitem__, so the index can't drift from the records. A record's
+    owner_id must not be changed in place.
+    """
+
+    def __init__(self, records=None):
+        self._records = {}
+        self._by_owner = {}
+        self.update(records or {})
+
+    def __getitem__(self, pk):
+        return self._records[pk]
+
+    def __setitem__(self, pk, record):
+        if pk in self._records:
+            self._unindex(pk)
+        self._records[pk] = record
+        self._by_owner.setdefault(record.get('owner_id'), {})[pk] = record
+
+    def __delitem__(self, pk):
+        self._unindex(pk)
+        del self._records[pk]
+
+    def __iter__(self):
+        return iter(self._records)
+
+    def __len__(self):
+        return len(self._records)
+
+    def __contains__(self, pk):
+        return pk in self._records
+
+    def __repr__(self):
+        return f'{type(self).__name__}({self._records!r})'
+
+    def owned_by(self, owner_id):
+        """Records owned by owner_id, in insertion order"""
+        return list(self._by_owner.get(owner_id, {}).values())
+
+    def _unindex(self, pk):
+        owner_id = self._records[pk].get('owner_id')
+        owned = self._by_owner.get(owner_id)
+        if owned is not None:
+            owned.pop(pk, None)
+            if not owned:
+                del self._by_owner[owner_id]
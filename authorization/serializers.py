@@ -6,7 +6,8 @@ class RoleSerializer(serializers.ModelSerializer):
     """Serializer for Role model"""
     class Meta:
         model = Role
-        fields = ['id', 'name', 'description']
+        fields = ['id', 'name', 'description', 'parents']
+        read_only_fields = ['parents']
 
 
 class BusinessElementSerializer(serializers.ModelSerializer):
@@ -68,3 +69,29 @@ class UserRoleSerializer(serializers.ModelSerializer):
             'role_name', 
             'assigned_at'
         ]
+
+
+class PermissionCheckItemSerializer(serializers.Serializer):
+    """One check in a batch permission request"""
+    element = serializers.CharField(max_length=100)
+    action = serializers.ChoiceField(choices=['read', 'create', 'update', 'delete'])
+    # Owner of the object being checked; omit for collection-level checks
+    owner_id = serializers.IntegerField(required=False, allow_null=True)
+
+
+class PermissionCheckSerializer(serializers.Serializer):
+    """Serializer for batch permission checks"""
+    checks = PermissionCheckItemSerializer(many=True, allow_empty=False, max_length=100)
+
+
+class MatrixRuleSerializer(serializers.Serializer):
+    """One row of a bulk permission matrix, by role and element name"""
+    role = serializers.CharField(max_length=50)
+    element = serializers.CharField(max_length=100)
+    read_permission = serializers.BooleanField(default=False)
+    read_all_permission = serializers.BooleanField(default=False)
+    create_permission = serializers.BooleanField(default=False)
+    update_permission = serializers.BooleanField(default=False)
+    update_all_permission = serializers.BooleanField(default=False)
+    delete_permission = serializers.BooleanField(default=False)
+    delete_all_permission = serializers.BooleanField(default=False)
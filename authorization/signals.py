@@ -0,0 +1,73 @@
+import threading
+from contextlib import contextmanager
+
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+from authentication.cache import principal_cache
+from .matrix import permission_matrix
+from .models import AccessRoleRule, BusinessElement, Role, RoleInheritance, UserRole
+from .policy import policy_version
+
+
+_deferred = threading.local()
+
+
+def policy_changed():
+    """Recompile the matrix here and bump the shared version after commit"""
+    if getattr(_deferred, 'depth', 0):
+        _deferred.changed = True
+        return
+    transaction.on_commit(permission_matrix.invalidate)
+    transaction.on_commit(policy_version.bump)
+
+
+@contextmanager
+def deferred_policy_changes():
+    """
+    Collapse every policy_changed() inside the block (e.g. the per-row
+    delete signals of a bulk write) into one, issued when the block exits
+    """
+    depth = getattr(_deferred, 'depth', 0)
+    if not depth:
+        _deferred.changed = False
+    _deferred.depth = depth + 1
+    try:
+        yield
+    finally:
+        _deferred.depth = depth
+    if not depth and _deferred.changed:
+        policy_changed()
+
+
+@receiver(post_save, sender=UserRole)
+@receiver(post_delete, sender=UserRole)
+def invalidate_user_principal(sender, instance, **kwargs):
+    """Role assignments are part of the principal snapshot"""
+    principal_cache.invalidate(instance.user_id)
+    transaction.on_commit(policy_version.bump)
+
+
+@receiver(post_save, sender=AccessRoleRule)
+@receiver(post_delete, sender=AccessRoleRule)
+@receiver(post_save, sender=Role)
+@receiver(post_delete, sender=Role)
+@receiver(post_save, sender=BusinessElement)
+@receiver(post_delete, sender=BusinessElement)
+@receiver(post_save, sender=RoleInheritance)
+@receiver(post_delete, sender=RoleInheritance)
+def invalidate_permission_matrix(sender, instance, **kwargs):
+    """Recompile the permission matrix once the change is committed"""
+    policy_changed()
+
+
+@receiver(m2m_changed, sender=Role.parents.through)
+def invalidate_role_hierarchy(sender, action, **kwargs):
+    """role.parents.add()/remove()/clear() bypass post_save/post_delete"""
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        policy_changed()
+
+
+# Another worker changed the policy: drop everything derived from it
+policy_version.subscribe(permission_matrix.invalidate)
+policy_version.subscribe(principal_cache.clear)
@@ -1,3 +1,841 @@
+from datetime import timedelta
+from types import SimpleNamespace
+from unittest import mock
+
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from authentication.cache import Principal, principal_cache
+from authentication.middleware import LazyUser
+from authentication.models import Session, User
+from .audit import AuditLog, audit_log
+from .bulk import apply_matrix, parse_matrix
+from .claims import build_authz_claims, get_current_claims
+from .metrics import CheckMetrics
+from .pagination import decode_cursor, encode_cursor, keyset_page
+from .policy import policy_version
+from .matrix import (
+    CREATE, DELETE_ALL, READ, READ_ALL, UPDATE, PermissionMatrix, permission_matrix,
+    role_closure, rule_mask,
+)
+from .models import (
+    AccessRoleRule, AuthorizationAudit, BusinessElement, Role, RoleInheritance, UserRole,
+)
+from .permissions import PermissionChecker
+from .predicates import OwnedRecords, Predicate
+from .views import _parse_id
+
+
+class AuthorizationTestCase(TestCase):
+    """
+    Base class resetting the per-process caches. on_commit callbacks never
+    run inside a TestCase, so signals can't invalidate them for us.
+    """
+
+    def setUp(self):
+        permission_matrix.invalidate()
+        principal_cache.clear()
+        patcher = mock.patch.object(audit_log, 'enabled', False)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(permission_matrix.invalidate)
+
+    @staticmethod
+    def create_user(email='user@test.com'):
+        return User.objects.create(
+            email=email, first_name='Test', last_name='User', password_hash='!'
+        )
+
+    @staticmethod
+    def request_user(user, claims=None):
+        """The user as CustomAuthMiddleware would attach it to a request"""
+        return LazyUser(Principal.from_user(user), claims)
+
+    @staticmethod
+    def auth_header(user):
+        """Keyword arguments authenticating a test client request as user"""
+        return {'HTTP_AUTHORIZATION': f'Bearer {user.generate_token()}'}
+
+
+class EmbeddedClaimsTests(AuthorizationTestCase):
+
+    def setUp(self):
+        super().setUp()
+        for attribute in ('interval', '_next_check'):
+            patcher = mock.patch.object(policy_version, attribute, 0)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.user = self.create_user()
+        self.role = Role.objects.create(name='editor')
+        element = BusinessElement.objects.create(name='reports')
+        self.rule = AccessRoleRule.objects.create(
+            role=self.role, element=element, read_all_permission=True
+        )
+        UserRole.objects.create(user=self.user, role=self.role)
+
+    def change_policy(self, change):
+        """Commit change() and let this worker observe the bumped version"""
+        with self.captureOnCommitCallbacks(execute=True):
+            change()
+        policy_version.check()
+
+    def test_claims_alone_authorize(self):
+        claims = build_authz_claims(self.user, include_permissions=True)
+        self.assertEqual(claims['pv'], policy_version.version)
+
+        # The principal's roles are not consulted while pv is current
+        user = LazyUser(Principal.from_user(self.user)._replace(role_ids=()), claims)
+        self.assertIs(get_current_claims(user), claims)
+        permission_matrix.snapshot()
+        with self.assertNumQueries(0):
+            self.assertEqual(
+                PermissionChecker.check_permission(user, 'reports', 'read'),
+                (True, 'Access granted')
+            )
+
+    def test_revoked_role_stops_granting(self):
+        claims = build_authz_claims(self.user, include_permissions=True)
+        self.change_policy(UserRole.objects.get(user=self.user).delete)
+        user = self.request_user(self.user, claims)
+
+        self.assertIsNone(get_current_claims(user))
+        self.assertEqual(
+            PermissionChecker.check_permission(user, 'reports', 'read'),
+            (False, 'User has no assigned roles')
+        )
+
+    def test_granted_role_is_not_hidden_by_claims(self):
+        claims = build_authz_claims(self.user)
+        other = Role.objects.create(name='auditor')
+        self.change_policy(lambda: UserRole.objects.create(user=self.user, role=other))
+
+        self.assertIsNone(get_current_claims(self.request_user(self.user, claims)))
+
+    def test_rule_change_invalidates_claims(self):
+        claims = build_authz_claims(self.user, include_permissions=True)
+        self.rule.read_all_permission = False
+        self.change_policy(self.rule.save)
+        user = self.request_user(self.user, claims)
+
+        self.assertIsNone(get_current_claims(user))
+        self.assertEqual(
+            PermissionChecker.check_permission(user, 'reports', 'read'),
+            (False, 'Insufficient permissions')
+        )
+
+    def test_unknown_version_is_never_trusted(self):
+        with mock.patch.object(policy_version, 'check', return_value=None):
+            claims = build_authz_claims(self.user)
+
+        self.assertNotIn('pv', claims)
+        self.assertIsNone(get_current_claims(self.request_user(self.user, claims)))
+
+
+class PermissionMatrixTests(AuthorizationTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.reader = Role.objects.create(name='reader')
+        self.writer = Role.objects.create(name='writer')
+        self.products = BusinessElement.objects.create(name='products')
+        self.orders = BusinessElement.objects.create(name='orders')
+        AccessRoleRule.objects.create(
+            role=self.reader, element=self.products, read_permission=True
+        )
+        AccessRoleRule.objects.create(
+            role=self.writer, element=self.products,
+            create_permission=True, update_permission=True
+        )
+        AccessRoleRule.objects.create(
+            role=self.writer, element=self.orders, read_all_permission=True
+        )
+
+    def test_rule_mask(self):
+        rule = AccessRoleRule(read_permission=True, update_permission=True)
+        self.assertEqual(rule_mask(rule), READ | UPDATE)
+        self.assertEqual(rule_mask({
+            'read_permission': False, 'read_all_permission': True,
+            'create_permission': True, 'update_permission': False,
+            'update_all_permission': False, 'delete_permission': False,
+            'delete_all_permission': False,
+        }), READ_ALL | CREATE)
+
+    def test_build_compiles_rules(self):
+        matrix = PermissionMatrix.build()
+
+        self.assertEqual(matrix.elements, {'products', 'orders'})
+        self.assertEqual(matrix.rules[(self.reader.id, 'products')], READ)
+        self.assertEqual(matrix.rules[(self.writer.id, 'products')], CREATE | UPDATE)
+        self.assertEqual(matrix.roles[self.writer.id], 'writer')
+
+    def test_mask_combines_roles(self):
+        matrix = PermissionMatrix.build()
+        both = [self.reader.id, self.writer.id]
+
+        self.assertEqual(matrix.mask(both, 'products'), READ | CREATE | UPDATE)
+        self.assertIsNone(matrix.mask([self.reader.id], 'orders'))
+        self.assertEqual(matrix.masks([self.reader.id]), {'products': READ})
+
+    def test_version_tracks_rules(self):
+        version = PermissionMatrix.build().version
+        self.assertEqual(PermissionMatrix.build().version, version)
+
+        AccessRoleRule.objects.filter(role=self.reader).update(read_all_permission=True)
+        self.assertNotEqual(PermissionMatrix.build().version, version)
+
+    def test_snapshot_is_cached_until_invalidated(self):
+        snapshot = permission_matrix.snapshot()
+        with self.assertNumQueries(0):
+            self.assertIs(permission_matrix.snapshot(), snapshot)
+
+        permission_matrix.invalidate()
+        self.assertIsNot(permission_matrix.snapshot(), snapshot)
+
+    def test_checks_use_the_matrix(self):
+        user = self.create_user()
+        UserRole.objects.create(user=user, role=self.reader)
+        request_user = self.request_user(user)
+        permission_matrix.snapshot()
+
+        with self.assertNumQueries(0):
+            self.assertEqual(
+                PermissionChecker.check_permission(request_user, 'products', 'read'),
+                (True, 'Access granted')
+            )
+            self.assertEqual(
+                PermissionChecker.check_permission(request_user, 'products', 'create'),
+                (False, 'Insufficient permissions')
+            )
+            self.assertEqual(
+                PermissionChecker.check_permission(request_user, 'orders', 'read'),
+                (False, 'No permissions for this resource')
+            )
+            self.assertEqual(
+                PermissionChecker.check_permission(request_user, 'missing', 'read'),
+                (False, 'Business element not found')
+            )
+
+
+class RoleInheritanceTests(AuthorizationTestCase):
+
+    def test_role_closure(self):
+        closure = role_closure([1, 2, 3, 4], {1: [2], 2: [3]})
+
+        self.assertEqual(closure[1], {1, 2, 3})
+        self.assertEqual(closure[2], {2, 3})
+        self.assertEqual(closure[3], {3})
+        self.assertEqual(closure[4], {4})
+
+    def test_role_closure_tolerates_cycles(self):
+        closure = role_closure([1, 2, 3], {1: [2], 2: [3], 3: [1]})
+
+        for role_id in (1, 2, 3):
+            self.assertEqual(closure[role_id], {1, 2, 3})
+
+    def test_inherited_grants_are_folded_in(self):
+        admin = Role.objects.create(name='admin')
+        manager = Role.objects.create(name='manager')
+        guest = Role.objects.create(name='guest')
+        products = BusinessElement.objects.create(name='products')
+        AccessRoleRule.objects.create(role=guest, element=products, read_permission=True)
+        AccessRoleRule.objects.create(role=manager, element=products, create_permission=True)
+        AccessRoleRule.objects.create(role=admin, element=products, delete_all_permission=True)
+        RoleInheritance.objects.create(role=admin, parent=manager)
+        RoleInheritance.objects.create(role=manager, parent=guest)
+
+        matrix = PermissionMatrix.build()
+
+        self.assertEqual(matrix.rules[(guest.id, 'products')], READ)
+        self.assertEqual(matrix.rules[(manager.id, 'products')], READ | CREATE)
+        self.assertEqual(matrix.rules[(admin.id, 'products')], READ | CREATE | DELETE_ALL)
+        self.assertEqual(matrix.effective_roles([admin.id]), {admin.id, manager.id, guest.id})
+
+    def test_inherited_rule_grants_without_own_rule(self):
+        manager = Role.objects.create(name='manager')
+        guest = Role.objects.create(name='guest')
+        orders = BusinessElement.objects.create(name='orders')
+        AccessRoleRule.objects.create(role=guest, element=orders, read_all_permission=True)
+        RoleInheritance.objects.create(role=manager, parent=guest)
+        user = self.create_user()
+        UserRole.objects.create(user=user, role=manager)
+
+        request_user = self.request_user(user)
+        self.assertTrue(PermissionChecker.check_permission(request_user, 'orders', 'read')[0])
+        self.assertTrue(PermissionChecker.has_role(request_user, 'guest'))
+
+    def test_edges_change_the_version(self):
+        manager = Role.objects.create(name='manager')
+        guest = Role.objects.create(name='guest')
+        version = PermissionMatrix.build().version
+
+        RoleInheritance.objects.create(role=manager, parent=guest)
+        self.assertNotEqual(PermissionMatrix.build().version, version)
+
+
+class PredicateTests(AuthorizationTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.owner = self.create_user('owner@test.com')
+        self.other = self.create_user('other@test.com')
+        expire_at = timezone.now() + timedelta(hours=1)
+        for user, session_id in ((self.owner, 'a'), (self.owner, 'b'), (self.other, 'c')):
+            Session.objects.create(user=user, session_id=session_id, expire_at=expire_at)
+        self.records = {
+            1: {'id': 1, 'owner_id': self.owner.id},
+            2: {'id': 2, 'owner_id': self.other.id},
+            3: {'id': 3, 'owner_id': self.owner.id},
+        }
+
+    def visible_sessions(self, predicate):
+        queryset = predicate.filter_queryset(Session.objects.all(), field='user_id')
+        return sorted(queryset.values_list('session_id', flat=True))
+
+    def test_filter_queryset(self):
+        self.assertEqual(self.visible_sessions(Predicate.everything()), ['a', 'b', 'c'])
+        self.assertEqual(self.visible_sessions(Predicate.owned_by(self.owner.id)), ['a', 'b'])
+        with self.assertNumQueries(0):
+            self.assertEqual(self.visible_sessions(Predicate.nothing()), [])
+
+    def test_as_q(self):
+        predicate = Predicate.owned_by(self.other.id)
+        self.assertEqual(
+            list(Session.objects.filter(predicate.as_q('user_id')).values_list('session_id', flat=True)),
+            ['c']
+        )
+
+    def test_filter_records(self):
+        for records in (self.records, OwnedRecords(self.records)):
+            self.assertEqual(len(Predicate.everything().filter_records(records)), 3)
+            self.assertEqual(Predicate.nothing().filter_records(records), [])
+            self.assertEqual(
+                [record['id'] for record in Predicate.owned_by(self.owner.id).filter_records(records)],
+                [1, 3]
+            )
+
+
+class OwnedRecordsTests(TestCase):
+
+    def setUp(self):
+        self.records = OwnedRecords({
+            1: {'id': 1, 'owner_id': 10},
+            2: {'id': 2, 'owner_id': 20},
+            3: {'id': 3, 'owner_id': 10},
+        })
+
+    def owned_ids(self, owner_id):
+        return [record['id'] for record in self.records.owned_by(owner_id)]
+
+    def test_assignment_and_deletion(self):
+        self.records[4] = {'id': 4, 'owner_id': 20}
+        self.records[1] = {'id': 1, 'owner_id': 20}
+        del self.records[3]
+
+        self.assertEqual(self.owned_ids(10), [])
+        self.assertEqual(self.owned_ids(20), [2, 4, 1])
+
+    def test_pop_and_popitem(self):
+        self.assertEqual(self.records.pop(1)['id'], 1)
+        self.assertIsNone(self.records.pop(1, None))
+        self.assertEqual(self.owned_ids(10), [3])
+
+        self.records.popitem()
+        self.records.popitem()
+        self.assertEqual(self.owned_ids(10), [])
+        self.assertEqual(self.owned_ids(20), [])
+
+    def test_update_and_setdefault(self):
+        self.records.update({2: {'id': 2, 'owner_id': 10}})
+        self.records.setdefault(5, {'id': 5, 'owner_id': 30})
+        self.records.setdefault(5, {'id': 5, 'owner_id': 40})
+
+        self.assertEqual(self.owned_ids(10), [1, 3, 2])
+        self.assertEqual(self.owned_ids(20), [])
+        self.assertEqual(self.owned_ids(30), [5])
+        self.assertEqual(self.owned_ids(40), [])
+
+    def test_clear(self):
+        self.records.clear()
+
+        self.assertEqual(len(self.records), 0)
+        self.assertEqual(self.owned_ids(10), [])
+
+    def test_behaves_like_a_dict(self):
+        self.assertIn(2, self.records)
+        self.assertEqual(max(self.records.keys()), 3)
+        self.assertEqual(self.records.get(9), None)
+        self.assertEqual(
+            self.records,
+            {1: {'id': 1, 'owner_id': 10}, 2: {'id': 2, 'owner_id': 20}, 3: {'id': 3, 'owner_id': 10}}
+        )
+
+
+class AuditLogTests(TestCase):
+
+    def setUp(self):
+        # Flush by hand instead of from the background thread
+        patcher = mock.patch.object(AuditLog, '_ensure_flusher')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.user = User(id=7)
+
+    def record(self, log, count, allowed=True):
+        for index in range(count):
+            log.record(self.user, 'products', 'read', {'id': index}, allowed, 'reason', 0.001)
+
+    def test_overflow_drops_oldest_and_counts(self):
+        log = AuditLog(capacity=3, batch_size=2)
+        self.record(log, 5)
+
+        stats = log.stats()
+        self.assertEqual(stats['recorded'], 5)
+        self.assertEqual(stats['dropped'], 2)
+        self.assertEqual(stats['pending'], 3)
+
+        self.assertEqual(log.flush(), 3)
+        self.assertEqual(
+            sorted(AuthorizationAudit.objects.values_list('object_id', flat=True)),
+            ['2', '3', '4']
+        )
+        self.assertEqual(log.stats()['written'], 3)
+        self.assertEqual(log.stats()['pending'], 0)
+
+    def test_grants_are_sampled_denials_are_kept(self):
+        log = AuditLog(sample_rate=0.0)
+        self.record(log, 3, allowed=True)
+        self.record(log, 2, allowed=False)
+
+        stats = log.stats()
+        self.assertEqual(stats['sampled_out'], 3)
+        self.assertEqual(stats['recorded'], 2)
+
+    def test_failed_flush_is_counted(self):
+        log = AuditLog(batch_size=2)
+        self.record(log, 3)
+
+        with mock.patch.object(AuthorizationAudit.objects, 'bulk_create', side_effect=RuntimeError):
+            with self.assertLogs('authorization.audit', 'ERROR'):
+                self.assertEqual(log.flush(), 0)
+        stats = log.stats()
+        self.assertEqual(stats['failed'], 2)
+        self.assertEqual(stats['pending'], 1)
+
+    def test_disabled_records_nothing(self):
+        log = AuditLog(enabled=False)
+        self.record(log, 3)
+
+        self.assertEqual(log.stats()['recorded'], 0)
+        self.assertEqual(log.flush(), 0)
+
+
+class AuditFlusherTests(TestCase):
+
+    def setUp(self):
+        patchers = [
+            mock.patch('authorization.audit.threading.Thread'),
+            mock.patch('authorization.audit.atexit.register'),
+        ]
+        self.thread, self.register = [patcher.start() for patcher in patchers]
+        for patcher in patchers:
+            self.addCleanup(patcher.stop)
+
+    def record(self, log):
+        log.record(User(id=7), 'products', 'read', None, False, 'reason', 0.001)
+
+    def test_started_by_the_first_record(self):
+        log = AuditLog()
+        self.thread.assert_not_called()
+        self.register.assert_not_called()
+
+        self.record(log)
+        self.record(log)
+
+        self.thread.assert_called_once()
+        self.thread.return_value.start.assert_called_once_with()
+        self.register.assert_called_once_with(log.flush)
+
+    def test_disabled_log_starts_nothing(self):
+        self.record(AuditLog(enabled=False))
+
+        self.thread.assert_not_called()
+        self.register.assert_not_called()
+
+
+class CheckMetricsTests(AuthorizationTestCase):
+
+    def setUp(self):
+        super().setUp()
+        BusinessElement.objects.create(name='products')
+        self.metrics = CheckMetrics()
+        patcher = mock.patch('authorization.permissions.check_metrics', self.metrics)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def count(self, element_name, action, outcome):
+        slots = self.metrics.collect().get((element_name, action, outcome))
+        return slots[0] if slots else 0
+
+    def test_unauthenticated_denials_are_counted(self):
+        inactive = self.create_user()
+        inactive.is_active = False
+
+        PermissionChecker.check_permission(None, 'products', 'read')
+        PermissionChecker.check_permission(inactive, 'products', 'update')
+        PermissionChecker.check_many(None, [('products', 'read'), ('missing', 'read')])
+        PermissionChecker.get_predicate(None, 'products')
+
+        self.assertEqual(self.count('products', 'read', 'denied'), 3)
+        self.assertEqual(self.count('products', 'update', 'denied'), 1)
+        self.assertEqual(self.count('unknown', 'read', 'denied'), 1)
+
+    def test_render(self):
+        PermissionChecker.check_permission(None, 'products', 'read')
+
+        text = self.metrics.render()
+        self.assertIn(
+            'authz_checks_total{element="products",action="read",outcome="denied"} 1', text
+        )
+        self.assertIn(
+            'authz_check_duration_seconds_count{element="products",action="read",outcome="denied"} 1',
+            text
+        )
+
+
+class RequestMemoizationTests(AuthorizationTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.user = self.create_user()
+        role = Role.objects.create(name='editor')
+        for name in ('products', 'orders'):
+            element = BusinessElement.objects.create(name=name)
+            AccessRoleRule.objects.create(
+                role=role, element=element, read_permission=True, update_permission=True
+            )
+        UserRole.objects.create(user=self.user, role=role)
+        permission_matrix.snapshot()
+
+    def check_everything(self, user):
+        owned = SimpleNamespace(owner_id=self.user.id)
+        for element_name in ('products', 'orders', 'missing'):
+            PermissionChecker.check_permission(user, element_name, 'read')
+            PermissionChecker.check_permission(user, element_name, 'update', owned)
+            PermissionChecker.get_predicate(user, element_name)
+        PermissionChecker.has_role(user, 'editor')
+
+    def test_roles_are_loaded_once_per_request(self):
+        # A plain User has no principal, so its role ids cost one query...
+        with self.assertNumQueries(1):
+            self.check_everything(self.user)
+        # ...and nothing after that
+        with self.assertNumQueries(0):
+            for _ in range(5):
+                self.check_everything(self.user)
+
+    def test_middleware_user_costs_no_queries(self):
+        user = self.request_user(self.user)
+        with self.assertNumQueries(0):
+            for _ in range(5):
+                self.check_everything(user)
+
+    def test_batch_size_does_not_change_query_count(self):
+        headers = self.auth_header(self.user)
+        principal_cache.clear()
+        # Keep the periodic policy version read out of the comparison
+        patcher = mock.patch.object(policy_version, '_next_check', float('inf'))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        def check(count):
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.post(
+                    '/api/permissions/check/',
+                    {'checks': [{'element': 'products', 'action': 'read'}] * count},
+                    content_type='application/json', **headers
+                )
+            self.assertEqual(response.status_code, 200)
+            principal_cache.clear()
+            return len(queries)
+
+        self.assertEqual(check(1), check(50))
+
+
+class PermissionCheckViewTests(AuthorizationTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.user = self.create_user()
+        role = Role.objects.create(name='editor')
+        element = BusinessElement.objects.create(name='products')
+        AccessRoleRule.objects.create(
+            role=role, element=element, read_all_permission=True, update_permission=True
+        )
+        UserRole.objects.create(user=self.user, role=role)
+
+    def check(self, checks, **headers):
+        return self.client.post(
+            '/api/permissions/check/', {'checks': checks},
+            content_type='application/json', **headers
+        )
+
+    def test_token_reaches_the_view(self):
+        response = self.check([
+            {'element': 'products', 'action': 'read'},
+            {'element': 'products', 'action': 'update', 'owner_id': self.user.id},
+            {'element': 'products', 'action': 'update', 'owner_id': self.user.id + 1},
+        ], **self.auth_header(self.user))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [result['allowed'] for result in response.json()['results']],
+            [True, True, False]
+        )
+
+    def test_requires_authentication(self):
+        response = self.check([{'element': 'products', 'action': 'read'}])
+        self.assertEqual(response.status_code, 401)
+
+    def test_rejects_empty_batch(self):
+        response = self.check([], **self.auth_header(self.user))
+        self.assertEqual(response.status_code, 400)
+
+
+class KeysetPaginationTests(TestCase):
+
+    def setUp(self):
+        roles = [Role.objects.create(name=f'role{index}') for index in range(3)]
+        elements = [BusinessElement.objects.create(name=f'element{index}') for index in range(3)]
+        for role in roles:
+            for element in elements:
+                AccessRoleRule.objects.create(role=role, element=element)
+        self.ordering = ('role_id', 'element_id')
+        self.expected = list(
+            AccessRoleRule.objects.order_by(*self.ordering).values_list(*self.ordering)
+        )
+
+    def test_pages_cover_every_row_once(self):
+        seen = []
+        cursor = None
+        while True:
+            with self.assertNumQueries(1):
+                rows, next_cursor = keyset_page(
+                    AccessRoleRule.objects.select_related('role', 'element'),
+                    self.ordering, cursor, limit=4
+                )
+            seen += [(rule.role_id, rule.element_id) for rule in rows]
+            if next_cursor is None:
+                break
+            cursor = decode_cursor(next_cursor, 2)
+
+        self.assertEqual(seen, self.expected)
+
+    def test_cursor_round_trip(self):
+        self.assertEqual(decode_cursor(encode_cursor(3, 14), 2), (3, 14))
+        self.assertIsNone(decode_cursor(encode_cursor(3), 2))
+        self.assertIsNone(decode_cursor('not a cursor!', 2))
+        self.assertIsNone(decode_cursor(encode_cursor(2 ** 63, 1), 2))
+
+    def test_parse_id(self):
+        self.assertEqual(_parse_id('42'), 42)
+        self.assertIsNone(_parse_id('admin'))
+        self.assertIsNone(_parse_id('\u00b2'))
+        self.assertIsNone(_parse_id('9' * 30))
+
+
+class MatrixImportTests(AuthorizationTestCase):
+
+    def setUp(self):
+        super().setUp()
+        for name in ('admin', 'user'):
+            Role.objects.create(name=name)
+        for name in ('products', 'orders', 'stores'):
+            BusinessElement.objects.create(name=name)
+        self.apply([
+            {'role': 'admin', 'element': 'products', 'read_all_permission': True},
+            {'role': 'admin', 'element': 'orders', 'read_all_permission': True},
+            {'role': 'user', 'element': 'products', 'read_permission': True},
+        ])
+
+    @staticmethod
+    def parse(rules):
+        return parse_matrix(enumerate(rules, 1))
+
+    def apply(self, rules, dry_run=False):
+        matrix, errors = self.parse(rules)
+        self.assertEqual(errors, [])
+        return apply_matrix(matrix, dry_run=dry_run)
+
+    def stored(self):
+        return sorted(
+            AccessRoleRule.objects.filter(read_all_permission=True)
+            .values_list('role__name', 'element__name')
+        )
+
+    def test_diff_counts(self):
+        diff = self.apply([
+            # unchanged
+            {'role': 'admin', 'element': 'products', 'read_all_permission': True},
+            # updated
+            {'role': 'user', 'element': 'products', 'read_all_permission': True},
+            # created; admin/orders is deleted
+            {'role': 'admin', 'element': 'stores', 'read_all_permission': True},
+        ])
+
+        self.assertEqual(
+            diff.as_dict(),
+            {'created': 1, 'updated': 1, 'deleted': 1, 'unchanged': 1}
+        )
+        self.assertEqual(
+            self.stored(),
+            [('admin', 'products'), ('admin', 'stores'), ('user', 'products')]
+        )
+
+    def test_dry_run_changes_nothing(self):
+        before = list(AccessRoleRule.objects.order_by('id').values())
+        diff = self.apply(
+            [{'role': 'user', 'element': 'stores', 'create_permission': True}],
+            dry_run=True
+        )
+
+        self.assertEqual(
+            diff.as_dict(),
+            {'created': 1, 'updated': 0, 'deleted': 3, 'unchanged': 0}
+        )
+        self.assertEqual(list(AccessRoleRule.objects.order_by('id').values()), before)
+
+    def test_one_invalidation_per_import(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.apply([{'role': 'user', 'element': 'stores', 'read_permission': True}])
+
+        # One matrix invalidation and one version bump, not one per deleted row
+        self.assertEqual(len(callbacks), 2)
+
+    def test_no_changes_no_invalidation(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            diff = self.apply([
+                {'role': 'admin', 'element': 'products', 'read_all_permission': True},
+                {'role': 'admin', 'element': 'orders', 'read_all_permission': True},
+                {'role': 'user', 'element': 'products', 'read_permission': True},
+            ])
+
+        self.assertFalse(diff.changed)
+        self.assertEqual(callbacks, [])
+
+    def test_parse_errors(self):
+        matrix, errors = self.parse([
+            {'role': 'admin', 'element': 'products'},
+            {'role': 'nobody', 'element': 'products'},
+            {'role': 'admin', 'element': 'nothing'},
+            {'role': 'admin', 'element': 'products', 'read_permission': True},
+            'not a record',
+        ])
+
+        self.assertIsNone(matrix)
+        self.assertEqual([error['line'] for error in errors], [2, 3, 4, 5])
+        self.assertEqual(errors[0]['error'], 'Unknown role: nobody')
+        self.assertEqual(errors[2]['error'], 'Duplicate rule for admin on products')
+
+
+class AccessRulesMatrixViewTests(AuthorizationTestCase):
+
+    url = '/api/access-rules/matrix/'
+
+    def setUp(self):
+        super().setUp()
+        admin = Role.objects.create(name='admin')
+        user_role = Role.objects.create(name='user')
+        products = BusinessElement.objects.create(name='products')
+        AccessRoleRule.objects.create(role=admin, element=products, read_all_permission=True)
+        AccessRoleRule.objects.create(role=user_role, element=products, read_permission=True)
+        self.admin = self.create_user('admin@test.com')
+        UserRole.objects.create(user=self.admin, role=admin)
+        self.headers = self.auth_header(self.admin)
+
+    def put(self, data, query='', content_type='application/json'):
+        return self.client.put(
+            self.url + query, data, content_type=content_type, **self.headers
+        )
+
+    def test_admin_only(self):
+        headers = self.auth_header(self.create_user())
+        self.assertEqual(self.client.get(self.url, **headers).status_code, 403)
+        self.assertEqual(self.client.get(self.url).status_code, 403)
+
+    def test_csv_export_round_trips(self):
+        response = self.client.get(self.url, **self.headers)
+        self.assertEqual(response.status_code, 200)
+        body = b''.join(response.streaming_content).decode()
+        self.assertEqual(len(body.splitlines()), 3)
+
+        response = self.put(body, content_type='text/csv')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['unchanged'], 2)
+
+    def test_json_import_and_dry_run(self):
+        rules = {'rules': [
+            {'role': 'admin', 'element': 'products', 'read_all_permission': True},
+        ]}
+
+        response = self.put(rules, '?dry_run=1')
+        self.assertEqual(response.json()['deleted'], 1)
+        self.assertTrue(response.json()['dry_run'])
+        self.assertEqual(AccessRoleRule.objects.count(), 2)
+
+        response = self.put(rules)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(AccessRoleRule.objects.count(), 1)
+
+    def test_empty_matrix_needs_allow_empty(self):
+        self.assertEqual(self.put({'rules': []}).status_code, 400)
+        self.assertEqual(AccessRoleRule.objects.count(), 2)
+
+        self.assertEqual(self.put({'rules': []}, '?allow_empty=1').status_code, 200)
+        self.assertEqual(AccessRoleRule.objects.count(), 0)
+
+    def test_rejects_invalid_and_oversized_matrices(self):
+        response = self.put({'rules': [{'role': 'nobody', 'element': 'products'}]})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['errors'][0]['error'], 'Unknown role: nobody')
+
+        with self.settings(ACCESS_RULES_MATRIX_MAX_ROWS=1):
+            response = self.put({'rules': [
+                {'role': 'admin', 'element': 'products'},
+                {'role': 'user', 'element': 'products'},
+            ]})
+        self.assertEqual(response.status_code, 413)
+
+
+class MetricsViewTests(AuthorizationTestCase):
+
+    url = '/api/metrics'
+
+    def setUp(self):
+        super().setUp()
+        self.admin = self.create_user('admin@test.com')
+        UserRole.objects.create(user=self.admin, role=Role.objects.create(name='admin'))
+
+    def test_admin_can_scrape(self):
+        response = self.client.get(self.url, **self.auth_header(self.admin))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain; version=0.0.4'))
+        self.assertIn(b'# TYPE authz_checks_total counter', response.content)
+        self.assertIn(b'# TYPE authn_hash_in_flight gauge', response.content)
+        self.assertIn(b'\nauthn_hash_rejected_total ', response.content)
+        self.assertIn(b'\nauthn_cache_hits_total{cache="token"} ', response.content)
+        self.assertIn(b'\nauthn_cache_misses_total{cache="principal"} ', response.content)
+
+    def test_others_are_refused(self):
+        headers = self.auth_header(self.create_user())
+        self.assertEqual(self.client.get(self.url, **headers).status_code, 403)
+        self.assertEqual(self.client.get(self.url).status_code, 403)
+
+    def test_metrics_token(self):
+        with self.settings(METRICS_TOKEN='scrape-secret'):
+            allowed = self.client.get(self.url, HTTP_AUTHORIZATION='Token scrape-secret')
+            wrong = self.client.get(self.url, HTTP_AUTHORIZATION='Token guessed')
 
-# Create your tests here.
+        self.assertEqual(allowed.status_code, 200)
+        self.assertEqual(wrong.status_code, 403)
@@ -1,14 +1,21 @@
 from django.urls import path
 from .views import (
     AccessRulesListCreateView, 
+    AccessRulesMatrixView,
     AccessRuleDetailView,
     RolesListView,
-    BusinessElementsListView
+    BusinessElementsListView,
+    PermissionCheckView,
+    MetricsView
 )
 
 urlpatterns = [
     path('access-rules/', AccessRulesListCreateView.as_view(), name='access-rules-list'),
+    path('access-rules/matrix/', AccessRulesMatrixView.as_view(), name='access-rules-matrix'),
     path('access-rules/<int:pk>/', AccessRuleDetailView.as_view(), name='access-rule-detail'),
     path('roles/', RolesListView.as_view(), name='roles-list'),
     path('business-elements/', BusinessElementsListView.as_view(), name='business-elements-list'),
+    path('permissions/check/', PermissionCheckView.as_view(), name='permissions-check'),
+    # Conventional scrape path, no trailing slash
+    path('metrics', MetricsView.as_view(), name='metrics'),
 ]
@@ -1,19 +1,57 @@
+import codecs
+import csv
+import hmac
+from itertools import islice
+from types import SimpleNamespace
+
+from django.conf import settings
+from django.http import HttpResponse, StreamingHttpResponse
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
+from rest_framework.utils.urls import replace_query_param
+from authentication.bulk import read_records
+from .bulk import apply_matrix, export_csv, export_json, parse_matrix
 from .models import AccessRoleRule, Role, BusinessElement
-from .serializers import AccessRuleSerializer, RoleSerializer, BusinessElementSerializer
+from .serializers import (
+    AccessRuleSerializer,
+    RoleSerializer,
+    BusinessElementSerializer,
+    PermissionCheckSerializer
+)
+from .metrics import render_metrics
+from .pagination import MAX_KEY, decode_cursor, keyset_page
 from .permissions import PermissionChecker
 
 
+def _parse_id(value):
+    """
+    Integer id from a query parameter, or None if it is a name. isdecimal()
+    rather than isdigit(), which also accepts characters like '²' that int()
+    rejects.
+    """
+    if not value.isdecimal():
+        return None
+    try:
+        value = int(value)
+    except ValueError:
+        return None
+    return value if value <= MAX_KEY else None
+
+
 class AccessRulesListCreateView(APIView):
     """
-    GET /api/access-rules/ - List all access rules (admin only)
+    GET /api/access-rules/ - List access rules, one page at a time (admin only)
     POST /api/access-rules/ - Create new access rule (admin only)
+    
+    Query params: role, element (id or name), limit, cursor (from "next")
     """
     
+    # Keyset order - served by the unique (role_id, element_id) index
+    ordering = ('role_id', 'element_id')
+    
     def get(self, request):
-        """List all access rules"""
+        """List access rules"""
         # Check authentication
         if not hasattr(request, 'user') or request.user is None:
             return Response(
@@ -28,9 +66,53 @@ class AccessRulesListCreateView(APIView):
                 status=status.HTTP_403_FORBIDDEN
             )
         
-        rules = AccessRoleRule.objects.all()
+        # Role and element names come in the same query
+        rules = AccessRoleRule.objects.select_related('role', 'element')
+        
+        role = request.query_params.get('role')
+        if role:
+            role_id = _parse_id(role)
+            rules = (
+                rules.filter(role_id=role_id) if role_id is not None
+                else rules.filter(role__name=role)
+            )
+        
+        element = request.query_params.get('element')
+        if element:
+            element_id = _parse_id(element)
+            rules = (
+                rules.filter(element_id=element_id) if element_id is not None
+                else rules.filter(element__name=element)
+            )
+        
+        try:
+            limit = int(request.query_params.get('limit', settings.ACCESS_RULES_PAGE_SIZE))
+        except ValueError:
+            limit = 0
+        if not 1 <= limit <= settings.ACCESS_RULES_MAX_PAGE_SIZE:
+            return Response(
+                {'error': f'limit must be between 1 and {settings.ACCESS_RULES_MAX_PAGE_SIZE}'}, 
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        cursor = request.query_params.get('cursor')
+        if cursor is not None:
+            cursor = decode_cursor(cursor, len(self.ordering))
+            if cursor is None:
+                return Response(
+                    {'error': 'Invalid cursor'}, 
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+        
+        rules, next_cursor = keyset_page(rules, self.ordering, cursor, limit)
         serializer = AccessRuleSerializer(rules, many=True)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        return Response({
+            'results': serializer.data,
+            'next': (
+                replace_query_param(request.build_absolute_uri(), 'cursor', next_cursor)
+                if next_cursor else None
+            )
+        }, status=status.HTTP_200_OK)
 
     def post(self, request):
         """Create new access rule"""
@@ -56,6 +138,89 @@ class AccessRulesListCreateView(APIView):
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
+class AccessRulesMatrixView(APIView):
+    """
+    GET /api/access-rules/matrix/ - Stream every access rule (admin only)
+    PUT /api/access-rules/matrix/ - Replace all access rules at once (admin only)
+    
+    Rows are {"role": name, "element": name, <permission flags>}. GET streams
+    CSV, or JSON with ?output=json. PUT takes CSV with a header row
+    (Content-Type: text/csv) or JSON {"rules": [...]}; rules left out are
+    deleted, but an empty matrix is refused unless ?allow_empty=1.
+    ?dry_run=1 reports the changes without applying them.
+    """
+    
+    def get(self, request):
+        """Export the matrix"""
+        if not request.user or not PermissionChecker.has_role(request.user, 'admin'):
+            return Response(
+                {'error': 'Admin access required'}, 
+                status=status.HTTP_403_FORBIDDEN
+            )
+        
+        if request.query_params.get('output') == 'json':
+            response = StreamingHttpResponse(export_json(), content_type='application/json')
+        else:
+            response = StreamingHttpResponse(export_csv(), content_type='text/csv; charset=utf-8')
+            response['Content-Disposition'] = 'attachment; filename="access_rules.csv"'
+        return response
+    
+    def put(self, request):
+        """Diff the posted matrix against the table and apply it"""
+        if not request.user or not PermissionChecker.has_role(request.user, 'admin'):
+            return Response(
+                {'error': 'Admin access required'}, 
+                status=status.HTTP_403_FORBIDDEN
+            )
+        
+        content_type = request.content_type.split(';')[0].strip()
+        if content_type == 'text/csv':
+            records = read_records(codecs.iterdecode(request.stream or (), 'utf-8'), 'csv')
+        else:
+            rules = request.data.get('rules') if isinstance(request.data, dict) else None
+            if not isinstance(rules, list):
+                return Response(
+                    {'error': 'Expected a "rules" list'}, 
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            records = enumerate(rules, 1)
+        
+        limit = settings.ACCESS_RULES_MATRIX_MAX_ROWS
+        try:
+            records = list(islice(records, limit + 1))
+        except (UnicodeDecodeError, csv.Error) as exc:
+            return Response(
+                {'error': f'Unreadable body: {exc}'}, 
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if len(records) > limit:
+            return Response(
+                {'error': f'At most {limit} rules per matrix'}, 
+                status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+            )
+        
+        matrix, errors = parse_matrix(records)
+        if matrix is None:
+            return Response(
+                {'error': 'Invalid matrix', 'errors': errors[:100]}, 
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        # An empty upload is more often a truncated file than a real policy
+        if not matrix and request.query_params.get('allow_empty') not in ('1', 'true'):
+            return Response(
+                {'error': 'Empty matrix would delete every rule; pass ?allow_empty=1 to do that'}, 
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        dry_run = request.query_params.get('dry_run') in ('1', 'true')
+        diff = apply_matrix(matrix, dry_run=dry_run)
+        return Response(
+            dict(diff.as_dict(), dry_run=dry_run), 
+            status=status.HTTP_200_OK
+        )
+
+
 class AccessRuleDetailView(APIView):
     """
     GET /api/access-rules/{id}/ - Get specific access rule (admin only)
@@ -66,7 +231,7 @@ class AccessRuleDetailView(APIView):
     def get_object(self, pk):
         """Helper method to get access rule object"""
         try:
-            return AccessRoleRule.objects.get(pk=pk)
+            return AccessRoleRule.objects.select_related('role', 'element').get(pk=pk)
         except AccessRoleRule.DoesNotExist:
             return None
 
@@ -152,7 +317,7 @@ class RolesListView(APIView):
                 status=status.HTTP_403_FORBIDDEN
             )
         
-        roles = Role.objects.all()
+        roles = Role.objects.prefetch_related('parents')
         serializer = RoleSerializer(roles, many=True)
         return Response(serializer.data, status=status.HTTP_200_OK)
 
@@ -173,3 +338,76 @@ class BusinessElementsListView(APIView):
         elements = BusinessElement.objects.all()
         serializer = BusinessElementSerializer(elements, many=True)
         return Response(serializer.data, status=status.HTTP_200_OK)
+
+
+class PermissionCheckView(APIView):
+    """
+    POST /api/permissions/check/
+    Answer many permission checks for the current user in one round trip
+    
+    Body: {"checks": [{"element": "products", "action": "update", "owner_id": 5}, ...]}
+    """
+    
+    def post(self, request):
+        """Check permissions in batch"""
+        if not hasattr(request, 'user') or request.user is None:
+            return Response(
+                {'error': 'Authentication required'}, 
+                status=status.HTTP_401_UNAUTHORIZED
+            )
+        
+        serializer = PermissionCheckSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        
+        checks = serializer.validated_data['checks']
+        decisions = PermissionChecker.check_many(request.user, [
+            (
+                check['element'],
+                check['action'],
+                # Ownership only needs owner_id, so no object is loaded
+                SimpleNamespace(owner_id=check['owner_id'])
+                if check.get('owner_id') is not None else None
+            )
+            for check in checks
+        ])
+        
+        results = [
+            {
+                'element': check['element'],
+                'action': check['action'],
+                'allowed': allowed,
+                'reason': reason
+            }
+            for check, (allowed, reason) in zip(checks, decisions)
+        ]
+        return Response({'results': results}, status=status.HTTP_200_OK)
+
+
+class MetricsView(APIView):
+    """
+    GET /api/metrics - Permission check and password hashing metrics in
+    Prometheus text format
+    
+    Authorized by "Authorization: Token <METRICS_TOKEN>" when METRICS_TOKEN
+    is set, otherwise admin only
+    """
+    
+    def get(self, request):
+        """Render counters, gauges and latency histograms"""
+        token = settings.METRICS_TOKEN
+        header = request.META.get('HTTP_AUTHORIZATION', '')
+        if token and header.startswith('Token '):
+            allowed = hmac.compare_digest(header[6:].encode(), token.encode())
+        else:
+            allowed = PermissionChecker.has_role(request.user, 'admin')
+        if not allowed:
+            return Response(
+                {'error': 'Admin access required'}, 
+                status=status.HTTP_403_FORBIDDEN
+            )
+        
+        return HttpResponse(
+            render_metrics(),
+            content_type='text/plain; version=0.0.4; charset=utf-8'
+        )
@@ -0,0 +1,92 @@
+from django.http import JsonResponse
+from rest_framework import status
+from authentication.async_views import AsyncAPIView
+from authorization.matrix import permission_matrix
+from authorization.permissions import PermissionChecker
+from authorization.predicates import Predicate
+from .views import (
+    MOCK_PRODUCTS, MOCK_ORDERS, MOCK_STORES, MOCK_USERS_DATA, MockObject
+)
+
+
+async def acheck_list_permission(request, element_name, mock_data):
+    """
+    Async variant of check_list_permission
+    Returns: (filtered_data, error_response)
+    """
+    if not request.user:
+        return None, JsonResponse(
+            {'error': 'Authentication required'},
+            status=status.HTTP_401_UNAUTHORIZED
+        )
+
+    matrix = await permission_matrix.asnapshot()
+
+    if element_name not in matrix.elements:
+        return None, JsonResponse(
+            {'error': 'Business element not found'},
+            status=status.HTTP_404_NOT_FOUND
+        )
+
+    predicate, reason = await PermissionChecker.aget_predicate(
+        request.user, element_name, 'read'
+    )
+
+    if predicate.kind == Predicate.NONE:
+        return None, JsonResponse(
+            {'error': reason},
+            status=status.HTTP_403_FORBIDDEN
+        )
+
+    return predicate.filter_records(mock_data), None
+
+
+class AsyncMockListView(AsyncAPIView):
+    """
+    GET /api/async/{element}/ - Async list (filtered by permissions)
+    """
+    element_name = None
+    mock_data = None
+
+    async def get(self, request):
+        result, error = await acheck_list_permission(
+            request, self.element_name, self.mock_data
+        )
+        if error:
+            return error
+        return JsonResponse(result, status=status.HTTP_200_OK, safe=False)
+
+
+class AsyncMockDetailView(AsyncAPIView):
+    """
+    GET /api/async/{element}/{id}/ - Async single record
+    """
+    element_name = None
+    mock_data = None
+    not_found = 'Not found'
+
+    async def get(self, request, pk):
+        if not request.user:
+            return JsonResponse(
+                {'error': 'Authentication required'},
+                status=status.HTTP_401_UNAUTHORIZED
+            )
+
+        if pk not in self.mock_data:
+            return JsonResponse(
+                {'error': self.not_found},
+                status=status.HTTP_404_NOT_FOUND
+            )
+
+        data = self.mock_data[pk]
+
+        has_perm, reason = await PermissionChecker.acheck_permission(
+            request.user, self.element_name, 'read', MockObject(data)
+        )
+        if not has_perm:
+            return JsonResponse(
+                {'error': reason},
+                status=status.HTTP_403_FORBIDDEN
+            )
+
+        return JsonResponse(data, status=status.HTTP_200_OK)
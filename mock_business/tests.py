@@ -1,3 +1,114 @@
+from unittest import mock
+
 from django.test import TestCase
 
-# Create your tests here.
+from authentication.cache import principal_cache
+from authentication.models import User
+from authorization.audit import audit_log
+from authorization.matrix import permission_matrix
+from authorization.models import AccessRoleRule, BusinessElement, Role, UserRole
+from .views import MOCK_PRODUCTS
+
+
+class MockBusinessTestCase(TestCase):
+    """
+    A user (id 1, the owner of products 1 and 2) whose role may read and
+    update its own products
+    """
+
+    def setUp(self):
+        permission_matrix.invalidate()
+        principal_cache.clear()
+        patcher = mock.patch.object(audit_log, 'enabled', False)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(permission_matrix.invalidate)
+
+        # Mock records are owned by fixed ids
+        self.user = User.objects.create(
+            id=1, email='owner@test.com', first_name='Test', last_name='User',
+            password_hash='!'
+        )
+        self.role = Role.objects.create(name='user')
+        self.element = BusinessElement.objects.create(name='products')
+        self.rule = AccessRoleRule.objects.create(
+            role=self.role, element=self.element,
+            read_permission=True, update_permission=True
+        )
+        UserRole.objects.create(user=self.user, role=self.role)
+        self.token = self.user.generate_token()
+
+
+class AsyncMockViewTests(MockBusinessTestCase):
+
+    async def get(self, path, authenticated=True):
+        headers = {'Authorization': f'Bearer {self.token}'} if authenticated else {}
+        return await self.async_client.get(path, headers=headers)
+
+    async def test_list_is_filtered_to_owned_records(self):
+        response = await self.get('/api/async/products/')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([product['id'] for product in response.json()], [1, 2])
+
+    async def test_detail(self):
+        self.assertEqual((await self.get('/api/async/products/1/')).status_code, 200)
+        self.assertEqual((await self.get('/api/async/products/3/')).status_code, 403)
+        self.assertEqual((await self.get('/api/async/products/99/')).status_code, 404)
+
+    async def test_requires_authentication(self):
+        response = await self.get('/api/async/products/', authenticated=False)
+        self.assertEqual(response.status_code, 401)
+        response = await self.get('/api/async/products/1/', authenticated=False)
+        self.assertEqual(response.status_code, 401)
+
+    async def test_unknown_element(self):
+        response = await self.get('/api/async/stores/')
+        self.assertEqual(response.status_code, 404)
+
+
+class ConditionalReadTests(MockBusinessTestCase):
+
+    url = '/api/products/1/'
+
+    def get(self, **headers):
+        return self.client.get(
+            self.url, HTTP_AUTHORIZATION=f'Bearer {self.token}', **headers
+        )
+
+    def test_if_none_match_returns_304(self):
+        etag = self.get()['ETag']
+
+        response = self.get(HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+
+    def test_etag_changes_after_update(self):
+        etag = self.get()['ETag']
+        response = self.client.put(
+            self.url, {'name': MOCK_PRODUCTS[1]['name']},
+            content_type='application/json', HTTP_AUTHORIZATION=f'Bearer {self.token}'
+        )
+        self.assertEqual(response.status_code, 200)
+
+        response = self.get(HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_etag_changes_after_matrix_change(self):
+        etag = self.get()['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            self.rule.create_permission = True
+            self.rule.save()
+
+        response = self.get(HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_revoked_access_is_not_revalidated(self):
+        etag = self.get()['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            self.rule.read_permission = False
+            self.rule.save()
+
+        self.assertEqual(self.get(HTTP_IF_NONE_MATCH=etag).status_code, 403)
@@ -3,8 +3,10 @@ from .views import (
     ProductListView, ProductDetailView,
     OrderListView, OrderDetailView,
     StoreListView, StoreDetailView,
-    UserListView, UserDetailView
+    UserListView, UserDetailView,
+    MOCK_PRODUCTS, MOCK_ORDERS, MOCK_STORES, MOCK_USERS_DATA
 )
+from .async_views import AsyncMockListView, AsyncMockDetailView
 
 urlpatterns = [
     # Products
@@ -22,4 +24,30 @@ urlpatterns = [
     # Users (read-only mock)
     path('users/', UserListView.as_view(), name='user-list'),
     path('users/<int:pk>/', UserDetailView.as_view(), name='user-detail'),
+
+    # Async read-only variants (native under ASGI)
+    path('async/products/', AsyncMockListView.as_view(
+        element_name='products', mock_data=MOCK_PRODUCTS
+    ), name='async-product-list'),
+    path('async/products/<int:pk>/', AsyncMockDetailView.as_view(
+        element_name='products', mock_data=MOCK_PRODUCTS, not_found='Product not found'
+    ), name='async-product-detail'),
+    path('async/orders/', AsyncMockListView.as_view(
+        element_name='orders', mock_data=MOCK_ORDERS
+    ), name='async-order-list'),
+    path('async/orders/<int:pk>/', AsyncMockDetailView.as_view(
+        element_name='orders', mock_data=MOCK_ORDERS, not_found='Order not found'
+    ), name='async-order-detail'),
+    path('async/stores/', AsyncMockListView.as_view(
+        element_name='stores', mock_data=MOCK_STORES
+    ), name='async-store-list'),
+    path('async/stores/<int:pk>/', AsyncMockDetailView.as_view(
+        element_name='stores', mock_data=MOCK_STORES, not_found='Store not found'
+    ), name='async-store-detail'),
+    path('async/users/', AsyncMockListView.as_view(
+        element_name='users', mock_data=MOCK_USERS_DATA
+    ), name='async-user-list'),
+    path('async/users/<int:pk>/', AsyncMockDetailView.as_view(
+        element_name='users', mock_data=MOCK_USERS_DATA, not_found='User not found'
+    ), name='async-user-detail'),
 ]
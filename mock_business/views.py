@@ -1,36 +1,43 @@
+import threading
+
+from django.utils import timezone
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
+from authentication.conditional import etag_matches, make_etag, not_modified, set_validators
+from authorization.context import authorization_context
+from authorization.matrix import READ, READ_ALL, permission_matrix
 from authorization.permissions import PermissionChecker
-from authorization.models import AccessRoleRule, BusinessElement
+from authorization.predicates import OwnedRecords, Predicate
 
 
 # ==================== MOCK DATA STORAGE ====================
+# Indexed by owner_id so owner-scoped lists don't scan every record
 
-MOCK_PRODUCTS = {
+MOCK_PRODUCTS = OwnedRecords({
     1: {'id': 1, 'name': 'Laptop', 'price': 1200, 'category': 'Electronics', 'owner_id': 1},
     2: {'id': 2, 'name': 'Mouse', 'price': 25, 'category': 'Electronics', 'owner_id': 1},
     3: {'id': 3, 'name': 'Keyboard', 'price': 75, 'category': 'Electronics', 'owner_id': 2},
     4: {'id': 4, 'name': 'Monitor', 'price': 300, 'category': 'Electronics', 'owner_id': 3},
-}
+})
 
-MOCK_ORDERS = {
+MOCK_ORDERS = OwnedRecords({
     1: {'id': 1, 'product_id': 1, 'quantity': 2, 'total': 2400, 'status': 'pending', 'owner_id': 1},
     2: {'id': 2, 'product_id': 2, 'quantity': 5, 'total': 125, 'status': 'completed', 'owner_id': 2},
     3: {'id': 3, 'product_id': 3, 'quantity': 1, 'total': 75, 'status': 'shipped', 'owner_id': 3},
-}
+})
 
-MOCK_STORES = {
+MOCK_STORES = OwnedRecords({
     1: {'id': 1, 'name': 'Main Store', 'address': '123 Main St', 'city': 'New York', 'owner_id': 1},
     2: {'id': 2, 'name': 'Downtown Branch', 'address': '456 Market St', 'city': 'San Francisco', 'owner_id': 2},
     3: {'id': 3, 'name': 'Suburb Location', 'address': '789 Oak Ave', 'city': 'Chicago', 'owner_id': 1},
-}
+})
 
-MOCK_USERS_DATA = {
+MOCK_USERS_DATA = OwnedRecords({
     1: {'id': 1, 'email': 'admin@test.com', 'first_name': 'Admin', 'last_name': 'User', 'role': 'admin'},
     2: {'id': 2, 'email': 'user1@test.com', 'first_name': 'John', 'last_name': 'Doe', 'role': 'user'},
     3: {'id': 3, 'email': 'user2@test.com', 'first_name': 'Jane', 'last_name': 'Smith', 'role': 'user'},
-}
+})
 
 
 # ==================== HELPER CLASSES AND FUNCTIONS ====================
@@ -42,6 +49,58 @@ class MockObject:
             setattr(self, key, value)
 
 
+class RecordVersions:
+    """
+    Version counter and modification time per mock record, bumped on every
+    write. Backs ETag/Last-Modified on the detail endpoints.
+    """
+
+    def __init__(self):
+        self._versions = {}
+        self._lock = threading.Lock()
+        self._loaded_at = timezone.now().replace(microsecond=0)
+
+    def get(self, element_name, pk):
+        """Return (version, modified_at) for a record"""
+        return self._versions.get((element_name, pk), (1, self._loaded_at))
+
+    def bump(self, element_name, pk):
+        """Record a write to (or creation of) a record"""
+        with self._lock:
+            version, _ = self.get(element_name, pk)
+            self._versions[(element_name, pk)] = (version + 1, timezone.now())
+
+    def discard(self, element_name, pk):
+        """Forget a deleted record"""
+        with self._lock:
+            self._versions.pop((element_name, pk), None)
+
+
+record_versions = RecordVersions()
+
+
+def conditional_read(request, element_name, pk):
+    """
+    Check a detail GET's conditional headers against the record version.
+
+    The ETag also covers the user, their roles and the permission matrix
+    version, so If-None-Match matching it means the same user was already
+    granted read access to this exact record version under the same policy;
+    that 304 is returned without re-evaluating permissions.
+    Returns (etag, modified_at, not_modified_response_or_None).
+    """
+    version, modified_at = record_versions.get(element_name, pk)
+    etag = make_etag(
+        element_name, pk, version, modified_at.isoformat(),
+        request.user.id,
+        sorted(PermissionChecker.get_role_ids(request.user)),
+        permission_matrix.snapshot().version,
+    )
+    if etag_matches(request, etag):
+        return etag, modified_at, not_modified(request, etag=etag, last_modified=modified_at)
+    return etag, modified_at, None
+
+
 def check_list_permission(request, element_name, mock_data):
     """
     Helper to filter list based on permissions
@@ -53,41 +112,25 @@ def check_list_permission(request, element_name, mock_data):
             status=status.HTTP_401_UNAUTHORIZED
         )
     
-    user_roles = request.user.user_roles.all().values_list('role', flat=True)
-    
-    try:
-        element = BusinessElement.objects.get(name=element_name)
-    except BusinessElement.DoesNotExist:
+    if element_name not in permission_matrix.snapshot().elements:
         return None, Response(
             {'error': 'Business element not found'}, 
             status=status.HTTP_404_NOT_FOUND
         )
     
-    rules = AccessRoleRule.objects.filter(role_id__in=user_roles, element=element)
-    
-    if not rules.exists():
-        return None, Response(
-            {'error': 'No permissions for this resource'}, 
-            status=status.HTTP_403_FORBIDDEN
-        )
-    
-    has_read_all = any(rule.read_all_permission for rule in rules)
-    has_read_own = any(rule.read_permission for rule in rules)
+    # all / none / owner_id = user - resolved against the owner index, so
+    # the cost follows the rows the user can see
+    predicate, reason = PermissionChecker.get_predicate(
+        request.user, element_name, 'read'
+    )
     
-    if not has_read_all and not has_read_own:
+    if predicate.kind == Predicate.NONE:
         return None, Response(
-            {'error': 'Insufficient permissions'}, 
+            {'error': reason}, 
             status=status.HTTP_403_FORBIDDEN
         )
     
-    if has_read_all:
-        return list(mock_data.values()), None
-    else:
-        # Only return items owned by current user
-        return [
-            item for item in mock_data.values() 
-            if item.get('owner_id') == request.user.id
-        ], None
+    return predicate.filter_records(mock_data), None
 
 
 # ==================== PRODUCTS ENDPOINTS ====================
@@ -132,6 +175,7 @@ class ProductListView(APIView):
             'owner_id': request.user.id
         }
         MOCK_PRODUCTS[new_id] = new_product
+        record_versions.bump('products', new_id)
         
         return Response(new_product, status=status.HTTP_201_CREATED)
 
@@ -157,6 +201,10 @@ class ProductDetailView(APIView):
                 status=status.HTTP_404_NOT_FOUND
             )
         
+        etag, modified_at, response = conditional_read(request, 'products', pk)
+        if response is not None:
+            return response
+        
         product_data = MOCK_PRODUCTS[pk]
         mock_obj = MockObject(product_data)
         
@@ -169,7 +217,13 @@ class ProductDetailView(APIView):
                 status=status.HTTP_403_FORBIDDEN
             )
         
-        return Response(product_data, status=status.HTTP_200_OK)
+        # If-Modified-Since is only honoured once access is confirmed
+        response = not_modified(request, etag=etag, last_modified=modified_at)
+        if response is not None:
+            return response
+        
+        response = Response(product_data, status=status.HTTP_200_OK)
+        return set_validators(response, etag=etag, last_modified=modified_at)
 
     def put(self, request, pk):
         """Update product"""
@@ -203,6 +257,7 @@ class ProductDetailView(APIView):
             'price': request.data.get('price', product_data['price']),
             'category': request.data.get('category', product_data['category']),
         })
+        record_versions.bump('products', pk)
         
         return Response(product_data, status=status.HTTP_200_OK)
 
@@ -237,6 +292,7 @@ class ProductDetailView(APIView):
             )
         
         del MOCK_PRODUCTS[pk]
+        record_versions.discard('products', pk)
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 
@@ -282,6 +338,7 @@ class OrderListView(APIView):
             'owner_id': request.user.id
         }
         MOCK_ORDERS[new_id] = new_order
+        record_versions.bump('orders', new_id)
         
         return Response(new_order, status=status.HTTP_201_CREATED)
 
@@ -307,6 +364,10 @@ class OrderDetailView(APIView):
                 status=status.HTTP_404_NOT_FOUND
             )
         
+        etag, modified_at, response = conditional_read(request, 'orders', pk)
+        if response is not None:
+            return response
+        
         order_data = MOCK_ORDERS[pk]
         mock_obj = MockObject(order_data)
         
@@ -319,7 +380,13 @@ class OrderDetailView(APIView):
                 status=status.HTTP_403_FORBIDDEN
             )
         
-        return Response(order_data, status=status.HTTP_200_OK)
+        # If-Modified-Since is only honoured once access is confirmed
+        response = not_modified(request, etag=etag, last_modified=modified_at)
+        if response is not None:
+            return response
+        
+        response = Response(order_data, status=status.HTTP_200_OK)
+        return set_validators(response, etag=etag, last_modified=modified_at)
 
     def put(self, request, pk):
         """Update order"""
@@ -352,6 +419,7 @@ class OrderDetailView(APIView):
             'status': request.data.get('status', order_data['status']),
             'total': request.data.get('total', order_data['total']),
         })
+        record_versions.bump('orders', pk)
         
         return Response(order_data, status=status.HTTP_200_OK)
 
@@ -386,6 +454,7 @@ class OrderDetailView(APIView):
             )
         
         del MOCK_ORDERS[pk]
+        record_versions.discard('orders', pk)
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 
@@ -430,6 +499,7 @@ class StoreListView(APIView):
             'owner_id': request.user.id
         }
         MOCK_STORES[new_id] = new_store
+        record_versions.bump('stores', new_id)
         
         return Response(new_store, status=status.HTTP_201_CREATED)
 
@@ -455,6 +525,10 @@ class StoreDetailView(APIView):
                 status=status.HTTP_404_NOT_FOUND
             )
         
+        etag, modified_at, response = conditional_read(request, 'stores', pk)
+        if response is not None:
+            return response
+        
         store_data = MOCK_STORES[pk]
         mock_obj = MockObject(store_data)
         
@@ -467,7 +541,13 @@ class StoreDetailView(APIView):
                 status=status.HTTP_403_FORBIDDEN
             )
         
-        return Response(store_data, status=status.HTTP_200_OK)
+        # If-Modified-Since is only honoured once access is confirmed
+        response = not_modified(request, etag=etag, last_modified=modified_at)
+        if response is not None:
+            return response
+        
+        response = Response(store_data, status=status.HTTP_200_OK)
+        return set_validators(response, etag=etag, last_modified=modified_at)
 
     def put(self, request, pk):
         """Update store"""
@@ -500,6 +580,7 @@ class StoreDetailView(APIView):
             'address': request.data.get('address', store_data['address']),
             'city': request.data.get('city', store_data['city']),
         })
+        record_versions.bump('stores', pk)
         
         return Response(store_data, status=status.HTTP_200_OK)
 
@@ -534,6 +615,7 @@ class StoreDetailView(APIView):
             )
         
         del MOCK_STORES[pk]
+        record_versions.discard('stores', pk)
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 
@@ -572,18 +654,16 @@ class UserDetailView(APIView):
             )
         
         # For users endpoint, check read permission
-        user_roles = request.user.user_roles.all().values_list('role', flat=True)
+        matrix = permission_matrix.snapshot()
         
-        try:
-            element = BusinessElement.objects.get(name='users')
-        except BusinessElement.DoesNotExist:
+        if 'users' not in matrix.elements:
             return Response(
                 {'error': 'Business element not found'}, 
                 status=status.HTTP_404_NOT_FOUND
             )
         
-        rules = AccessRoleRule.objects.filter(role_id__in=user_roles, element=element)
-        has_read = any(rule.read_all_permission or rule.read_permission for rule in rules)
+        mask = authorization_context(request.user).mask('users', matrix)
+        has_read = bool(mask and mask & (READ | READ_ALL))
         
         if not has_read:
             return Response(